@@ -0,0 +1,106 @@
+// 纯界面交互的客户端回调，不需要请求服务器
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    ui: {
+        // 登录成功后显示主界面
+        updateVisibility: function (loginStatus) {
+            if (loginStatus === "登录成功") {
+                return [{"display": "none"}, {"display": "block"}];
+            }
+            return [{"display": "flex"}, {"display": "none"}];
+        },
+
+        // 登录后建立推送连接；推送正常时定时刷新降为低频兜底，未连接时按轮询间隔刷新
+        syncPush: function (n, loginStatus, config, current) {
+            var push = window.pushUpdates;
+            if (loginStatus !== "登录成功" || !push || !config) {
+                return window.dash_clientside.no_update;
+            }
+            push.connect();
+            var interval = push.connected() ? config.fallback : config.poll;
+            return interval === current ? window.dash_clientside.no_update : interval;
+        },
+
+        // 折叠菜单：同一时间只展开一个
+        toggleMenu: function (settingsClicks, positionClicks) {
+            var closed = {"maxHeight": "0", "overflow": "hidden", "opacity": "0", "transition": "all 0.3s ease-in-out"};
+            var arrowDown = {"marginLeft": "auto", "transition": "transform 0.3s ease", "transform": "rotate(0deg)"};
+            var triggered = window.dash_clientside.callback_context.triggered;
+            if (!triggered || !triggered.length || triggered[0].prop_id === ".") {
+                return [closed, closed, arrowDown, arrowDown];
+            }
+            function panel(clicks) {
+                var open = clicks % 2 === 1;
+                return [
+                    {
+                        "maxHeight": open ? "500px" : "0",
+                        "overflow": "hidden",
+                        "opacity": open ? "1" : "0",
+                        "transition": "all 0.3s ease-in-out"
+                    },
+                    {
+                        "marginLeft": "auto",
+                        "transition": "transform 0.3s ease",
+                        "transform": open ? "rotate(180deg)" : "rotate(0deg)"
+                    }
+                ];
+            }
+            if (triggered[0].prop_id.split(".")[0] === "settings-button") {
+                var settings = panel(settingsClicks || 0);
+                return [settings[0], closed, settings[1], arrowDown];
+            }
+            var position = panel(positionClicks || 0);
+            return [closed, position[0], arrowDown, position[1]];
+        },
+
+        // 记录K线图的缩放范围和宽度，范围或宽度变化时触发服务端按新范围重新取数
+        trackViewport: function (relayoutData, current) {
+            var container = document.getElementById("kline-graph");
+            var next = {
+                range: current ? current.range : null,
+                width: container && container.offsetWidth ? container.offsetWidth : (current ? current.width : null)
+            };
+            if (relayoutData) {
+                if (relayoutData["xaxis.autorange"]) {
+                    next.range = null;
+                } else if ("xaxis.range[0]" in relayoutData) {
+                    next.range = [relayoutData["xaxis.range[0]"], relayoutData["xaxis.range[1]"]];
+                } else if (relayoutData["xaxis.range"]) {
+                    next.range = relayoutData["xaxis.range"];
+                }
+            }
+            if (current && JSON.stringify(next) === JSON.stringify(current)) {
+                return window.dash_clientside.no_update;
+            }
+            return next;
+        },
+
+        // 按选择的技术指标切换曲线和RSI参考线的可见性
+        toggleIndicators: function (selected, klineFigure, indicatorFigure) {
+            selected = selected || [];
+            function apply(figure) {
+                if (!figure || !figure.data) {
+                    return window.dash_clientside.no_update;
+                }
+                var copy = Object.assign({}, figure);
+                copy.data = figure.data.map(function (trace) {
+                    if (!trace.legendgroup) {
+                        return trace;
+                    }
+                    return Object.assign({}, trace, {visible: selected.indexOf(trace.legendgroup) !== -1});
+                });
+                if (figure.layout && figure.layout.shapes) {
+                    copy.layout = Object.assign({}, figure.layout, {
+                        shapes: figure.layout.shapes.map(function (shape) {
+                            if (!shape.name) {
+                                return shape;
+                            }
+                            return Object.assign({}, shape, {visible: selected.indexOf(shape.name) !== -1});
+                        })
+                    });
+                }
+                return copy;
+            }
+            return [apply(klineFigure), apply(indicatorFigure)];
+        }
+    }
+});
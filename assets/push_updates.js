@@ -0,0 +1,156 @@
+// 通过 /api/stream (SSE) 接收服务端推送的价格、K线和异常提醒，直接在浏览器中更新图表和最近提醒。
+// 登录成功后由客户端回调调用 window.pushUpdates.connect()；连接被拒绝（未登录、连接数已满）时
+// 关闭连接并在 RETRY_DELAY 后重试，期间页面按1秒定时刷新。
+(function () {
+    var RETRY_DELAY = 30000;
+    var source = null;
+    var retryAt = 0;
+
+    // 推送事件中的指标与图表曲线名称的对应关系
+    var KLINE_TRACES = {
+        "MA5": "MA5", "MA10": "MA10", "MA20": "MA20", "MA30": "MA30",
+        "BB_Upper": "布林上轨", "BB_Lower": "布林下轨"
+    };
+    var INDICATOR_TRACES = {
+        "RSI": "RSI", "MACD": "MACD", "Signal": "Signal", "MACD_Hist": "MACD Histogram"
+    };
+
+    function plotDiv(id) {
+        var container = document.getElementById(id);
+        return container ? container.querySelector(".js-plotly-plot") : null;
+    }
+
+    // 图表时间轴为按UTC编码的本地时刻毫秒数，推送的本地时间字符串按相同方式换算
+    function toTime(value) {
+        if (typeof value === "number") {
+            return value;
+        }
+        return new Date(String(value).replace(" ", "T") + "Z").getTime();
+    }
+
+    function lastTime(gd, index) {
+        var x = gd.data[index].x;
+        return x && x.length ? toTime(x[x.length - 1]) : -Infinity;
+    }
+
+    function extend(gd, values, time) {
+        // 图表已按多根K线聚合时不逐根追加，等待服务端刷新
+        if (!gd || !gd.data || !window.Plotly || (gd.layout.meta && gd.layout.meta.bucket > 1)) {
+            return false;
+        }
+        var extended = false;
+        gd.data.forEach(function (trace, i) {
+            if (!(trace.name in values) || lastTime(gd, i) >= toTime(time)) {
+                return;
+            }
+            var value = values[trace.name];
+            var update = {x: [[toTime(time)]]};
+            if (trace.type === "candlestick") {
+                ["open", "high", "low", "close"].forEach(function (key) {
+                    update[key] = [[value[key]]];
+                });
+            } else {
+                update.y = [[value]];
+            }
+            // 保持窗口长度不变，最旧的K线随新K线滑出
+            window.Plotly.extendTraces(gd, update, [i], trace.x ? trace.x.length : undefined);
+            extended = true;
+        });
+        return extended;
+    }
+
+    function toArray(values) {
+        return values ? Array.prototype.slice.call(values) : [];
+    }
+
+    // 布林带填充是上轨加反向下轨组成的多边形，随上下轨一起重建
+    function syncBand(gd) {
+        if (!gd || !gd.data || !window.Plotly) {
+            return;
+        }
+        var index = {};
+        gd.data.forEach(function (trace, i) {
+            index[trace.name] = i;
+        });
+        if (!("布林带" in index && "布林上轨" in index && "布林下轨" in index)) {
+            return;
+        }
+        var upper = gd.data[index["布林上轨"]];
+        var lower = gd.data[index["布林下轨"]];
+        window.Plotly.restyle(gd, {
+            x: [toArray(upper.x).concat(toArray(lower.x).reverse())],
+            y: [toArray(upper.y).concat(toArray(lower.y).reverse())]
+        }, [index["布林带"]]);
+    }
+
+    function applyCandle(candle) {
+        var klineValues = {"BTC/USDT": candle};
+        Object.keys(KLINE_TRACES).forEach(function (key) {
+            klineValues[KLINE_TRACES[key]] = candle.indicators[key];
+        });
+        var klineGraph = plotDiv("kline-graph");
+        if (extend(klineGraph, klineValues, candle.time)) {
+            syncBand(klineGraph);
+        }
+
+        var indicatorValues = {};
+        Object.keys(INDICATOR_TRACES).forEach(function (key) {
+            indicatorValues[INDICATOR_TRACES[key]] = candle.indicators[key];
+        });
+        extend(plotDiv("indicator-graph"), indicatorValues, candle.time);
+    }
+
+    function applyTick(tick) {
+        var price = document.getElementById("current-price");
+        if (price) {
+            price.textContent = Number(tick.price).toFixed(2);
+        }
+    }
+
+    function pad(value) {
+        return (value < 10 ? "0" : "") + value;
+    }
+
+    // 异常提醒立即插到最近提醒列表顶部，格式与服务端渲染的列表相同，下次刷新时由服务端列表覆盖
+    function applyAnomaly(anomaly) {
+        var list = document.getElementById("alert-list");
+        if (!list) {
+            return;
+        }
+        var now = new Date();
+        var line = "[" + pad(now.getHours()) + ":" + pad(now.getMinutes()) + ":" + pad(now.getSeconds()) + "] " +
+            anomaly.message;
+        var text = list.textContent;
+        list.textContent = !text || text === "暂无触发的提醒" ? line : line + "\n" + text;
+    }
+
+    function connect() {
+        if (!window.EventSource || source || Date.now() < retryAt) {
+            return;
+        }
+        source = new EventSource("/api/stream");
+        source.addEventListener("tick", function (e) {
+            applyTick(JSON.parse(e.data));
+        });
+        source.addEventListener("candle", function (e) {
+            applyCandle(JSON.parse(e.data));
+        });
+        source.addEventListener("anomaly", function (e) {
+            applyAnomaly(JSON.parse(e.data));
+        });
+        source.addEventListener("error", function () {
+            // 服务端拒绝（401/503）时浏览器不会自动重连，稍后再试
+            if (source && source.readyState === EventSource.CLOSED) {
+                source = null;
+                retryAt = Date.now() + RETRY_DELAY;
+            }
+        });
+    }
+
+    window.pushUpdates = {
+        connect: connect,
+        connected: function () {
+            return !!source && source.readyState === EventSource.OPEN;
+        }
+    };
+})();
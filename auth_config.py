@@ -23,4 +23,5 @@ SERVER_CONFIG = {
     "PORT": 8050,             # 服务端口
     "DEBUG": True,            # 开启调试模式
     "WORKERS": 4,             # 工作进程数
+    "THREADS": 32,            # 每个工作进程的线程数（推送长连接各占一个线程）
 } 
\ No newline at end of file
@@ -0,0 +1,268 @@
+import json
+import logging
+import numpy as np
+import pandas as pd
+from config import BACKTEST_FEE_RATE, BACKTEST_MAINTENANCE_RATE, DEFAULT_LEVERAGE, DEFAULT_POSITION_SIZE
+from technical_indicators import TechnicalIndicators
+
+# 信号取值：1 开仓，-1 平仓，0 保持
+ENTRY = 1
+EXIT = -1
+
+
+# ========== 数据加载 ==========
+def load_kline_frame(path='kline_history.json'):
+    """从持久化文件加载K线历史为DataFrame"""
+    with open(path, 'r') as f:
+        records = json.load(f)
+    df = pd.DataFrame(records)
+    if len(df) > 0:
+        df["时间"] = pd.to_datetime(df["时间"])
+    return df
+
+
+def _cross_above(a, b):
+    """a 上穿 b"""
+    prev_a = np.roll(a, 1)
+    prev_b = np.roll(b, 1)
+    cross = (a > b) & (prev_a <= prev_b)
+    cross[0] = False
+    return cross
+
+
+# ========== 信号规则 ==========
+class SignalRules:
+    """基于 TechnicalIndicators 的信号规则，返回与K线等长的信号数组"""
+
+    @staticmethod
+    def rsi_threshold(df, period=14, lower=30, upper=70):
+        """RSI 低于超卖线开仓，高于超买线平仓"""
+        df = TechnicalIndicators.calculate_rsi(df, period=period)
+        rsi = df['RSI'].to_numpy()
+        signals = np.zeros(len(df), dtype=np.int8)
+        signals[rsi < lower] = ENTRY
+        signals[rsi > upper] = EXIT
+        return signals
+
+    @staticmethod
+    def macd_cross(df, fast=12, slow=26, signal=9):
+        """MACD线上穿Signal线开仓，下穿平仓"""
+        df = TechnicalIndicators.calculate_macd(df, fast=fast, slow=slow, signal=signal)
+        macd = df['MACD'].to_numpy()
+        sig = df['Signal'].to_numpy()
+        signals = np.zeros(len(df), dtype=np.int8)
+        signals[_cross_above(macd, sig)] = ENTRY
+        signals[_cross_above(sig, macd)] = EXIT
+        return signals
+
+    @staticmethod
+    def ma_cross(df, fast=5, slow=20):
+        """快速均线上穿慢速均线开仓，下穿平仓"""
+        df = TechnicalIndicators.calculate_ma(df, periods=sorted({fast, slow}))
+        fast_ma = df[f'MA{fast}'].to_numpy()
+        slow_ma = df[f'MA{slow}'].to_numpy()
+        signals = np.zeros(len(df), dtype=np.int8)
+        signals[_cross_above(fast_ma, slow_ma)] = ENTRY
+        signals[_cross_above(slow_ma, fast_ma)] = EXIT
+        return signals
+
+    @staticmethod
+    def bollinger_touch(df, period=20, std_dev=2):
+        """收盘价触及布林下轨开仓，触及上轨平仓"""
+        df = TechnicalIndicators.calculate_bollinger_bands(df, period=period, std_dev=std_dev)
+        close = df['收盘价'].to_numpy()
+        signals = np.zeros(len(df), dtype=np.int8)
+        signals[close <= df['BB_Lower'].to_numpy()] = ENTRY
+        signals[close >= df['BB_Upper'].to_numpy()] = EXIT
+        return signals
+
+
+RULES = {
+    'rsi': SignalRules.rsi_threshold,
+    'macd': SignalRules.macd_cross,
+    'ma': SignalRules.ma_cross,
+    'bollinger': SignalRules.bollinger_touch,
+}
+
+
+# ========== 向量化回测 ==========
+def signals_to_positions(signals):
+    """将开平仓信号转换为逐K线持仓状态（1 持仓，0 空仓）"""
+    state = np.full(len(signals), np.nan)
+    state[signals == ENTRY] = 1.0
+    state[signals == EXIT] = 0.0
+    return pd.Series(state).ffill().fillna(0.0).to_numpy()
+
+
+def _simulate_trades(close, adverse, signals, side, threshold, trade_pnl_of, margin):
+    """
+    按信号逐笔模拟交易，返回 [(开仓索引, 平仓索引, 平仓价, 是否强平)]。
+    持仓期间 adverse（多头为最低价、空头为最高价）相对开仓价的不利变动达到 threshold 时，
+    以强平价平仓，之后空仓直到下一个开仓信号；权益降到0时停止，不再开仓。
+    """
+    n = len(close)
+    entries = np.flatnonzero(signals == ENTRY)
+    exits = np.flatnonzero(signals == EXIT)
+    trades = []
+    equity = margin
+    i = 0
+    while equity > 0:
+        k = np.searchsorted(entries, i)
+        if k == len(entries):
+            break
+        entry = int(entries[k])
+        k = np.searchsorted(exits, entry, side='right')
+        exit_ = int(exits[k]) if k < len(exits) else n - 1  # 没有平仓信号时回测结束强制平仓
+        if exit_ == entry:
+            break  # 最后一根K线才开仓，没有持仓区间
+        liq_price = close[entry] * (1 - side * threshold)
+        window = adverse[entry + 1:exit_ + 1]
+        hit = np.flatnonzero(window <= liq_price if side > 0 else window >= liq_price)
+        if len(hit):
+            exit_ = entry + 1 + int(hit[0])
+            trades.append((entry, exit_, liq_price, True))
+            equity -= margin
+        else:
+            trades.append((entry, exit_, close[exit_], False))
+            equity += trade_pnl_of(close[entry], close[exit_])
+        i = exit_ + 1
+    return trades
+
+
+def evaluate_signals(close, signals, direction='long', leverage=DEFAULT_LEVERAGE,
+                     position_size=DEFAULT_POSITION_SIZE, fee_rate=BACKTEST_FEE_RATE,
+                     maintenance_rate=BACKTEST_MAINTENANCE_RATE, low=None, high=None):
+    """
+    在收盘价序列上评估信号，返回交易明细和资金曲线。
+    信号在K线收盘时以收盘价成交；持仓数量为保证金，名义价值 = 持仓数量 × 杠杆。
+    空仓方向使用相反的信号：卖出信号开空，买入信号平空。
+    逐仓强平：不利价格变动达到 1/杠杆 − 维持保证金率时按强平价平仓，单笔亏损以保证金为限，
+    传入 low/high 时用K线最低/最高价判断，否则只用收盘价。权益降到0后停止交易。
+    """
+    close = np.asarray(close, dtype=np.float64)
+    signals = np.asarray(signals)
+    side = 1.0
+    if direction == 'short':
+        signals = -signals
+        side = -1.0
+    extreme = low if side > 0 else high
+    adverse = close if extreme is None else np.asarray(extreme, dtype=np.float64)
+
+    n = len(close)
+    notional = position_size * leverage
+    trade_fees = 2 * notional * fee_rate
+    threshold = max(1.0 / leverage - maintenance_rate, 0.0)
+
+    def trade_pnl_of(entry_price, exit_price):
+        return (exit_price / entry_price - 1) * notional * side - trade_fees
+
+    simulated = _simulate_trades(close, adverse, signals, side, threshold, trade_pnl_of, position_size)
+    entry_idx = np.array([t[0] for t in simulated], dtype=np.int64)
+    exit_idx = np.array([t[1] for t in simulated], dtype=np.int64)
+    exit_price = np.array([t[2] for t in simulated], dtype=np.float64)
+    liquidated = np.array([t[3] for t in simulated], dtype=bool)
+    entry_price = close[entry_idx]
+
+    # 逐K线持仓：开仓K线到平仓前一根为1
+    positions = np.zeros(n)
+    quantity = np.zeros(n)
+    for entry, exit_ in zip(entry_idx, exit_idx):
+        positions[entry:exit_] = 1.0
+        quantity[entry:exit_] = notional / close[entry]
+
+    # 逐K线盈亏：上一根K线的持仓数量 × 本根价格变化
+    bar_pnl = np.zeros(n)
+    bar_pnl[1:] = quantity[:-1] * np.diff(close) * side
+
+    # 手续费：开仓和平仓各按名义价值收取一次，强平不收平仓手续费
+    bar_fees = np.zeros(n)
+    np.add.at(bar_fees, entry_idx, notional * fee_rate)
+    np.add.at(bar_fees, exit_idx[~liquidated], notional * fee_rate)
+
+    # 强平K线：该笔交易的累计亏损恰好为保证金
+    for entry, exit_ in zip(entry_idx[liquidated], exit_idx[liquidated]):
+        held = bar_pnl[entry + 1:exit_].sum()
+        bar_pnl[exit_] = -position_size + notional * fee_rate - held
+
+    # 权益以0为下限：亏损超过剩余权益时账户归零，_simulate_trades 也不再开仓
+    equity = np.maximum(position_size + np.cumsum(bar_pnl - bar_fees), 0.0)
+    peak = np.maximum.accumulate(equity) if len(equity) else equity
+    drawdown = equity - peak
+
+    trade_pnl = np.where(liquidated, -position_size, (exit_price / entry_price - 1) * notional * side - trade_fees)
+    trades = pd.DataFrame({
+        "开仓索引": entry_idx,
+        "平仓索引": exit_idx,
+        "开仓价": entry_price,
+        "平仓价": exit_price,
+        "盈亏": trade_pnl,
+        "手续费": np.where(liquidated, notional * fee_rate, trade_fees),
+        "强平": liquidated,
+    })
+
+    peak_safe = np.where(peak > 0, peak, np.nan)
+    return {
+        "trades": trades,
+        "equity": equity,
+        "drawdown": drawdown,
+        "total_pnl": float(equity[-1] - position_size) if len(equity) else 0.0,
+        "total_fees": float(bar_fees.sum()),
+        "max_drawdown": float(-drawdown.min()) if len(drawdown) else 0.0,
+        "max_drawdown_pct": float(np.nanmax(-drawdown / peak_safe)) if len(drawdown) else 0.0,
+        "trade_count": int(len(trades)),
+        "win_rate": float((trade_pnl > 0).mean()) if len(trades) else 0.0,
+        "liquidations": int(liquidated.sum()),
+        "bankrupt": bool(len(equity) and equity[-1] <= 0),
+    }
+
+
+class Backtester:
+    """离线回测，杠杆和持仓数量与持仓面板的输入一致"""
+
+    def __init__(self, leverage=DEFAULT_LEVERAGE, position_size=DEFAULT_POSITION_SIZE,
+                 direction='long', fee_rate=BACKTEST_FEE_RATE, maintenance_rate=BACKTEST_MAINTENANCE_RATE):
+        self.leverage = leverage
+        self.position_size = position_size
+        self.direction = direction
+        self.fee_rate = fee_rate
+        self.maintenance_rate = maintenance_rate
+
+    def run(self, df, rule, **params):
+        """运行单条信号规则，rule 为 RULES 中的名称或可调用对象"""
+        rule_func = RULES[rule] if isinstance(rule, str) else rule
+        df = df.copy()
+        signals = rule_func(df, **params)
+        result = evaluate_signals(
+            df['收盘价'].to_numpy(), signals,
+            direction=self.direction,
+            leverage=self.leverage,
+            position_size=self.position_size,
+            fee_rate=self.fee_rate,
+            maintenance_rate=self.maintenance_rate,
+            low=df['最低价'].to_numpy() if '最低价' in df.columns else None,
+            high=df['最高价'].to_numpy() if '最高价' in df.columns else None
+        )
+        # 补充交易时间
+        if "时间" in df.columns and len(result["trades"]) > 0:
+            times = df["时间"].to_numpy()
+            result["trades"].insert(0, "开仓时间", times[result["trades"]["开仓索引"]])
+            result["trades"].insert(1, "平仓时间", times[result["trades"]["平仓索引"]])
+        return result
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    path = sys.argv[1] if len(sys.argv) > 1 else 'kline_history.json'
+    df = load_kline_frame(path)
+    backtester = Backtester()
+    for name in RULES:
+        start = time.perf_counter()
+        result = backtester.run(df, name)
+        elapsed = time.perf_counter() - start
+        logging.info(
+            f"{name}: 交易 {result['trade_count']} 笔（强平 {result['liquidations']} 笔），盈亏 {result['total_pnl']:.2f} USDT，"
+            f"手续费 {result['total_fees']:.2f}，最大回撤 {result['max_drawdown']:.2f}，耗时 {elapsed * 1000:.1f}ms"
+        )
@@ -1,18 +1,46 @@
-import json
+import time
+BOOT_STARTED = time.time()  # 进程启动时间，用于统计启动到首个可用图表的耗时
+import numpy as np
 import pandas as pd
 import requests
 import threading
-import time
 import logging
 from datetime import datetime
 from websocket import WebSocketApp
-from dash import Dash, dcc, html, callback_context
-from dash.dependencies import Input, Output, State
+from dash import Dash, dcc, html, callback_context, Patch
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from flask import request, jsonify
+from werkzeug.middleware.proxy_fix import ProxyFix
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 import plotly.graph_objs as go
-from plotly.subplots import make_subplots
 from config import *
 from technical_indicators import TechnicalIndicators
-from functools import wraps
+from price_alerts import AlertEngine, AlertDispatcher, logging_sink, webhook_sink, check_percent, UP, DOWN
+from order_book import OrderBookStream
+from trade_aggregator import TradeStream
+from shared_market_data import SharedKlineStore, wait_for_store, open_time_of
+from chart_downsampling import CandlePyramid, LINE_COLUMNS, point_budget, range_to_ms
+from kline_api import register_kline_routes, KLINE_COLUMNS
+from profiling import (
+    timed, stage_timer, register_profile_routes, IngestorProfiler, handle_command as handle_profile_command,
+    published_timings,
+)
+from metrics import (
+    BUFFER_ITEMS, BUFFER_CAPACITY, KLINE_GAPS, MISSING_CANDLES, PERSIST_DURATION, WS_RECONNECTS,
+    DUPLICATE_CANDLES, BACKFILLED_CANDLES, EVENT_LAG, EVENTS_DROPPED, RETENTION_BYTES, ANOMALIES, STATUS_DROPPED,
+    instrument_handler, observe_lag, register_metrics_route, render as render_metrics
+)
+from push_updates import PushHub, StoreWatcher, register_push_routes, candle_payload
+from session_store import SessionStore
+from rate_limiter import RateLimiter, get_client_ip, register_request_throttle
+from logging_setup import setup_logging
+from feed_replay import captured, capture_snapshots, start_capture
+from candle_index import CandleIndex, INSERTED, DUPLICATE
+from kline_retention import RetentionManager, WARM, COLD, RESOLUTION, DAY_MS
+from event_bus import EventBus, Tick, CandleClosed, CandleStored, GapFilled, Anomaly
+from anomaly_detector import AnomalyDetector, RETURN
+import fast_json
+from functools import wraps, lru_cache
 import secrets
 from auth_config import (
     ACCESS_TOKEN, 
@@ -25,24 +53,50 @@ import ssl
 import os
 
 # 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
 
 # ========== 全局变量 ==========
-kline_history = []
-chat_history = []
+candle_index = CandleIndex()  # 按开盘时间去重的K线索引，所有写入都经过它
+kline_history = candle_index.records  # 始终是同一个列表，只由 candle_index 原位修改
+retention = RetentionManager(candle_index)  # 内存只保留最新 MAX_KLINE_HISTORY 根，更早的K线写入磁盘分层
 ws = None
-app = Dash(__name__)
+try:
+    import flask_compress  # noqa: F401
+    compress_responses = COMPRESS_RESPONSES
+except ImportError:
+    compress_responses = False  # 未安装 flask-compress 时不压缩
+app = Dash(__name__, compress=compress_responses)
+server = app.server  # WSGI入口，供多进程部署使用
+server.config['COMPRESS_STREAMS'] = False  # SSE 推送不能被整体缓冲压缩
+if TRUSTED_PROXY_COUNT:
+    # 只信任最近 TRUSTED_PROXY_COUNT 层代理添加的 X-Forwarded-For 地址
+    server.wsgi_app = ProxyFix(server.wsgi_app, x_for=TRUSTED_PROXY_COUNT)
 has_data = False  # 添加数据状态标志
 current_interval = "1m"  # 默认1分钟K线
-current_price = 0  # 添加当前价格变量
-login_attempts = {}  # 记录登录尝试次数
+# 登录失败次数限制：MAX_LOGIN_ATTEMPTS 次后需等待令牌在 LOGIN_TIMEOUT 内逐步恢复
+login_limiter = RateLimiter(
+    rate=SECURITY_CONFIG["MAX_LOGIN_ATTEMPTS"] / SECURITY_CONFIG["LOGIN_TIMEOUT"],
+    capacity=SECURITY_CONFIG["MAX_LOGIN_ATTEMPTS"]
+)
+callback_limiter = RateLimiter(rate=CALLBACK_RATE_LIMIT, capacity=CALLBACK_BURST)  # 按客户端和回调限流
+analyze_limiter = RateLimiter(rate=ANALYZE_RATE_LIMIT, capacity=ANALYZE_BURST)  # 按客户端限制DeepSeek分析
+order_book_stream = OrderBookStream()  # 本地盘口
+trade_stream = TradeStream()  # 逐笔成交聚合的秒级K线
+alert_engine = AlertEngine(AlertDispatcher([logging_sink, webhook_sink] if ALERT_WEBHOOK_URL else [logging_sink]))
+market_store = None  # 多进程模式下的共享行情存储
+command_queue = None  # 多进程模式下服务进程发往采集进程的命令队列
+ingestor_profiler = None  # 多进程模式下服务进程转发性能分析请求到采集进程
+push_hub = PushHub()  # 浏览器推送
+push_token_signer = URLSafeTimedSerializer(ACCESS_TOKEN, salt="push-stream")  # 推送凭证签名，多进程间一致
+store_watcher = None  # 多进程模式下监视共享存储的推送线程
+session_store = SessionStore()  # 按会话隔离的聊天记录和持仓输入
+chart_pyramid = None  # 图表使用的多分辨率K线，K线收盘后重建
+chart_disk = None  # 图表使用的磁盘K线：(起始日, 已读到的开盘时间, 开盘时间数组, {列名: 数组})
+kline_columns = None  # 数据接口使用的按列K线，K线收盘后重建
+event_bus = EventBus()  # 行情处理只发布事件，订阅者在 start_ingestion 中注册
+anomaly_detector = AnomalyDetector()  # 收盘K线收益率和成交量的在线异常检测
+last_anomaly_analysis = 0.0  # 上次自动分析异常的时间
+first_chart_rendered = False  # 是否已记录首个图表的生成耗时
 
 # ========== 访问控制装饰器 ==========
 def require_auth(f):
@@ -72,76 +126,119 @@ def login(n_clicks, password):
     if not n_clicks:
         return "请输入访问密码"
     
-    # 获取客户端IP（仅用于日志）
-    ctx = callback_context
-    headers = ctx.triggered[0].get('headers', {})
-    client_ip = headers.get('X-Forwarded-For', 'unknown')
+    client_ip = get_client_ip(request)
     
     # 检查登录尝试次数
-    if client_ip in login_attempts:
-        if login_attempts[client_ip] >= SECURITY_CONFIG["MAX_LOGIN_ATTEMPTS"]:
-            return "登录尝试次数过多，请稍后再试"
+    if login_limiter.available(client_ip) < 1:
+        return f"登录尝试次数过多，请 {login_limiter.retry_after(client_ip):.0f} 秒后再试"
     
     if password == ACCESS_TOKEN:
-        # 登录成功，重置尝试次数
-        login_attempts[client_ip] = 0
+        # 登录成功，重置尝试次数，并下发推送连接使用的凭证
+        login_limiter.reset(client_ip)
+        callback_context.response.set_cookie(
+            PUSH_TOKEN_COOKIE, push_token_signer.dumps(client_ip), max_age=TOKEN_EXPIRY,
+            httponly=True, samesite='Strict', secure=request.is_secure
+        )
         logging.info(f"成功登录: {client_ip}")
         return "登录成功"
     
-    # 登录失败，增加尝试次数
-    login_attempts[client_ip] = login_attempts.get(client_ip, 0) + 1
+    # 登录失败，消耗一次尝试
+    login_limiter.allow(client_ip)
     logging.warning(f"登录失败: {client_ip}")
     return "密码错误"
 
+# ========== 回调限流 ==========
+# 在进入Dash回调（数据处理、DeepSeek调用）和数据接口之前按客户端和接口拒绝过量请求，
+# 回调按 app.callback_map 中注册的 output 区分，未知的 output 同一客户端共用一个键
+register_request_throttle(server, callback_limiter, app.callback_map, paths=('/api/klines', '/api/stream'))
+
 # ========== 获取历史数据 ==========
-def fetch_historical_data():
-    global kline_history, has_data
+def kline_record(kline):
+    """REST K线数组转换为K线记录"""
+    return {
+        "时间": datetime.fromtimestamp(kline[0] / 1000).strftime('%Y-%m-%d %H:%M:%S'),
+        "开盘时间": kline[0],
+        "开盘价": float(kline[1]),
+        "最高价": float(kline[2]),
+        "最低价": float(kline[3]),
+        "收盘价": float(kline[4]),
+        "成交量": float(kline[5])
+    }
+
+def fetch_klines(start_time, end_time, limit=20, closed_only=False):
+    """通过REST获取 [start_time, end_time] 内的1分钟K线记录"""
+    url = "https://api.binance.com/api/v3/klines"
+    params = {
+        "symbol": "BTCUSDT",
+        "interval": "1m",  # 使用1分钟K线
+        "limit": limit,
+        "startTime": start_time,
+        "endTime": end_time
+    }
+    response = requests.get(url, params=params, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+    if closed_only:
+        # 只取已收盘的K线，未收盘的由WebSocket在收盘时写入
+        now = int(time.time() * 1000)
+        data = [kline for kline in data if kline[6] < now]
+    return [kline_record(kline) for kline in data]
+
+def fetch_historical_data(since_ms=None):
+    """
+    获取最近 MAX_KLINE_HISTORY 根历史K线。指定 since_ms 时只补齐该时间之后缺失的已收盘K线，
+    并合并到已加载的K线中。
+    """
+    global has_data
     try:
         # 计算时间戳
         end_time = int(time.time() * 1000)
-        # 获取20分钟前的时间戳（确保有足够数据计算RSI）
-        start_time = end_time - (20 * 60 * 1000)  # 20分钟前
-        
-        # 构建请求URL
-        url = "https://api.binance.com/api/v3/klines"
-        params = {
-            "symbol": "BTCUSDT",
-            "interval": "1m",  # 使用1分钟K线
-            "limit": 20,  # 获取20根K线
-            "startTime": start_time,
-            "endTime": end_time
-        }
-        
-        # 发送请求
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        # 热层大小的窗口（确保有足够数据计算RSI），单次请求最多1000根
+        window = min(MAX_KLINE_HISTORY, 1000)
+        start_time = end_time - window * 60 * 1000
+        if since_ms is not None:
+            start_time = max(start_time, since_ms)
         
-        # 清空历史数据
-        kline_history = []
-        
-        # 处理数据
-        for kline in data:
-            time_str = datetime.fromtimestamp(kline[0] / 1000).strftime('%Y-%m-%d %H:%M:%S')
-            kline_data = {
-                "时间": time_str,
-                "开盘价": float(kline[1]),
-                "最高价": float(kline[2]),
-                "最低价": float(kline[3]),
-                "收盘价": float(kline[4]),
-                "成交量": float(kline[5])
-            }
-            kline_history.append(kline_data)
+        records = fetch_klines(start_time, end_time, limit=window, closed_only=since_ms is not None)
+        if since_ms is None:
+            # 清空历史数据
+            candle_index.clear()
+        # 与已有K线重叠的部分按开盘时间去重
+        candle_index.upsert_many(records)
         
         # 更新数据状态
         has_data = len(kline_history) >= 14  # 修改为至少需要14根K线
-        logging.info(f"成功获取 {len(kline_history)} 根历史K线数据")
+        logging.info(f"成功获取 {len(records)} 根历史K线数据")
         return True
         
     except Exception as e:
         logging.error(f"获取历史数据失败: {e}")
         return False
 
+def backfill_gap(gap):
+    """
+    通过REST补齐缺口 (首个缺失开盘时间, 最后缺失开盘时间) 内的K线，返回补齐数量。
+    单次请求最多1000根，只补缺口的最后1000分钟；早于热层的K线随 enforce 写入温层。
+    """
+    start_time = max(gap[0], gap[1] - 999 * 60 * 1000)
+    try:
+        records = fetch_klines(start_time, gap[1], limit=min(candle_index.missing_count((start_time, gap[1])), 1000),
+                               closed_only=True)
+    except Exception as e:
+        logging.error(f"补齐缺失K线失败: {e}")
+        return 0
+    filled = candle_index.upsert_many(records)[INSERTED]
+    retention.enforce()
+    BACKFILLED_CANDLES.inc(filled)
+    logging.info(f"已补齐 {filled} 根缺失K线")
+    if filled:
+        event_bus.publish(GapFilled(gap, filled))
+    return filled
+
+def schedule_backfill(gap):
+    """在后台线程中补齐缺口，不阻塞行情处理；补齐后发布 GapFilled，由订阅者保存和发布"""
+    threading.Thread(target=backfill_gap, args=(gap,), daemon=True).start()
+
 # ========== WebSocket 相关函数 ==========
 def on_error(ws, error):
     logging.error(f"WebSocket错误: {error}")
@@ -159,6 +256,7 @@ def reconnect_websocket():
     while retries < MAX_RETRIES:
         try:
             logging.info(f"尝试重新连接WebSocket (尝试 {retries + 1}/{MAX_RETRIES})")
+            WS_RECONNECTS.labels("kline").inc()
             ws = WebSocketApp(WS_URL, on_message=on_message, on_error=on_error, 
                             on_close=on_close, on_open=on_open)
             ws.run_forever()
@@ -170,65 +268,442 @@ def reconnect_websocket():
     if retries == MAX_RETRIES:
         logging.error("达到最大重试次数，停止重连")
 
+@captured("kline")
+@instrument_handler("kline")
+@timed()
 def on_message(ws, message):
-    global kline_history, has_data
+    """只解析并发布事件，写入、持久化、指标和提醒都由事件总线的订阅者在各自线程中处理"""
+    timer = stage_timer()
     try:
-        data = json.loads(message)
-        kline = data["k"]
-
-        if kline["x"]:
-            time_str = datetime.fromtimestamp(kline["t"] / 1000).strftime('%Y-%m-%d %H:%M:%S')
-            kline_data = {
-                "时间": time_str,
-                "开盘价": float(kline["o"]),
-                "最高价": float(kline["h"]),
-                "最低价": float(kline["l"]),
-                "收盘价": float(kline["c"]),
-                "成交量": float(kline["v"])
-            }
-
-            # 清理超过20分钟的数据（确保有足够数据计算RSI）
-            current_time = datetime.now()
-            kline_history = [
-                data for data in kline_history 
-                if (current_time - datetime.strptime(data["时间"], '%Y-%m-%d %H:%M:%S')).total_seconds() <= 1200  # 20分钟 = 1200秒
-            ]
-            
-            # 添加新数据
-            kline_history.append(kline_data)
-            
-            # 更新数据状态
-            has_data = len(kline_history) >= 14  # 修改为至少需要14根K线
-            
-            # 保存数据到文件
-            save_data()
+        event_time, open_time, open_price, high, low, close, volume, closed = fast_json.parse_kline(message)
+        observe_lag("kline", event_time)
+        timer.lap("parse")
+
+        event_bus.publish(Tick(close, event_time))
+        if closed:
+            event_bus.publish(CandleClosed({
+                "时间": datetime.fromtimestamp(open_time / 1000).strftime('%Y-%m-%d %H:%M:%S'),
+                "开盘时间": open_time,
+                "开盘价": open_price,
+                "最高价": high,
+                "最低价": low,
+                "收盘价": close,
+                "成交量": volume
+            }, event_time))
+        timer.lap("publish")
     except Exception as e:
         logging.error(f"处理消息时出错: {e}")
 
+# ========== 事件订阅者 ==========
+@timed()
+def handle_tick(event):
+    """每个tick检查价格提醒，并写入共享存储和推送"""
+    alert_engine.on_price(event.price)
+    if market_store is not None:
+        market_store.write_tick(event.price, event.event_time)
+    push_hub.publish("tick", {"price": event.price, "time": event.event_time})
+
+@timed()
+def handle_candle_closed(event):
+    """收盘K线写入索引，检查缺口并清理过期数据，写入成功后发布 CandleStored"""
+    global has_data
+    kline_data = event.candle
+    open_time = kline_data["开盘时间"]
+    # 检查与上一根K线之间是否有缺失，缺失的部分在后台补齐
+    gap = candle_index.gap_before(open_time)
+
+    # 添加新数据，重放或重连后重复推送的K线直接丢弃
+    if candle_index.upsert(kline_data) == DUPLICATE:
+        return
+    if gap:
+        missing = candle_index.missing_count(gap)
+        KLINE_GAPS.inc()
+        MISSING_CANDLES.inc(missing)
+        logging.warning(f"K线不连续，{kline_data['时间']} 之前缺少 {missing} 根，开始补齐")
+        schedule_backfill(gap)
+
+    # 超过 MAX_KLINE_HISTORY 的旧K线移到温层
+    retention.enforce()
+
+    # 更新数据状态
+    has_data = len(kline_history) >= 14  # 修改为至少需要14根K线
+    event_bus.publish(CandleStored(kline_data))
+
+@timed()
+def handle_history_changed(event):
+    """K线收盘或缺口补齐后保存到文件，并把过期的温层分段压缩到冷层"""
+    save_data()
+    retention.compact()
+
+@timed()
+def handle_indicators(event):
+    """K线收盘或缺口补齐后重算指标，写入共享存储并推送给浏览器"""
+    publish_candles()
+    publish_candle_update()
+
+@timed()
+def handle_indicator_alerts(event):
+    """K线收盘后检查指标提醒"""
+    check_indicator_alerts()
+
+@timed()
+def handle_anomaly_check(event):
+    """收盘K线输入异常检测，检测到的异常作为 Anomaly 事件发布"""
+    candle = event.candle
+    for anomaly in anomaly_detector.on_candle(SYMBOL, current_interval, open_time_of(candle),
+                                              candle["收盘价"], candle["成交量"]):
+        event_bus.publish(anomaly)
+
+def describe_anomaly(anomaly):
+    time_str = datetime.fromtimestamp(anomaly.open_time / 1000).strftime('%H:%M')
+    if anomaly.metric == RETURN:
+        change = (np.exp(anomaly.value) - 1) * 100
+        what = f"价格异动 {change:+.2f}%"
+    else:
+        what = f"成交量放大至 {anomaly.value:.2f}"
+    return (f"{anomaly.symbol} {anomaly.interval} {time_str} {what}"
+            f"（z={anomaly.zscore:.1f}，近期z={anomaly.ewma_zscore:.1f}）")
+
+@timed()
+def handle_anomaly(event):
+    """异常提醒：记录到最近提醒并分发、推送给浏览器，按配置自动调用 DeepSeek 分析"""
+    global last_anomaly_analysis
+    message = describe_anomaly(event)
+    logging.warning(f"检测到异常: {message}")
+    ANOMALIES.labels(event.metric).inc()
+    alert_engine.notify(message, type="anomaly", **event._asdict())
+    push_hub.publish("anomaly", dict(event._asdict(), message=message))
+    if not ANOMALY_AUTO_ANALYZE or len(kline_history) < 14:
+        return
+    if time.time() - last_anomaly_analysis < ANOMALY_ANALYZE_COOLDOWN:
+        return
+    last_anomaly_analysis = time.time()
+    df = get_indicator_frame().tail(20)
+    latest = df.iloc[-1]
+    kline_data = "\n".join(
+        f"时间: {row['时间']}，开盘: {row['开盘价']:.2f}，高: {row['最高价']:.2f}，低: {row['最低价']:.2f}，"
+        f"收: {row['收盘价']:.2f}，量: {row['成交量']:.2f}"
+        for _, row in df.iterrows()
+    )
+    prompt = f"""
+检测到异常行情：{message}
+
+最近20根BTC/USDT K线数据：
+{kline_data}
+
+当前技术指标：RSI {latest['RSI']:.2f}，MACD {latest['MACD']:.2f}，Signal {latest['Signal']:.2f}
+
+请判断这次异动的可能原因、是否可能延续，并给出简短的风险提示和操作建议。
+"""
+    result = deepseek_api_call(prompt)
+    alert_engine.notify(f"异常分析（{message}）：\n{result}", type="anomaly_analysis")
+
+def check_indicator_alerts():
+    """用最新收盘的K线计算RSI/MACD并检查指标提醒"""
+    if len(kline_history) < 14 or not alert_engine.list_alerts():
+        return
+    df = TechnicalIndicators.calculate_rsi(pd.DataFrame(candle_index.snapshot(60)))
+    df = TechnicalIndicators.calculate_macd(df)
+    latest = df.iloc[-1]
+    alert_engine.on_indicators({
+        "RSI": float(latest["RSI"]),
+        "MACD": float(latest["MACD"]),
+        "MACD_Hist": float(latest["MACD_Hist"])
+    })
+
+def start_event_subscribers():
+    """注册事件订阅者，每个订阅者有独立的有界队列和工作线程；重复调用无副作用"""
+    if event_bus.subscriptions():
+        return
+    subscribers = [
+        ("ticks", handle_tick, (Tick,)),
+        ("history", handle_candle_closed, (CandleClosed,)),
+        ("persist", handle_history_changed, (CandleStored, GapFilled)),
+        ("indicators", handle_indicators, (CandleStored, GapFilled)),
+        ("alerts", handle_indicator_alerts, (CandleStored,)),
+        ("anomaly_check", handle_anomaly_check, (CandleStored,)),
+        ("anomalies", handle_anomaly, (Anomaly,)),
+    ]
+    for name, handler, event_types in subscribers:
+        subscription = event_bus.subscribe(name, handler, event_types, EVENT_QUEUE_SIZE,
+                                           EVENT_OVERFLOW_POLICY.get(name, "drop_oldest"))
+        BUFFER_ITEMS.labels(f"bus_{name}").set_function(subscription.pending)
+        BUFFER_CAPACITY.labels(f"bus_{name}").set_function(subscription.capacity)
+        EVENT_LAG.labels(name).set_function(subscription.lag)
+        EVENTS_DROPPED.labels(name).set_function(lambda subscription=subscription: subscription.dropped)
+
 # ========== 数据持久化 ==========
 def save_data():
     try:
-        with open('kline_history.json', 'w') as f:
-            json.dump(kline_history, f)
+        start = time.perf_counter()
+        with open('kline_history.json', 'wb') as f:
+            f.write(fast_json.dumps_bytes(candle_index.snapshot()))
+        PERSIST_DURATION.observe(time.perf_counter() - start)
     except Exception as e:
         logging.error(f"保存数据失败: {e}")
 
 def load_data():
-    global kline_history
     try:
-        with open('kline_history.json', 'r') as f:
-            kline_history = json.load(f)
+        with open('kline_history.json', 'rb') as f:
+            records = fast_json.loads(f.read())
+        candle_index.clear()
+        candle_index.upsert_many(records)
     except FileNotFoundError:
         logging.info("未找到历史数据文件")
     except Exception as e:
         logging.error(f"加载数据失败: {e}")
 
+# ========== 共享行情数据 ==========
+def is_reader():
+    """是否为只读取共享存储的服务进程"""
+    return market_store is not None and not market_store.writer
+
+def attach_market_store(writer=False):
+    """挂载共享行情存储，采集进程以写入方式创建，服务进程等待并只读映射"""
+    global market_store, ingestor_profiler
+    if writer:
+        market_store = SharedKlineStore(MARKET_STORE_PATH, writer=True)
+        STATUS_DROPPED.labels().set_function(lambda: market_store.status_dropped)
+    else:
+        market_store = wait_for_store(MARKET_STORE_PATH)
+        if command_queue is not None:
+            ingestor_profiler = IngestorProfiler(command_queue.put, market_store.status)
+    return market_store
+
+def get_kline_history():
+    """当前K线记录的快照，服务进程从共享存储读取"""
+    if is_reader():
+        return market_store.to_records()
+    return candle_index.snapshot()
+
+def get_indicator_frame(history=None):
+    """包含技术指标的K线DataFrame，服务进程直接读取采集进程算好的指标；history 为已取得的K线快照"""
+    if is_reader():
+        return market_store.to_frame()
+    df = pd.DataFrame(candle_index.snapshot() if history is None else history)
+    df["时间"] = pd.to_datetime(df["时间"])
+    return TechnicalIndicators.calculate_all_indicators(df)
+
+def publish_candles():
+    """采集进程将K线和指标写入共享存储"""
+    history = candle_index.snapshot()  # 订阅者线程中读取，先取快照
+    if market_store is None or not market_store.writer or len(history) == 0:
+        return
+    df = pd.DataFrame(history)
+    df["开盘时间"] = [open_time_of(record) for record in history]
+    df = TechnicalIndicators.calculate_all_indicators(df)
+    market_store.write_candles(df)
+
+def publish_candle_update():
+    """向浏览器推送新收盘的K线及指标"""
+    if push_hub.subscriber_count == 0 or len(kline_history) == 0:
+        return
+    df = get_indicator_frame()
+    push_hub.publish("candle", candle_payload(df.iloc[-1]))
+
+def chart_disk_columns(start_ms, before_ms):
+    """
+    分层存储中 [start_ms 所在日, before_ms) 的K线（列式）。按天整体读取一次，
+    之后只增量读取新移出内存的K线，不必每根K线收盘都重新解析整段温层文件。
+    """
+    global chart_disk
+    day = start_ms // DAY_MS
+    if chart_disk is None or chart_disk[0] != day:
+        open_time, columns = records_to_columns(retention.query(day * DAY_MS, before_ms - 1))
+        chart_disk = (day, before_ms, open_time, columns)
+    elif before_ms > chart_disk[1]:
+        open_time, columns = records_to_columns(retention.query(chart_disk[1], before_ms - 1))
+        _, _, cached_time, cached = chart_disk
+        chart_disk = (day, before_ms, np.concatenate([cached_time, open_time]),
+                      {column: np.concatenate([cached[column], columns[column]]) for column in cached})
+    _, _, open_time, columns = chart_disk
+    end = int(np.searchsorted(open_time, before_ms, side='left'))
+    return open_time[:end], {column: values[:end] for column, values in columns.items()}
+
+def get_chart_frame(open_time, columns):
+    """
+    图表使用的K线：CHART_HISTORY_DAYS 天内分层存储中的K线接在内存K线之前。
+    指标只在最后一段1分钟K线上计算，降采样的冷层K线不显示指标。
+    """
+    if len(open_time):
+        disk_time, disk_columns = chart_disk_columns(int(open_time[-1]) - CHART_HISTORY_DAYS * DAY_MS, int(open_time[0]))
+        open_time = np.concatenate([disk_time, open_time])
+        columns = {column: np.concatenate([disk_columns[column], columns[column]]) for column in KLINE_COLUMNS + [RESOLUTION]}
+    df = pd.DataFrame({column: columns[column] for column in KLINE_COLUMNS})
+    coarse = np.flatnonzero(columns[RESOLUTION] != candle_index.interval_ms)
+    fine_start = int(coarse[-1]) + 1 if len(coarse) else 0
+    indicators = TechnicalIndicators.calculate_all_indicators(df.iloc[fine_start:].reset_index(drop=True))
+    for column in LINE_COLUMNS:
+        values = np.full(len(df), np.nan)
+        values[fine_start:] = indicators[column].to_numpy(dtype=np.float64)
+        df[column] = values
+    df.insert(0, "开盘时间", open_time)
+    return df
+
+def get_chart_pyramid():
+    """多分辨率K线金字塔，数据没有变化时复用上次的结果"""
+    global chart_pyramid
+    open_time, columns = get_kline_columns()  # 内存（或共享存储）中的K线，开盘时间和各列来自同一份快照
+    key = (len(open_time), int(open_time[-1])) if len(open_time) else None
+    if key is None:
+        return None
+    if chart_pyramid is None or chart_pyramid[0] != key:
+        chart_pyramid = (key, CandlePyramid(get_chart_frame(open_time, columns), base_ms=candle_index.interval_ms))
+    return chart_pyramid[1]
+
+def ensure_store_watcher():
+    """服务进程在首个浏览器订阅时启动共享存储监视"""
+    global store_watcher
+    if is_reader() and store_watcher is None:
+        store_watcher = StoreWatcher(push_hub, market_store)
+        store_watcher.start()
+
+def push_authorized():
+    """推送连接需要 Bearer 令牌，或登录成功时下发的未过期推送凭证"""
+    if request.headers.get('Authorization', '') == f"Bearer {ACCESS_TOKEN}":
+        return True
+    token = request.cookies.get(PUSH_TOKEN_COOKIE)
+    if not token:
+        return False
+    try:
+        push_token_signer.loads(token, max_age=TOKEN_EXPIRY)
+        return True
+    except BadSignature:
+        return False
+
+if PUSH_ENABLED:
+    register_push_routes(server, push_hub, on_subscribe=ensure_store_watcher,
+                         authorize=push_authorized, get_client=lambda: get_client_ip(request))
+
+def records_to_columns(records):
+    open_time = np.array([open_time_of(record) for record in records], dtype=np.int64)
+    columns = {column: np.array([record[column] for record in records], dtype=np.float64)
+               for column in KLINE_COLUMNS}
+    # 冷层K线为降采样后的周期，其余为1分钟
+    columns[RESOLUTION] = np.array([record.get(RESOLUTION, candle_index.interval_ms) for record in records],
+                                   dtype=np.int64)
+    return open_time, columns
+
+def get_kline_columns(start_ms=None, end_ms=None):
+    """
+    按列的K线：(升序开盘时间数组, {列名: 数组})，供区间查询接口二分查找。
+    start_ms 早于内存中最早的K线时，从磁盘的温层和冷层读取更早的部分拼接在前面，
+    RESOLUTION 列为每行的周期（冷层为降采样周期）。
+    """
+    global kline_columns
+    if is_reader():
+        open_time, columns = market_store.snapshot()
+        columns[RESOLUTION] = np.full(len(open_time), candle_index.interval_ms, dtype=np.int64)
+    else:
+        history = candle_index.snapshot()
+        key = (len(history), open_time_of(history[-1])) if history else None
+        if kline_columns is None or kline_columns[0] != key:
+            kline_columns = (key, records_to_columns(history))
+        open_time, columns = kline_columns[1]
+    if start_ms is None or (len(open_time) and start_ms >= open_time[0]):
+        return open_time, columns
+    older_end = int(open_time[0]) - 1 if len(open_time) else end_ms
+    if end_ms is not None and older_end is not None:
+        older_end = min(older_end, end_ms)
+    older = [record for record in retention.query(start_ms, older_end)
+             if not len(open_time) or open_time_of(record) < open_time[0]]
+    if not older:
+        return open_time, columns
+    older_time, older_columns = records_to_columns(older)
+    return (np.concatenate([older_time, open_time]),
+            {column: np.concatenate([older_columns[column], columns[column]]) for column in KLINE_COLUMNS + [RESOLUTION]})
+
+register_kline_routes(server, get_kline_columns, SYMBOL, lambda: current_interval, token=ACCESS_TOKEN)
+register_profile_routes(server, token=ACCESS_TOKEN, ingestor=lambda: ingestor_profiler)
+
+# ========== 运行指标 ==========
+BUFFER_ITEMS.labels("kline_history").set_function(lambda: len(kline_history))
+BUFFER_CAPACITY.labels("kline_history").set_function(lambda: retention.hot_size)
+RETENTION_BYTES.labels(WARM).set_function(lambda: retention.disk_usage(WARM))
+RETENTION_BYTES.labels(COLD).set_function(lambda: retention.disk_usage(COLD))
+DUPLICATE_CANDLES.labels().set_function(lambda: candle_index.duplicates)
+BUFFER_ITEMS.labels("order_book_bids").set_function(lambda: order_book_stream.book.bids.size)
+BUFFER_CAPACITY.labels("order_book_bids").set_function(lambda: order_book_stream.book.bids.capacity)
+BUFFER_ITEMS.labels("order_book_asks").set_function(lambda: order_book_stream.book.asks.size)
+BUFFER_CAPACITY.labels("order_book_asks").set_function(lambda: order_book_stream.book.asks.capacity)
+for seconds, bars in trade_stream.aggregator.bars.items():
+    BUFFER_ITEMS.labels(f"trade_bars_{seconds}s").set_function(lambda bars=bars: bars.count)
+    BUFFER_CAPACITY.labels(f"trade_bars_{seconds}s").set_function(lambda bars=bars: bars.capacity)
+BUFFER_ITEMS.labels("alert_queue").set_function(alert_engine.dispatcher.pending)
+BUFFER_CAPACITY.labels("alert_queue").set_function(alert_engine.dispatcher.capacity)
+BUFFER_ITEMS.labels("push_queue").set_function(push_hub.pending)
+BUFFER_CAPACITY.labels("push_queue").set_function(lambda: push_hub.subscriber_count * push_hub.queue_size)
+
+def get_metrics_text():
+    """采集指标在采集进程中，服务进程读取其发布到共享存储的文本"""
+    if is_reader():
+        return market_store.status().get("metrics", "")
+    return render_metrics()
+
+register_metrics_route(server, get_metrics_text)
+
+def build_market_status():
+    """汇总盘口、秒级K线和提醒状态"""
+    status = {
+        "order_book": None,
+        "trade_summary": "",
+        "recent_alerts": list(alert_engine.recent),
+        "alert_count": len(alert_engine.list_alerts())
+    }
+    book = order_book_stream.book
+    bid, bid_qty = book.best_bid()
+    ask, ask_qty = book.best_ask()
+    if order_book_stream.synced and bid is not None and ask is not None:
+        bid_depth, ask_depth = book.depth_within(0.5)
+        status["order_book"] = {
+            "bid": bid,
+            "bid_qty": bid_qty,
+            "ask": ask,
+            "ask_qty": ask_qty,
+            "bid_depth": bid_depth,
+            "ask_depth": ask_depth,
+            "summary": book.summary_text()
+        }
+    trade_stream.aggregator.flush()
+    status["trade_summary"] = trade_stream.aggregator.summary_text(seconds=5, n=12)
+    return status
+
+def get_market_status():
+    if is_reader():
+        return market_store.status()
+    return build_market_status()
+
+def run_status_publisher(interval=1.0):
+    """采集进程定时发布状态（含运行指标）"""
+    while True:
+        try:
+            status = build_market_status()
+            status["metrics"] = render_metrics()
+            status["profile"] = published_timings()
+            market_store.write_status(status)
+        except Exception as e:
+            logging.error(f"发布状态失败: {e}")
+        time.sleep(interval)
+
+def run_command_consumer():
+    """采集进程处理服务进程提交的命令"""
+    while True:
+        command = command_queue.get()
+        try:
+            if command["command"] == "add_alert":
+                apply_alert_command(command["alert_type"], command["value"])
+            elif command["command"].startswith("profile"):
+                handle_profile_command(command)
+        except Exception as e:
+            logging.error(f"处理命令失败: {e}")
+
 # ========== DeepSeek 分析函数 ==========
 def deepseek_api_call(prompt):
     """调用 DeepSeek API 获取分析结果"""
     try:
         logging.info("开始调用 DeepSeek API...")
-        logging.info(f"请求内容：\n{prompt}")
+        logging.info(f"请求内容 {len(prompt)} 字符")
+        logging.debug(f"请求内容：\n{prompt}")
         
         # 构建请求数据
         data = {
@@ -367,14 +842,25 @@ app.layout = html.Div([
         "padding": "20px"
     }),
     
+    # 会话标识（浏览器会话级存储）
+    dcc.Store(id='session-id', storage_type='session'),
+    
+    # 图表可视范围和宽度，缩放时按新范围重新查询
+    dcc.Store(id='chart-viewport'),
+    
     # 主界面
     html.Div([
-        # 添加定时更新组件
+        # 添加定时更新组件（推送连接正常时仅作为低频兜底刷新）
         dcc.Interval(
             id='interval-component',
-            interval=1000,  # 每秒更新一次
+            interval=1000,
             n_intervals=0
         ),
+        # 登录后建立推送连接，并按连接状态切换定时刷新间隔（只在浏览器中执行）
+        dcc.Interval(id='push-monitor', interval=2000, n_intervals=0, disabled=not PUSH_ENABLED),
+        dcc.Store(id='push-config', data={"fallback": PUSH_FALLBACK_INTERVAL, "poll": 1000}),
+        # 盘口和已触发提醒不经推送，始终按1秒刷新（推送连接正常时上面的定时器会放慢）
+        dcc.Interval(id='status-interval', interval=STATUS_REFRESH_INTERVAL, n_intervals=0),
         
         # 顶部导航栏
         html.Div([
@@ -539,6 +1025,14 @@ app.layout = html.Div([
                                                "marginTop": "5px",
                                                "fontSize": "13px"})
                             ], style={"marginBottom": "8px"}),
+                            html.Div([
+                                html.Label("盘口：", style={"fontSize": "13px"}),
+                                html.Div(id='order-book-summary',
+                                        style={"marginTop": "5px",
+                                               "color": "#374151",
+                                               "fontSize": "12px",
+                                               "whiteSpace": "pre-wrap"})
+                            ], style={"marginBottom": "8px"}),
                             html.Div([
                                 html.Label("仓位方向：", style={"fontSize": "13px"}),
                                 dcc.Dropdown(
@@ -553,7 +1047,7 @@ app.layout = html.Div([
                             ], style={"marginBottom": "8px"}),
                             html.Div([
                                 html.Label("杠杆倍数：", style={"fontSize": "13px"}),
-                                dcc.Input(id='leverage', type='number', value=10,
+                                dcc.Input(id='leverage', type='number', value=DEFAULT_LEVERAGE,
                                          style={"width": "100%", 
                                                 "marginTop": "5px",
                                                 "padding": "6px",
@@ -563,7 +1057,7 @@ app.layout = html.Div([
                             ], style={"marginBottom": "8px"}),
                             html.Div([
                                 html.Label("持仓数量(USDT)：", style={"fontSize": "13px"}),
-                                dcc.Input(id='position-size', type='number', value=50,
+                                dcc.Input(id='position-size', type='number', value=DEFAULT_POSITION_SIZE,
                                          style={"width": "100%", 
                                                 "marginTop": "5px",
                                                 "padding": "6px",
@@ -579,6 +1073,64 @@ app.layout = html.Div([
                         "transition": "all 0.3s ease-in-out",
                         "opacity": "0"
                     })
+                ]),
+
+                # 价格提醒
+                html.Div([
+                    html.Div([
+                        html.I(className="fas fa-bell", style={"marginRight": "12px", "fontSize": "16px"}),
+                        "价格提醒"
+                    ], style={
+                        "padding": "12px 16px",
+                        "borderBottom": "1px solid #e5e7eb",
+                        "fontSize": "14px",
+                        "fontWeight": "500",
+                        "color": "#374151",
+                        "display": "flex",
+                        "alignItems": "center"
+                    }),
+                    html.Div([
+                        dcc.Dropdown(
+                            id='alert-type',
+                            options=[
+                                {'label': '价格上穿', 'value': 'price_up'},
+                                {'label': '价格下穿', 'value': 'price_down'},
+                                {'label': '涨跌幅(%)', 'value': 'percent'},
+                                {'label': 'RSI上穿', 'value': 'rsi_up'},
+                                {'label': 'RSI下穿', 'value': 'rsi_down'},
+                                {'label': 'MACD上穿', 'value': 'macd_up'},
+                                {'label': 'MACD下穿', 'value': 'macd_down'}
+                            ],
+                            value='price_up',
+                            clearable=False,
+                            style={"fontSize": "13px", "marginBottom": "8px"}
+                        ),
+                        dcc.Input(id='alert-value', type='number',
+                                 placeholder="阈值",
+                                 style={"width": "100%",
+                                        "padding": "6px",
+                                        "border": "1px solid #e5e7eb",
+                                        "borderRadius": "4px",
+                                        "fontSize": "13px",
+                                        "marginBottom": "8px",
+                                        "boxSizing": "border-box"}),
+                        html.Button('添加提醒', id='add-alert-button', n_clicks=0,
+                                   style={"width": "100%",
+                                          "padding": "6px",
+                                          "backgroundColor": "#3b82f6",
+                                          "color": "white",
+                                          "border": "none",
+                                          "borderRadius": "4px",
+                                          "fontSize": "13px",
+                                          "cursor": "pointer"}),
+                        html.Div(id='alert-status',
+                                style={"marginTop": "8px", "color": "#6b7280", "fontSize": "12px"}),
+                        html.Div(id='alert-list',
+                                style={"marginTop": "8px",
+                                       "color": "#374151",
+                                       "fontSize": "12px",
+                                       "whiteSpace": "pre-wrap"})
+                    ], style={"padding": "12px"})
                 ])
             ], style={
                 "width": "240px",
@@ -795,172 +1347,37 @@ app.layout = html.Div([
     ], id='main-container', style={"display": "none"})
 ])
 
-# ========== 登录状态回调 ==========
-@app.callback(
+# ========== 登录状态回调（客户端） ==========
+app.clientside_callback(
+    ClientsideFunction(namespace='ui', function_name='updateVisibility'),
     [Output('login-container', 'style'),
      Output('main-container', 'style')],
     [Input('login-status', 'children')]
 )
-def update_visibility(login_status):
-    if login_status == "登录成功":
-        return {"display": "none"}, {"display": "block"}
-    return {"display": "flex"}, {"display": "none"}
 
-# ========== 图表更新回调 ==========
-@app.callback(
-    [Output('kline-graph', 'figure', allow_duplicate=True),
-     Output('indicator-graph', 'figure', allow_duplicate=True)],
-    [Input('interval-component', 'n_intervals'),
-     Input('technical-indicators', 'value')],
-    prevent_initial_call=True
-)
-def update_charts(n_intervals, selected_indicators):
-    # 设置主题颜色
-    bg_color = '#ffffff'
-    text_color = '#1f2937'
-    grid_color = '#e5e7eb'
-    plot_bg_color = '#ffffff'
-    
-    # 创建K线图
-    kline_fig = go.Figure()
-    indicator_fig = make_subplots(
-        rows=1, cols=2,
-        subplot_titles=('RSI指标', 'MACD指标'),
-        column_widths=[0.5, 0.5]
+if PUSH_ENABLED:
+    app.clientside_callback(
+        ClientsideFunction(namespace='ui', function_name='syncPush'),
+        Output('interval-component', 'interval'),
+        [Input('push-monitor', 'n_intervals'),
+         Input('login-status', 'children')],
+        [State('push-config', 'data'),
+         State('interval-component', 'interval')]
     )
 
-    if len(kline_history) == 0:
-        # 如果没有数据，显示等待消息
-        kline_fig.add_annotation(
-            text="等待数据收集...",
-            xref="paper",
-            yref="paper",
-            x=0.5,
-            y=0.5,
-            showarrow=False,
-            font=dict(color=text_color)
-        )
-        indicator_fig.add_annotation(
-            text="等待数据收集...",
-            xref="paper",
-            yref="paper",
-            x=0.5,
-            y=0.5,
-            showarrow=False,
-            font=dict(color=text_color)
-        )
-    else:
-        try:
-            df = pd.DataFrame(kline_history)
-            df["时间"] = pd.to_datetime(df["时间"])
+# ========== 图表布局模板 ==========
+# 布局只在首次渲染时发送，之后的刷新只替换曲线数据
+CHART_TEXT_COLOR = '#1f2937'
+CHART_GRID_COLOR = '#e5e7eb'
 
-            # 计算技术指标
-            df = TechnicalIndicators.calculate_all_indicators(df)
-            
-            # 添加K线图
-            kline_fig.add_trace(
-                go.Candlestick(
-                    x=df["时间"],
-                    open=df["开盘价"],
-                    high=df["最高价"],
-                    low=df["最低价"],
-                    close=df["收盘价"],
-                    name="BTC/USDT",
-                    increasing_line_color='#26a69a',  # 上涨为绿色
-                    decreasing_line_color='#ef5350',  # 下跌为红色
-                    increasing_fillcolor='#26a69a',
-                    decreasing_fillcolor='#ef5350'
-                )
-            )
-            
-            # 根据选择的技术指标添加相应的线
-            if 'ma' in selected_indicators:
-                kline_fig.add_trace(go.Scatter(
-                    x=df["时间"], 
-                    y=df["MA5"], 
-                    name="MA5", 
-                    line=dict(color='#2196f3', width=1)
-                ))
-                kline_fig.add_trace(go.Scatter(
-                    x=df["时间"], 
-                    y=df["MA10"], 
-                    name="MA10", 
-                    line=dict(color='#ff9800', width=1)
-                ))
-                kline_fig.add_trace(go.Scatter(
-                    x=df["时间"], 
-                    y=df["MA20"], 
-                    name="MA20", 
-                    line=dict(color='#4caf50', width=1)
-                ))
-                kline_fig.add_trace(go.Scatter(
-                    x=df["时间"], 
-                    y=df["MA30"], 
-                    name="MA30", 
-                    line=dict(color='#f44336', width=1)
-                ))
-            
-            if 'bollinger' in selected_indicators:
-                kline_fig.add_trace(go.Scatter(
-                    x=df["时间"], 
-                    y=df["BB_Upper"], 
-                    name="布林上轨", 
-                    line=dict(color='#9e9e9e', dash='dash', width=1)
-                ))
-                kline_fig.add_trace(go.Scatter(
-                    x=df["时间"], 
-                    y=df["BB_Lower"], 
-                    name="布林下轨", 
-                    line=dict(color='#9e9e9e', dash='dash', width=1)
-                ))
-                
-                # 添加布林带填充
-                kline_fig.add_trace(go.Scatter(
-                    x=df["时间"].tolist() + df["时间"].tolist()[::-1],
-                    y=df["BB_Upper"].tolist() + df["BB_Lower"].tolist()[::-1],
-                    fill='toself',
-                    fillcolor='rgba(158, 158, 158, 0.1)',
-                    line=dict(color='rgba(255,255,255,0)'),
-                    name='布林带'
-                ))
-            
-            # 添加RSI图（左侧）
-            if 'rsi' in selected_indicators:
-                indicator_fig.add_trace(go.Scatter(x=df["时间"], y=df["RSI"], name="RSI", 
-                                                 line=dict(color='purple')), row=1, col=1)
-                indicator_fig.add_trace(go.Scatter(x=df["时间"], y=[70] * len(df), name="超买线", 
-                                                 line=dict(color='red', dash='dash')), row=1, col=1)
-                indicator_fig.add_trace(go.Scatter(x=df["时间"], y=[30] * len(df), name="超卖线", 
-                                                 line=dict(color='green', dash='dash')), row=1, col=1)
-            
-            # 添加MACD图（右侧）
-            if 'macd' in selected_indicators:
-                indicator_fig.add_trace(go.Scatter(x=df["时间"], y=df["MACD"], name="MACD", 
-                                                 line=dict(color='blue')), row=1, col=2)
-                indicator_fig.add_trace(go.Scatter(x=df["时间"], y=df["Signal"], name="Signal", 
-                                                 line=dict(color='orange')), row=1, col=2)
-                indicator_fig.add_trace(go.Bar(x=df["时间"], y=df["MACD_Hist"], name="MACD Histogram", 
-                                             marker_color='gray'), row=1, col=2)
-            
-        except Exception as e:
-            logging.error(f"更新图表失败: {e}")
-            kline_fig.add_annotation(
-                text=f"图表更新失败: {str(e)}",
-                xref="paper",
-                yref="paper",
-                x=0.5,
-                y=0.5,
-                showarrow=False,
-                font=dict(color=text_color)
-            )
-    
-    # 更新K线图布局
-    kline_fig.update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=plot_bg_color,
-        font=dict(color=text_color),
+def build_kline_layout():
+    return go.Layout(
+        paper_bgcolor='#ffffff',
+        plot_bgcolor='#ffffff',
+        font=dict(color=CHART_TEXT_COLOR),
         margin=dict(l=10, r=10, t=20, b=10),
         showlegend=True,
+        uirevision='kline',  # 刷新数据时保留用户的缩放
         legend=dict(
             orientation="h",
             yanchor="bottom",
@@ -974,9 +1391,9 @@ def update_charts(n_intervals, selected_indicators):
         ),
         xaxis=dict(
             showgrid=True,
-            gridcolor=grid_color,
+            gridcolor=CHART_GRID_COLOR,
             showline=True,
-            linecolor=grid_color,
+            linecolor=CHART_GRID_COLOR,
             rangeslider=dict(visible=False),  # 禁用范围滑块
             type='date',
             tickformat='%H:%M',  # 只显示时间
@@ -985,9 +1402,9 @@ def update_charts(n_intervals, selected_indicators):
         ),
         yaxis=dict(
             showgrid=True,
-            gridcolor=grid_color,
+            gridcolor=CHART_GRID_COLOR,
             showline=True,
-            linecolor=grid_color,
+            linecolor=CHART_GRID_COLOR,
             title=dict(text='价格 (USDT)', font=dict(size=10)),
             tickformat='.2f',  # 保留两位小数
             tickfont=dict(size=10)
@@ -999,17 +1416,25 @@ def update_charts(n_intervals, selected_indicators):
             y=0.95,
             xanchor='center',
             yanchor='top',
-            font=dict(size=14, color=text_color)
+            font=dict(size=14, color=CHART_TEXT_COLOR)
         )
     )
-    
-    # 更新技术指标图布局
-    indicator_fig.update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=plot_bg_color,
-        font=dict(color=text_color),
+
+def build_indicator_layout():
+    """RSI/MACD 左右两个子图的布局，RSI超买超卖参考线作为布局中的水平线"""
+    from plotly.subplots import make_subplots
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=('RSI指标', 'MACD指标'),
+        column_widths=[0.5, 0.5]
+    )
+    fig.update_layout(
+        paper_bgcolor='#ffffff',
+        plot_bgcolor='#ffffff',
+        font=dict(color=CHART_TEXT_COLOR),
         margin=dict(l=10, r=10, t=20, b=10),
         showlegend=True,
+        uirevision='indicator',
         legend=dict(
             orientation="h",
             yanchor="bottom",
@@ -1020,28 +1445,192 @@ def update_charts(n_intervals, selected_indicators):
         ),
         height=250  # 减小图表高度
     )
-    
-    # 更新技术指标图的坐标轴
-    indicator_fig.update_xaxes(
-        showgrid=True, 
-        gridcolor=grid_color, 
-        showline=True, 
-        linecolor=grid_color,
+    fig.update_xaxes(
+        showgrid=True,
+        gridcolor=CHART_GRID_COLOR,
+        showline=True,
+        linecolor=CHART_GRID_COLOR,
+        type='date',
         tickfont=dict(size=10)
     )
-    indicator_fig.update_yaxes(
-        showgrid=True, 
-        gridcolor=grid_color, 
-        showline=True, 
-        linecolor=grid_color,
+    fig.update_yaxes(
+        showgrid=True,
+        gridcolor=CHART_GRID_COLOR,
+        showline=True,
+        linecolor=CHART_GRID_COLOR,
         tickfont=dict(size=10)
     )
-    
-    # 更新RSI的Y轴范围
-    if 'rsi' in selected_indicators:
-        indicator_fig.update_yaxes(range=[0, 100], row=1, col=1)
-    
-    return kline_fig, indicator_fig
+    # RSI的Y轴范围固定为0-100
+    fig.update_yaxes(range=[0, 100], row=1, col=1)
+    fig.add_hline(y=70, line=dict(color='red', dash='dash', width=1), name='rsi', row=1, col=1)
+    fig.add_hline(y=30, line=dict(color='green', dash='dash', width=1), name='rsi', row=1, col=1)
+    return fig.layout
+
+@lru_cache(maxsize=None)
+def chart_layouts():
+    """
+    首次渲染时才构建布局模板（plotly 校验器加载较慢，采集进程用不到），
+    返回 (K线图布局, 指标图布局, 指标图子图标题)。子图标题也是注释，替换注释时需要保留。
+    """
+    indicator_layout = build_indicator_layout()
+    return build_kline_layout(), indicator_layout, list(indicator_layout.annotations)
+
+def chart_message(text):
+    """图表中央的提示文字"""
+    return go.layout.Annotation(
+        text=text,
+        xref="paper",
+        yref="paper",
+        x=0.5,
+        y=0.5,
+        showarrow=False,
+        font=dict(color=CHART_TEXT_COLOR)
+    )
+
+def build_chart_traces(viewport, selected_indicators):
+    """
+    生成K线图和指标图的曲线，返回 (K线曲线, 指标曲线, 提示注释, 聚合倍数)。
+    指标曲线使用 WebGL 渲染，数值按显示精度取整以减小传输体积。
+    """
+    if len(get_kline_history()) == 0:
+        return [], [], [chart_message("等待数据收集...")], 1
+    try:
+        # 按图表宽度和可视范围从多分辨率金字塔取数，点数与历史长度无关
+        timer = stage_timer()
+        viewport = viewport or {}
+        start_ms, end_ms = range_to_ms(viewport.get("range"))
+        bucket, df, lines = get_chart_pyramid().query(
+            start_ms, end_ms, max_points=point_budget(viewport.get("width"))
+        )
+        timer.lap("indicator")
+    except Exception as e:
+        logging.error(f"更新图表失败: {e}")
+        return [], [], [chart_message(f"图表更新失败: {str(e)}")], 1
+
+    kline_traces = [
+        go.Candlestick(
+            x=df["时间"],
+            open=df["开盘价"].round(2),
+            high=df["最高价"].round(2),
+            low=df["最低价"].round(2),
+            close=df["收盘价"].round(2),
+            name="BTC/USDT",
+            increasing_line_color='#26a69a',  # 上涨为绿色
+            decreasing_line_color='#ef5350',  # 下跌为红色
+            increasing_fillcolor='#26a69a',
+            decreasing_fillcolor='#ef5350'
+        )
+    ]
+
+    # 始终生成全部指标曲线，按 legendgroup 由客户端回调切换可见性
+    def line(column, name, group, color, decimals=2, dash=None, width=1, **kwargs):
+        x, y = lines[column]
+        return go.Scattergl(
+            x=x,
+            y=y.round(decimals),
+            name=name,
+            legendgroup=group,
+            visible=group in selected_indicators,
+            line=dict(color=color, dash=dash, width=width),
+            **kwargs
+        )
+
+    kline_traces += [
+        line("MA5", "MA5", 'ma', '#2196f3'),
+        line("MA10", "MA10", 'ma', '#ff9800'),
+        line("MA20", "MA20", 'ma', '#4caf50'),
+        line("MA30", "MA30", 'ma', '#f44336'),
+        line("BB_Upper", "布林上轨", 'bollinger', '#9e9e9e', dash='dash'),
+        line("BB_Lower", "布林下轨", 'bollinger', '#9e9e9e', dash='dash'),
+    ]
+
+    # 布林带填充（单个多边形，保持 SVG 渲染）
+    upper_x, upper_y = lines["BB_Upper"]
+    lower_x, lower_y = lines["BB_Lower"]
+    kline_traces.append(go.Scatter(
+        x=np.concatenate([upper_x, lower_x[::-1]]),
+        y=np.concatenate([upper_y, lower_y[::-1]]).round(2),
+        fill='toself',
+        fillcolor='rgba(158, 158, 158, 0.1)',
+        line=dict(color='rgba(255,255,255,0)'),
+        name='布林带',
+        legendgroup='bollinger',
+        visible='bollinger' in selected_indicators
+    ))
+
+    # RSI在左侧子图，MACD在右侧子图
+    hist_x, hist_y = lines["MACD_Hist"]
+    indicator_traces = [
+        line("RSI", "RSI", 'rsi', 'purple', width=2, xaxis='x', yaxis='y'),
+        line("MACD", "MACD", 'macd', 'blue', decimals=4, width=2, xaxis='x2', yaxis='y2'),
+        line("Signal", "Signal", 'macd', 'orange', decimals=4, width=2, xaxis='x2', yaxis='y2'),
+        go.Bar(x=hist_x, y=hist_y.round(4), name="MACD Histogram",
+               legendgroup='macd', visible='macd' in selected_indicators,
+               marker_color='gray', xaxis='x2', yaxis='y2'),
+    ]
+    timer.lap("traces")
+    return kline_traces, indicator_traces, [], bucket
+
+# ========== 图表更新回调 ==========
+@app.callback(
+    [Output('kline-graph', 'figure', allow_duplicate=True),
+     Output('indicator-graph', 'figure', allow_duplicate=True)],
+    [Input('interval-component', 'n_intervals'),
+     Input('login-status', 'children'),
+     Input('chart-viewport', 'data')],
+    [State('technical-indicators', 'value')],
+    prevent_initial_call=True
+)
+@timed()
+def update_charts(n_intervals, login_status, viewport, selected_indicators):
+    global first_chart_rendered
+    selected_indicators = selected_indicators or []
+    kline_traces, indicator_traces, messages, bucket = build_chart_traces(viewport, selected_indicators)
+    if kline_traces and not first_chart_rendered:
+        first_chart_rendered = True
+        logging.info(f"首个图表已生成，距进程启动 {time.time() - BOOT_STARTED:.2f} 秒")
+    meta = {"bucket": bucket}  # 推送脚本只在未聚合时追加K线
+
+    # 登录后首次渲染发送完整图表，之后只替换曲线、提示和聚合倍数，布局留在浏览器中
+    ctx = callback_context
+    if any(t['prop_id'].startswith('login-status') for t in ctx.triggered):
+        kline_layout, indicator_layout, indicator_titles = chart_layouts()
+        kline_fig = go.Figure(data=kline_traces, layout=kline_layout)
+        kline_fig.update_layout(annotations=messages, meta=meta)
+        indicator_fig = go.Figure(data=indicator_traces, layout=indicator_layout)
+        indicator_fig.update_layout(annotations=indicator_titles + messages, meta=meta)
+        # 参考线的可见性与RSI曲线一致
+        indicator_fig.update_shapes(visible='rsi' in selected_indicators, selector=dict(name='rsi'))
+        return kline_fig, indicator_fig
+
+    kline_patch = Patch()
+    kline_patch['data'] = kline_traces
+    kline_patch['layout']['annotations'] = messages
+    kline_patch['layout']['meta'] = meta
+    indicator_patch = Patch()
+    indicator_patch['data'] = indicator_traces
+    indicator_patch['layout']['annotations'] = chart_layouts()[2] + messages
+    indicator_patch['layout']['meta'] = meta
+    return kline_patch, indicator_patch
+
+# ========== 图表缩放范围跟踪（客户端） ==========
+app.clientside_callback(
+    ClientsideFunction(namespace='ui', function_name='trackViewport'),
+    Output('chart-viewport', 'data'),
+    [Input('kline-graph', 'relayoutData')],
+    [State('chart-viewport', 'data')]
+)
+
+# ========== 技术指标显示切换（客户端） ==========
+app.clientside_callback(
+    ClientsideFunction(namespace='ui', function_name='toggleIndicators'),
+    [Output('kline-graph', 'figure', allow_duplicate=True),
+     Output('indicator-graph', 'figure', allow_duplicate=True)],
+    [Input('technical-indicators', 'value')],
+    [State('kline-graph', 'figure'),
+     State('indicator-graph', 'figure')],
+    prevent_initial_call=True
+)
 
 # ========== 更新当前价格回调 ==========
 @app.callback(
@@ -1049,13 +1638,29 @@ def update_charts(n_intervals, selected_indicators):
      Output('entry-price', 'value')],
     [Input('interval-component', 'n_intervals')]
 )
+@timed()
 def update_current_price(n):
-    global current_price
-    if len(kline_history) > 0:
-        current_price = kline_history[-1]["收盘价"]
+    history = get_kline_history()
+    if len(history) > 0:
+        current_price = history[-1]["收盘价"]
         return f"{current_price:.2f}", current_price
     return "等待数据...", 0
 
+# ========== 盘口回调 ==========
+@app.callback(
+    Output('order-book-summary', 'children'),
+    [Input('status-interval', 'n_intervals')]
+)
+def update_order_book(n):
+    book = get_market_status().get("order_book")
+    if not book:
+        return "等待盘口数据..."
+    return (
+        f"买一 {book['bid']:.2f} ({book['bid_qty']:.3f})\n"
+        f"卖一 {book['ask']:.2f} ({book['ask_qty']:.3f})\n"
+        f"±0.5% 买/卖: {book['bid_depth']:.2f} / {book['ask_depth']:.2f} BTC"
+    )
+
 # ========== DeepSeek 分析回调 ==========
 @app.callback(
     [Output('deepseek-chat-box', 'children'),
@@ -1066,11 +1671,11 @@ def update_current_price(n):
      State('entry-price', 'value'),
      State('position-direction', 'value'),
      State('leverage', 'value'),
-     State('position-size', 'value')]
+     State('position-size', 'value'),
+     State('session-id', 'data')]
 )
-def analyze(n_clicks, buy_clicks, previous_content, entry_price, position_direction, leverage, position_size):
-    global chat_history, kline_history
-    
+@timed()
+def analyze(n_clicks, buy_clicks, previous_content, entry_price, position_direction, leverage, position_size, session_id):
     # 获取触发回调的按钮
     ctx = callback_context
     if not ctx.triggered:
@@ -1084,19 +1689,31 @@ def analyze(n_clicks, buy_clicks, previous_content, entry_price, position_direct
     elif button_id == 'buy-analyze-button' and (buy_clicks is None or buy_clicks == 0):
         return previous_content or '点击"获取买入建议"按钮以获取分析结果', 'circle'
     
+    # 限制分析频率，超限时不做任何数据处理
+    client_ip = get_client_ip(request)
+    if not analyze_limiter.allow(client_ip):
+        return f"分析请求过于频繁，请 {analyze_limiter.retry_after(client_ip):.0f} 秒后再试", 'circle'
+    
     # 检查数据是否足够
-    if len(kline_history) < 14:
-        return f"数据量不足，请等待更多数据收集后再试（当前：{len(kline_history)}根K线，需要至少14根）", 'circle'
+    history = get_kline_history()
+    if len(history) < 14:
+        return f"数据量不足，请等待更多数据收集后再试（当前：{len(history)}根K线，需要至少14根）", 'circle'
     
     try:
+        timer = stage_timer()
+        market_status = get_market_status()
+        current_price = history[-1]["收盘价"]
+        session_store.save_position(session_id, entry_price, position_direction, leverage, position_size)
+        
         # 获取最近20根K线数据
-        df = pd.DataFrame(kline_history[-20:])
+        df = pd.DataFrame(history[-20:])
         
         # 计算技术指标
         df = TechnicalIndicators.calculate_all_indicators(df)
         
         # 获取最新的技术指标值
         latest = df.iloc[-1]
+        timer.lap("indicator")
         
         # 构建更详细的分析提示
         kline_data = "\n".join([
@@ -1115,6 +1732,10 @@ def analyze(n_clicks, buy_clicks, previous_content, entry_price, position_direct
 - 计划买入金额: {position_size:.2f} USDT
 """
             analysis_type = "买入"
+            # 短线买入参考秒级K线
+            short_term_info = market_status.get("trade_summary")
+            if short_term_info:
+                position_info += f"\n{short_term_info}\n"
             analysis_points = """
 1. 当前趋势判断
 2. 支撑位和阻力位
@@ -1153,6 +1774,9 @@ def analyze(n_clicks, buy_clicks, previous_content, entry_price, position_direct
 - MA30: {latest['MA30']:.2f}
 """
         
+        # 添加盘口深度信息
+        depth_info = (market_status.get("order_book") or {}).get("summary", "")
+        
         prompt = f"""
 最近20根BTC/USDT K线数据：
 {kline_data}
@@ -1161,22 +1785,29 @@ def analyze(n_clicks, buy_clicks, previous_content, entry_price, position_direct
 
 {indicators_info}
 
+{depth_info}
+
 请基于以上数据和技术指标状态，分析当前市场情况并给出具体的{analysis_type}建议。
 分析时请考虑：
 {analysis_points}
 """
         
+        timer.lap("prompt")
+        
         # 调用API获取分析结果
         logging.info("开始调用 DeepSeek API...")
         result = deepseek_api_call(prompt)
-        logging.info(f"DeepSeek API 返回结果：\n{result}")
+        timer.lap("llm")
+        logging.info(f"DeepSeek API 返回结果 {len(result)} 字符")
+        logging.debug(f"DeepSeek API 返回结果：\n{result}")
         
         # 记录时间戳和结果
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         chat_entry = f"[{timestamp}] {analysis_type}分析结果：\n{result}\n"
         
-        # 只保留最新的分析结果
-        chat_history = [chat_entry]
+        # 记录到当前会话
+        session_store.add_analysis(session_id, chat_entry)
+        timer.lap("session")
         
         return chat_entry, 'circle'
         
@@ -1184,8 +1815,101 @@ def analyze(n_clicks, buy_clicks, previous_content, entry_price, position_direct
         logging.error(f"分析失败: {str(e)}")
         return f"分析过程中出现错误：{str(e)}\n请稍后重试", 'circle'
 
-# ========== 菜单折叠回调 ==========
+# ========== 会话回调 ==========
+app.clientside_callback(
+    """
+    function(loginStatus, sessionId) {
+        if (sessionId) {
+            return sessionId;
+        }
+        if (window.crypto && window.crypto.randomUUID) {
+            return window.crypto.randomUUID();
+        }
+        return Date.now().toString(36) + Math.random().toString(36).slice(2);
+    }
+    """,
+    Output('session-id', 'data'),
+    [Input('login-status', 'children')],
+    [State('session-id', 'data')]
+)
+
+@app.callback(
+    [Output('deepseek-chat-box', 'children', allow_duplicate=True),
+     Output('position-direction', 'value'),
+     Output('leverage', 'value'),
+     Output('position-size', 'value')],
+    [Input('session-id', 'data')],
+    prevent_initial_call=True
+)
+def restore_session(session_id):
+    """恢复当前会话的最近分析结果和持仓输入"""
+    state = session_store.get(session_id)
+    position = state["position"] or {}
+    return (
+        state["last_analysis"] or '点击按钮获取分析结果',
+        position.get("direction") or 'long',
+        position.get("leverage") or DEFAULT_LEVERAGE,
+        position.get("position_size") or DEFAULT_POSITION_SIZE
+    )
+
+# ========== 价格提醒回调 ==========
+ALERT_TYPES = {
+    'price_up': ('price', UP),
+    'price_down': ('price', DOWN),
+    'rsi_up': ('RSI', UP),
+    'rsi_down': ('RSI', DOWN),
+    'macd_up': ('MACD', UP),
+    'macd_down': ('MACD', DOWN),
+}
+
+def apply_alert_command(alert_type, value):
+    if alert_type == 'percent':
+        return alert_engine.add_percent_alert(value)
+    target, direction = ALERT_TYPES[alert_type]
+    if target == 'price':
+        return alert_engine.add_price_alert(value, direction)
+    return alert_engine.add_indicator_alert(target, value, direction)
+
+@app.callback(
+    Output('alert-status', 'children'),
+    [Input('add-alert-button', 'n_clicks')],
+    [State('alert-type', 'value'),
+     State('alert-value', 'value')]
+)
+def add_alert(n_clicks, alert_type, value):
+    if not n_clicks:
+        return ""
+    if value is None:
+        return "请输入阈值"
+    try:
+        if command_queue is not None:
+            # 多进程模式下提醒由采集进程统一检查，提交前先校验，采集进程中的错误无法返回给用户
+            if alert_type == 'percent':
+                check_percent(value)
+            command_queue.put({"command": "add_alert", "alert_type": alert_type, "value": value})
+            return "已提交提醒"
+        apply_alert_command(alert_type, value)
+        return f"已添加提醒，当前共 {len(alert_engine.list_alerts())} 条"
+    except Exception as e:
+        logging.error(f"添加提醒失败: {e}")
+        return f"添加提醒失败: {e}"
+
 @app.callback(
+    Output('alert-list', 'children'),
+    [Input('status-interval', 'n_intervals')]
+)
+def update_alert_list(n):
+    recent = get_market_status().get("recent_alerts") or []
+    if not recent:
+        return "暂无触发的提醒"
+    return "\n".join(
+        f"[{datetime.fromtimestamp(event['fired_at']).strftime('%H:%M:%S')}] {event['message']}"
+        for event in reversed(recent)
+    )
+
+# ========== 菜单折叠回调（客户端） ==========
+app.clientside_callback(
+    ClientsideFunction(namespace='ui', function_name='toggleMenu'),
     [Output('settings-content', 'style'),
      Output('position-content', 'style'),
      Output('settings-arrow', 'style'),
@@ -1193,54 +1917,6 @@ def analyze(n_clicks, buy_clicks, previous_content, entry_price, position_direct
     [Input('settings-button', 'n_clicks'),
      Input('position-button', 'n_clicks')]
 )
-def toggle_menu(settings_clicks, position_clicks):
-    ctx = callback_context
-    if not ctx.triggered:
-        return (
-            {"maxHeight": "0", "overflow": "hidden", "opacity": "0", "transition": "all 0.3s ease-in-out"},
-            {"maxHeight": "0", "overflow": "hidden", "opacity": "0", "transition": "all 0.3s ease-in-out"},
-            {"marginLeft": "auto", "transition": "transform 0.3s ease", "transform": "rotate(0deg)"},
-            {"marginLeft": "auto", "transition": "transform 0.3s ease", "transform": "rotate(0deg)"}
-        )
-    
-    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    
-    if button_id == 'settings-button':
-        settings_style = {
-            "maxHeight": "500px" if settings_clicks % 2 == 1 else "0",
-            "overflow": "hidden",
-            "opacity": "1" if settings_clicks % 2 == 1 else "0",
-            "transition": "all 0.3s ease-in-out"
-        }
-        settings_arrow = {
-            "marginLeft": "auto",
-            "transition": "transform 0.3s ease",
-            "transform": "rotate(180deg)" if settings_clicks % 2 == 1 else "rotate(0deg)"
-        }
-        return (
-            settings_style,
-            {"maxHeight": "0", "overflow": "hidden", "opacity": "0", "transition": "all 0.3s ease-in-out"},
-            settings_arrow,
-            {"marginLeft": "auto", "transition": "transform 0.3s ease", "transform": "rotate(0deg)"}
-        )
-    else:
-        position_style = {
-            "maxHeight": "500px" if position_clicks % 2 == 1 else "0",
-            "overflow": "hidden",
-            "opacity": "1" if position_clicks % 2 == 1 else "0",
-            "transition": "all 0.3s ease-in-out"
-        }
-        position_arrow = {
-            "marginLeft": "auto",
-            "transition": "transform 0.3s ease",
-            "transform": "rotate(180deg)" if position_clicks % 2 == 1 else "rotate(0deg)"
-        }
-        return (
-            {"maxHeight": "0", "overflow": "hidden", "opacity": "0", "transition": "all 0.3s ease-in-out"},
-            position_style,
-            {"marginLeft": "auto", "transition": "transform 0.3s ease", "transform": "rotate(0deg)"},
-            position_arrow
-        )
 
 # ========== 启动应用 ==========
 def start_ws():
@@ -1257,11 +1933,6 @@ def cleanup_data():
             os.remove('kline_history.json')
             logging.info("已清理历史数据文件")
         
-        # 清理日志文件
-        if os.path.exists('app.log'):
-            os.remove('app.log')
-            logging.info("已清理日志文件")
-        
         # 清理缓存文件
         if os.path.exists('__pycache__'):
             import shutil
@@ -1274,34 +1945,89 @@ def cleanup_data():
             logging.info("已清理CSV文件")
         
         # 重置全局变量
-        global kline_history, chat_history, has_data, current_price, login_attempts
-        kline_history = []
-        chat_history = []
+        global has_data
+        candle_index.clear()
         has_data = False
-        current_price = 0
-        login_attempts = {}
+        login_limiter.clear()
+        callback_limiter.clear()
+        analyze_limiter.clear()
+        session_store.clear()
         logging.info("已重置全局变量")
         
     except Exception as e:
         logging.error(f"清理数据时出错: {e}")
 
-if __name__ == '__main__':
-    # 清理残留数据
-    cleanup_data()
+def warm_start():
+    """
+    快速启动：加载上次保存的K线，只补齐停机期间缺失的K线，超出热层的部分移到温层。
+    没有可用的保存数据时返回 False。
+    """
+    global has_data
+    load_data()
+    if not kline_history:
+        return False
+    last_open = candle_index.last_open_time()
+    logging.info(f"已加载 {len(kline_history)} 根保存的K线，补齐 {kline_history[-1]['时间']} 之后的数据")
+    if not fetch_historical_data(since_ms=last_open + 60 * 1000):
+        logging.warning("补齐缺失K线失败，将只收集实时数据")
+    # 保存的数据内部以及与新获取的K线之间的缺口
+    for gap in candle_index.gaps():
+        backfill_gap(gap)
+    retention.enforce()
+    has_data = len(kline_history) >= 14
+    save_data()
+    return True
+
+def start_ingestion(warm=WARM_START):
+    """启动数据采集：获取历史数据并启动行情线程，返回K线WebSocket线程"""
+    if not (warm and warm_start()):
+        # 冷启动：清理残留数据后重新获取
+        cleanup_data()
+        if fetch_historical_data():
+            logging.info("历史数据获取成功，开始实时数据收集")
+        else:
+            logging.warning("历史数据获取失败，将只收集实时数据")
     
-    # 获取历史数据
-    if fetch_historical_data():
-        logging.info("历史数据获取成功，开始实时数据收集")
-    else:
-        logging.warning("历史数据获取失败，将只收集实时数据")
+    # 一次性计算指标并写入共享存储，单进程模式下预先构建图表数据
+    publish_candles()
+    if kline_history and not is_reader():
+        get_chart_pyramid()
     
-    # 加载历史数据
-    load_data()
+    # 用已有K线建立异常检测的基线，启动后即可检测
+    for record in candle_index.snapshot():
+        anomaly_detector.on_candle(SYMBOL, current_interval, open_time_of(record), record["收盘价"], record["成交量"])
+    start_event_subscribers()
+
+    # 录制模式下记录原始行情消息和深度快照，供离线回放
+    if FEED_CAPTURE_PATH:
+        start_capture(FEED_CAPTURE_PATH)
+        order_book_stream.snapshot_fetcher = capture_snapshots(order_book_stream.snapshot_fetcher)
     
     # 启动WebSocket线程
     ws_thread = threading.Thread(target=start_ws, daemon=True)
     ws_thread.start()
     
+    # 启动盘口深度线程
+    order_book_stream.start()
+    
+    # 启动逐笔成交线程
+    trade_stream.start()
+    
+    # 多进程模式下发布状态并处理服务进程的命令
+    if market_store is not None and market_store.writer:
+        threading.Thread(target=run_status_publisher, daemon=True).start()
+    if command_queue is not None:
+        threading.Thread(target=run_command_consumer, daemon=True).start()
+    logging.info(
+        f"采集启动完成，耗时 {time.time() - BOOT_STARTED:.2f} 秒，"
+        f"已有 {len(kline_history)} 根K线{'，可以分析' if has_data else ''}"
+    )
+    return ws_thread
+
+if __name__ == '__main__':
+    import sys
+    start_ingestion(warm=WARM_START and '--cold' not in sys.argv)
+    
     # 启动Dash应用
     app.run_server(
         debug=True,
@@ -0,0 +1,161 @@
+import threading
+from bisect import bisect_left
+from shared_market_data import open_time_of
+
+# upsert 的结果
+INSERTED = "inserted"
+UPDATED = "updated"
+DUPLICATE = "duplicate"
+
+
+class CandleIndex:
+    """
+    按开盘时间去重的K线索引。records 为按开盘时间升序的K线记录列表（即 kline_history），
+    所有写入（历史获取、加载文件、WebSocket收盘、缺口补齐）都经过 upsert：
+    开盘时间已存在且内容相同的记录直接丢弃，内容不同则原位替换，重复写入不会产生重复K线。
+    records 始终是同一个列表对象，只原位修改；写入可能来自行情线程和补齐线程，
+    其他线程需要遍历或按位置读取时使用 snapshot() 取得加锁复制的列表。
+    """
+
+    def __init__(self, interval_ms=60000):
+        self.interval_ms = interval_ms
+        self.records = []
+        self.inserted = 0
+        self.updated = 0
+        self.duplicates = 0
+        self._open_times = []  # 与 records 一一对应的开盘时间，用于二分查找
+        self._known = set()  # O(1) 判断开盘时间是否已存在
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, open_time):
+        return open_time in self._known
+
+    def last_open_time(self):
+        with self._lock:
+            return self._open_times[-1] if self._open_times else None
+
+    def snapshot(self, last=None):
+        """K线记录的一致副本（升序），last 指定时只取最新的 last 根"""
+        with self._lock:
+            return self.records[-last:] if last else self.records[:]
+
+    def upsert(self, record):
+        """写入一根K线，返回 INSERTED / UPDATED / DUPLICATE"""
+        open_time = open_time_of(record)
+        with self._lock:
+            if open_time in self._known:
+                pos = bisect_left(self._open_times, open_time)
+                if self.records[pos] == record:
+                    self.duplicates += 1
+                    return DUPLICATE
+                self.records[pos] = record
+                self.updated += 1
+                return UPDATED
+            if not self._open_times or open_time > self._open_times[-1]:
+                self.records.append(record)
+                self._open_times.append(open_time)
+            else:
+                pos = bisect_left(self._open_times, open_time)
+                self.records.insert(pos, record)
+                self._open_times.insert(pos, open_time)
+            self._known.add(open_time)
+            self.inserted += 1
+            return INSERTED
+
+    def upsert_many(self, records):
+        """批量写入，返回各结果的数量"""
+        counts = {INSERTED: 0, UPDATED: 0, DUPLICATE: 0}
+        for record in sorted(records, key=open_time_of):
+            counts[self.upsert(record)] += 1
+        return counts
+
+    def merge(self, records, open_times=None):
+        """
+        批量合并按开盘时间升序且不重复的K线（如归档导入），返回各结果的数量。
+        一次加锁、线性合并后原位替换列表，避免逐根 upsert 在列表中部插入的平方级开销。
+        """
+        if open_times is None:
+            open_times = [open_time_of(record) for record in records]
+        counts = {INSERTED: 0, UPDATED: 0, DUPLICATE: 0}
+        with self._lock:
+            old_times, old_records = self._open_times, self.records
+            merged_times, merged_records = [], []
+            i, n = 0, len(old_times)
+            for open_time, record in zip(open_times, records):
+                j = bisect_left(old_times, open_time, i)
+                if j > i:
+                    merged_times.extend(old_times[i:j])
+                    merged_records.extend(old_records[i:j])
+                    i = j
+                if i < n and old_times[i] == open_time:
+                    if old_records[i] == record:
+                        counts[DUPLICATE] += 1
+                        record = old_records[i]
+                    else:
+                        counts[UPDATED] += 1
+                    i += 1
+                else:
+                    counts[INSERTED] += 1
+                    self._known.add(open_time)
+                merged_times.append(open_time)
+                merged_records.append(record)
+            merged_times.extend(old_times[i:])
+            merged_records.extend(old_records[i:])
+            old_times[:] = merged_times
+            old_records[:] = merged_records
+            self.inserted += counts[INSERTED]
+            self.updated += counts[UPDATED]
+            self.duplicates += counts[DUPLICATE]
+        return counts
+
+    def trim(self, before_ms):
+        """删除开盘时间早于 before_ms 的K线，返回删除数量"""
+        with self._lock:
+            count = bisect_left(self._open_times, before_ms)
+            if count:
+                self._known.difference_update(self._open_times[:count])
+                del self._open_times[:count]
+                del self.records[:count]
+            return count
+
+    def evict_oldest(self, keep):
+        """只保留最新的 keep 根K线，返回被移出的K线记录（按开盘时间升序）"""
+        with self._lock:
+            count = len(self.records) - keep
+            if count <= 0:
+                return []
+            evicted = self.records[:count]
+            self._known.difference_update(self._open_times[:count])
+            del self._open_times[:count]
+            del self.records[:count]
+            return evicted
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+            self._open_times.clear()
+            self._known.clear()
+
+    def gap_before(self, open_time):
+        """open_time 与当前最后一根K线之间缺失的区间 (首个缺失开盘时间, 最后缺失开盘时间)，没有缺失时返回 None"""
+        last = self.last_open_time()
+        if last is None or open_time - last <= self.interval_ms:
+            return None
+        return last + self.interval_ms, open_time - self.interval_ms
+
+    def gaps(self):
+        """索引内部所有缺失的区间"""
+        result = []
+        with self._lock:
+            times = self._open_times[:]
+        for previous, current in zip(times, times[1:]):
+            if current - previous > self.interval_ms:
+                result.append((previous + self.interval_ms, current - self.interval_ms))
+        return result
+
+    def missing_count(self, gap):
+        start, end = gap
+        return (end - start) // self.interval_ms + 1
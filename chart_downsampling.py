@@ -0,0 +1,150 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from config import CHART_PYRAMID_FACTORS, CHART_PIXELS_PER_CANDLE, CHART_DEFAULT_WIDTH
+
+OHLC_COLUMNS = ["开盘价", "最高价", "最低价", "收盘价", "成交量"]
+# 图表上画成曲线的指标列
+LINE_COLUMNS = [
+    "MA5", "MA10", "MA20", "MA30",
+    "BB_Upper", "BB_Lower",
+    "RSI", "MACD", "Signal", "MACD_Hist",
+]
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标。
+    首尾点固定保留，中间每个桶选与前一个选中点、下一个桶均值构成三角形面积最大的点，
+    保留曲线的形状和极值。
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if end < next_end:
+            avg_x = x[end:next_end].mean()
+            avg_y = y[end:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def point_budget(width=None):
+    """按图表像素宽度计算最多显示的K线数量"""
+    width = width or CHART_DEFAULT_WIDTH
+    return max(10, int(width // CHART_PIXELS_PER_CANDLE))
+
+
+def range_to_ms(bounds):
+    """图表X轴范围（本地时间字符串）转换为毫秒时间戳，与 open_time_of 的换算保持一致"""
+    if not bounds:
+        return None, None
+    start, end = (int(pd.Timestamp(b).to_pydatetime().timestamp() * 1000) for b in bounds)
+    return min(start, end), max(start, end)
+
+
+# ========== 多分辨率K线金字塔 ==========
+class CandlePyramid:
+    """
+    预先按多个倍数聚合好的K线层级。每层的桶按开盘时间对齐，
+    新K线只会改变最后一个桶，查询时按可视范围的时长选择满足点数预算的最细层级。
+    较早的K线可以是降采样后的冷层K线，落在同一个桶内的照常合并。
+    """
+
+    def __init__(self, df, factors=CHART_PYRAMID_FACTORS, base_ms=None):
+        self.open_time = df["开盘时间"].to_numpy(dtype=np.int64)
+        self.columns = {column: df[column].to_numpy(dtype=np.float64)
+                        for column in OHLC_COLUMNS + LINE_COLUMNS if column in df.columns}
+        if base_ms:
+            self.base_ms = base_ms
+        elif len(self.open_time) > 1:
+            self.base_ms = int(np.median(np.diff(self.open_time)))
+        else:
+            self.base_ms = 60000
+        self.factors = sorted(factors)
+        self.levels = {factor: self._aggregate(factor) for factor in self.factors}
+
+    def __len__(self):
+        return len(self.open_time)
+
+    def _aggregate(self, factor):
+        if factor == 1 or len(self.open_time) == 0:
+            return self.open_time, {column: self.columns[column] for column in OHLC_COLUMNS}
+        keys = self.open_time // (self.base_ms * factor)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)] - 1
+        candles = {
+            "开盘价": self.columns["开盘价"][starts],
+            "最高价": np.fmax.reduceat(self.columns["最高价"], starts),
+            "最低价": np.fmin.reduceat(self.columns["最低价"], starts),
+            "收盘价": self.columns["收盘价"][ends],
+            "成交量": np.add.reduceat(self.columns["成交量"], starts),
+        }
+        return keys[starts] * self.base_ms * factor, candles
+
+    def level_for(self, count, max_points):
+        """点数不超过预算的最细层级"""
+        for factor in self.factors:
+            if count / factor <= max_points:
+                return factor
+        return self.factors[-1]
+
+    def query(self, start_ms=None, end_ms=None, max_points=None):
+        """
+        返回 (层级倍数, K线DataFrame, {指标列: (时间, 数值)})，时间为 chart_time 格式。
+        K线来自金字塔层级，指标曲线在基础分辨率上做 LTTB 降采样，点数都不超过预算。
+        """
+        max_points = max_points or point_budget()
+        lo = 0 if start_ms is None else int(np.searchsorted(self.open_time, start_ms, side='left'))
+        hi = len(self.open_time) if end_ms is None else int(np.searchsorted(self.open_time, end_ms, side='right'))
+        # 按时长折算基础周期的K线数，冷层K线较稀疏，按行数会选到过细的层级
+        span = (int(self.open_time[hi - 1]) - int(self.open_time[lo])) // self.base_ms + 1 if hi > lo else 0
+        factor = self.level_for(span, max_points)
+
+        level_time, level_values = self.levels[factor]
+        first = self.open_time[lo] if lo < len(self.open_time) else np.iinfo(np.int64).max
+        last = self.open_time[hi - 1] if hi > 0 else np.iinfo(np.int64).min
+        bucket_ms = self.base_ms * factor
+        l_lo = int(np.searchsorted(level_time, first - first % bucket_ms, side='left'))
+        l_hi = int(np.searchsorted(level_time, last, side='right'))
+        candles = pd.DataFrame({column: values[l_lo:l_hi] for column, values in level_values.items()})
+        candles.insert(0, "时间", chart_time(level_time[l_lo:l_hi]))
+        candles.insert(0, "开盘时间", level_time[l_lo:l_hi])
+
+        lines = {}
+        window_time = self.open_time[lo:hi]
+        for column in LINE_COLUMNS:
+            if column not in self.columns:
+                continue
+            values = self.columns[column][lo:hi]
+            valid = ~np.isnan(values)
+            times, values = window_time[valid], values[valid]
+            keep = lttb(times, values, max_points)
+            lines[column] = (chart_time(times[keep]), values[keep])
+        return factor, candles, lines
+
+
+def chart_time(open_time):
+    """
+    图表时间轴使用的毫秒数：本地时刻按UTC编码，Plotly日期轴显示的即为本地时间。
+    比日期字符串更紧凑，浏览器也无需逐个解析字符串。
+    """
+    local = pd.to_datetime([datetime.fromtimestamp(t / 1000) for t in open_time])
+    return ((local - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)).to_numpy(dtype=np.int64)
@@ -10,5 +10,133 @@ MAX_RETRIES = 3
 RETRY_DELAY = 5  # 秒
 
 # 数据配置
-MAX_KLINE_HISTORY = 200
-UPDATE_INTERVAL = 5000  # 毫秒 ss
\ No newline at end of file
+MAX_KLINE_HISTORY = 200  # 内存中保留的K线数量，更早的K线移到磁盘分层存储
+UPDATE_INTERVAL = 5000  # 毫秒 ss
+
+# 回测配置
+BACKTEST_FEE_RATE = 0.0004  # 单边手续费率（0.04%）
+DEFAULT_LEVERAGE = 10  # 默认杠杆倍数，与持仓面板一致
+DEFAULT_POSITION_SIZE = 50  # 默认持仓数量（USDT），与持仓面板一致
+BACKTEST_MAINTENANCE_RATE = 0.004  # 维持保证金率（占名义价值），不利变动达到 1/杠杆 − 该值时强平
+
+# 价格提醒配置
+ALERT_QUEUE_SIZE = 1000  # 每个通知渠道的队列长度
+ALERT_RECENT_SIZE = 20  # 界面展示的最近提醒数量
+ALERT_WEBHOOK_URL = None  # 提醒推送的Webhook地址，None 表示不推送
+
+# 盘口深度配置
+SYMBOL = "BTCUSDT"
+DEPTH_WS_URL = "wss://stream.binance.com:9443/ws/btcusdt@depth@100ms"
+DEPTH_SNAPSHOT_URL = "https://api.binance.com/api/v3/depth"
+DEPTH_SNAPSHOT_LIMIT = 1000  # 快照档位数
+DEPTH_MAX_LEVELS = 5000  # 本地盘口每边最多保留的档位数
+
+# 逐笔成交聚合配置
+AGG_TRADE_WS_URL = "wss://stream.binance.com:9443/ws/btcusdt@aggTrade"
+TRADE_BAR_RESOLUTIONS = [1, 5, 15]  # 秒级K线周期（秒）
+TRADE_BAR_CAPACITY = 3600  # 每个周期保留的K线数量
+
+# 多进程共享行情存储配置
+MARKET_STORE_PATH = "market_data.mmap"  # 共享内存映射文件
+MARKET_STORE_CAPACITY = 1440  # 共享存储保留的K线数量
+MARKET_STORE_STATUS_SIZE = 256 * 1024  # 状态区大小（字节）
+MARKET_STORE_READ_TIMEOUT = 1.0  # 读取一致快照的最长等待时间（秒），超时说明写入方卡在写入中途
+
+# 浏览器推送配置
+PUSH_ENABLED = True  # 通过 /api/stream 推送价格和K线
+PUSH_FALLBACK_INTERVAL = 30000  # 推送连接正常时兜底全量刷新间隔（毫秒），未连接时按1秒轮询
+STATUS_REFRESH_INTERVAL = 1000  # 盘口摘要和已触发提醒的刷新间隔（毫秒），不随推送连接放慢
+PUSH_QUEUE_SIZE = 100  # 每个浏览器连接的待发送事件上限
+PUSH_HEARTBEAT_SECONDS = 15  # 空闲时心跳间隔（秒）
+PUSH_WATCH_INTERVAL = 0.1  # 多进程模式下检查共享存储的间隔（秒）
+PUSH_MAX_STREAMS = 8  # 每个服务进程同时保持的推送连接上限（每个连接占用一个线程，需小于线程数）
+PUSH_MAX_STREAMS_PER_CLIENT = 2  # 每个客户端地址同时保持的推送连接上限
+PUSH_STREAM_MAX_SECONDS = 300  # 单个推送连接的最长保持时间（秒），之后浏览器自动重连
+PUSH_TOKEN_COOKIE = "push_token"  # 登录成功后下发的推送凭证 Cookie
+
+# 会话存储配置
+SESSION_MAX_SESSIONS = 1000  # 最多保留的会话数
+SESSION_MAX_BYTES = 32 * 1024 * 1024  # 内存会话存储上限（字节）
+SESSION_CHAT_HISTORY = 10  # 每个会话保留的分析记录数
+SESSION_DB_PATH = "sessions.db"  # 多进程部署时共享的会话数据库
+
+# 限流配置
+RATE_LIMIT_MAX_KEYS = 10000  # 每个限流器最多跟踪的客户端数
+RATE_LIMIT_WHEEL_TICK = 1.0  # 空闲桶过期时间轮的槽宽（秒）
+TRUSTED_PROXY_COUNT = 0  # 应用前面可信的反向代理层数，0 表示直接对外，忽略 X-Forwarded-For
+CALLBACK_RATE_LIMIT = 10  # 每个客户端每个回调每秒允许的请求数
+CALLBACK_BURST = 30  # 回调请求允许的突发数
+ANALYZE_RATE_LIMIT = 1 / 30  # 每个客户端每秒补充的分析次数（每30秒一次）
+ANALYZE_BURST = 3  # 分析请求允许的突发数
+
+# 图表降采样配置
+CHART_PIXELS_PER_CANDLE = 4  # 每根K线至少占用的像素，决定图表显示的点数上限
+CHART_DEFAULT_WIDTH = 1000  # 未获取到图表宽度时使用的宽度（像素）
+CHART_PYRAMID_FACTORS = [1, 2, 5, 15, 30, 60, 240, 1440]  # 多分辨率层级，基础K线周期的倍数
+CHART_HISTORY_DAYS = 30  # 图表从分层存储读取的天数，缩小范围时逐级切换到更细的层级
+COMPRESS_RESPONSES = True  # 回调响应启用 gzip/brotli 压缩（需安装 flask-compress）
+
+# K线查询接口配置
+KLINE_API_CHUNK_ROWS = 10000  # 流式响应每块的行数
+KLINE_API_INDICATOR_LOOKBACK = 100  # 按需计算指标时向前预热的K线数量
+
+# 启动配置
+WARM_START = True  # 启动时加载保存的K线并只补齐缺失部分；命令行加 --cold 时清理后重新获取
+
+# 性能分析配置
+PROFILING_ENABLED = False  # 启动时是否记录回调和消息处理的分阶段耗时（可通过接口开关）
+PROFILE_MAX_SECONDS = 60  # 单次采样分析的最长时间（秒）
+PROFILE_SAMPLE_INTERVAL = 0.005  # 采样间隔（秒）
+
+# 运行指标配置
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]  # 允许抓取 /metrics 的地址
+
+# 日志配置
+LOG_FILE = "app.log"  # 日志文件（JSON行格式）
+LOG_MAX_BYTES = 10 * 1024 * 1024  # 日志文件超过该大小时提前轮转（字节）
+LOG_ROTATE_WHEN = "midnight"  # 按时间轮转的周期
+LOG_BACKUP_COUNT = 14  # 保留的压缩日志文件数
+LOG_QUEUE_SIZE = 10000  # 后台写日志队列长度，队列满时丢弃新日志
+LOG_MAX_MESSAGE_CHARS = 2000  # 单条日志最多保留的字符数，超出部分截断
+
+# 行情录制与回放配置
+FEED_CAPTURE_PATH = None  # 设置文件路径（如 "capture.jsonl.gz"）时录制原始行情消息，追加写入
+FEED_CAPTURE_QUEUE_SIZE = 100000  # 录制写入队列长度，队列满时丢弃并计数
+FEED_REPLAY_HOST = "127.0.0.1"  # 本地行情替身监听地址
+FEED_REPLAY_PORT = 8765  # 本地行情替身端口
+
+# 压力测试配置
+LOAD_TEST_PORT = 8060  # 压测时被测服务的端口
+LOAD_TEST_LLM_LATENCY = 2.0  # DeepSeek 桩的响应延迟（秒）
+LOAD_TEST_SEED_CANDLES = 20  # 被测服务预置的历史K线数量
+LOAD_TEST_ANALYZE_INTERVAL = 120  # 每个模拟客户端点击分析的平均间隔（秒）
+
+# K线归档配置
+KLINE_ARCHIVE_ROWS_PER_GROUP = 10000  # Parquet 行组 / Arrow 批的行数，读取时按行组统计过滤
+
+# JSON 序列化配置
+JSON_BACKEND = "auto"  # "auto" 安装了 orjson 时使用 orjson，"json" 强制使用标准库
+
+# 事件总线配置
+EVENT_QUEUE_SIZE = 1000  # 每个订阅者的事件队列长度
+EVENT_OVERFLOW_POLICY = {  # 队列满时的处理方式："block" 发布方等待，"drop_oldest" 丢弃最早的，"drop_newest" 丢弃新事件
+    "ticks": "drop_oldest",
+    "history": "block",  # 收盘K线不能丢
+    "persist": "drop_oldest",
+    "indicators": "drop_oldest",
+    "alerts": "drop_oldest",
+    "anomaly_check": "block",  # 漏掉K线会使收益率跨越多根K线
+    "anomalies": "drop_oldest",
+}
+
+# 分层存储配置
+RETENTION_DIR = "kline_retention"  # 温层和冷层K线分段的目录
+RETENTION_WARM_DAYS = 7  # 温层保留的天数，更早的分段降采样压缩到冷层
+RETENTION_COLD_INTERVAL_MS = 15 * 60 * 1000  # 冷层降采样后的K线周期（毫秒）
+
+# 异常检测配置
+ANOMALY_Z_THRESHOLD = 4.0  # 收益率/成交量相对长期和近期基线的 z 分数都超过该值时视为异常
+ANOMALY_EWMA_ALPHA = 0.05  # EWMA 平滑系数，越大越偏重最近的K线
+ANOMALY_MIN_SAMPLES = 30  # 基线至少包含的K线数量，之前不做判断
+ANOMALY_AUTO_ANALYZE = False  # 检测到异常时自动调用 DeepSeek 分析
+ANOMALY_ANALYZE_COOLDOWN = 600  # 两次自动分析的最小间隔（秒）
@@ -0,0 +1,168 @@
+import logging
+import queue
+import threading
+import time
+from typing import NamedTuple, Optional
+from config import EVENT_QUEUE_SIZE
+
+# 队列满时的处理方式
+BLOCK = "block"  # 发布方等待，事件不丢失
+DROP_OLDEST = "drop_oldest"  # 丢弃最早的待处理事件，适合只关心最新状态的订阅者
+DROP_NEWEST = "drop_newest"  # 丢弃新事件
+
+
+# ========== 事件类型 ==========
+class Tick(NamedTuple):
+    """最新成交价（每条K线推送一次）"""
+    price: float
+    event_time: Optional[int]
+
+
+class CandleClosed(NamedTuple):
+    """行情流收到的收盘K线，尚未去重"""
+    candle: dict
+    event_time: Optional[int]
+
+
+class CandleStored(NamedTuple):
+    """收盘K线已写入K线索引（新增或更新）"""
+    candle: dict
+
+
+class GapFilled(NamedTuple):
+    """缺口 (首个缺失开盘时间, 最后缺失开盘时间) 已通过REST补齐 filled 根K线"""
+    gap: tuple
+    filled: int
+
+
+class Anomaly(NamedTuple):
+    """收益率或成交量的在线 z 分数超过阈值"""
+    symbol: str
+    interval: str
+    metric: str  # "return" 或 "volume"
+    open_time: int
+    value: float  # 对数收益率或成交量
+    zscore: float  # 相对 Welford 长期基线
+    ewma_zscore: float  # 相对 EWMA 近期基线
+
+
+# ========== 订阅者 ==========
+class Subscription:
+    """一个订阅者：独立的有界队列和工作线程，处理慢不会影响发布方和其他订阅者"""
+
+    def __init__(self, name, handler, event_types, maxsize=EVENT_QUEUE_SIZE, overflow=DROP_OLDEST):
+        if overflow not in (BLOCK, DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"未知的溢出策略: {overflow}")
+        self.name = name
+        self.handler = handler
+        self.event_types = tuple(event_types)
+        self.overflow = overflow
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy = 0.0  # 处理函数累计耗时
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name=f"bus-{name}", daemon=True)
+        self._thread.start()
+
+    def put(self, event):
+        item = (time.monotonic(), event)
+        if self.overflow == BLOCK:
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            if self.overflow == DROP_OLDEST:
+                try:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+                    self._queue.put_nowait(item)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def _run(self):
+        while True:
+            _, event = self._queue.get()
+            start = time.perf_counter()
+            try:
+                self.handler(event)
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"事件处理失败 ({self.name}, {type(event).__name__}): {e}")
+            finally:
+                self.busy += time.perf_counter() - start
+                self.processed += 1
+                self._queue.task_done()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def unfinished(self):
+        """已入队但尚未处理完的事件数：包括正在处理函数中的事件，pending 只计队列中的"""
+        with self._queue.mutex:
+            return self._queue.unfinished_tasks
+
+    def capacity(self):
+        return self._queue.maxsize
+
+    def lag(self):
+        """最早的待处理事件已等待的秒数，队列为空时为0"""
+        with self._queue.mutex:
+            if not self._queue.queue:
+                return 0.0
+            enqueued = self._queue.queue[0][0]
+        return time.monotonic() - enqueued
+
+    def join(self):
+        self._queue.join()
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "lag_s": round(self.lag(), 3),
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "avg_ms": round(self.busy / self.processed * 1000, 3) if self.processed else 0.0,
+        }
+
+
+class EventBus:
+    """进程内的发布/订阅：按事件类型分发到各订阅者的队列，发布只做入队"""
+
+    def __init__(self):
+        self._routes = {}  # 事件类型 -> [Subscription]
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, name, handler, event_types, maxsize=EVENT_QUEUE_SIZE, overflow=DROP_OLDEST):
+        subscription = Subscription(name, handler, event_types, maxsize, overflow)
+        with self._lock:
+            self._subscriptions[name] = subscription
+            for event_type in subscription.event_types:
+                self._routes[event_type] = self._routes.get(event_type, ()) + (subscription,)
+        return subscription
+
+    def publish(self, event):
+        for subscription in self._routes.get(type(event), ()):
+            subscription.put(event)
+
+    def subscriptions(self):
+        return dict(self._subscriptions)
+
+    def join(self):
+        """
+        等待所有已发布的事件处理完毕，包括正在处理的事件和处理过程中级联发布的事件：
+        处理函数在 task_done 之前发布，所以某个订阅者处理完时下游的计数已经增加。
+        """
+        while True:
+            subscriptions = list(self._subscriptions.values())
+            if not any(s.unfinished() for s in subscriptions):
+                return
+            for subscription in subscriptions:
+                subscription.join()
+
+    def stats(self):
+        return {name: s.stats() for name, s in self._subscriptions.items()}
@@ -0,0 +1,416 @@
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import queue
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from functools import wraps
+from config import FEED_CAPTURE_QUEUE_SIZE, FEED_REPLAY_HOST, FEED_REPLAY_PORT
+
+# 录制文件中REST深度快照使用的流名，回放时作为盘口同步的快照来源
+SNAPSHOT_STREAM = "depthSnapshot"
+# Binance 流地址中的标识 -> 录制时使用的流名
+STREAM_MARKERS = (("@kline", "kline"), ("@depth", "depth"), ("@aggTrade", "aggTrade"))
+
+
+# ========== 录制 ==========
+class FrameRecorder:
+    """
+    将原始WebSocket消息及接收时间追加写入gzip文件，每行一条 [接收毫秒, 流名, 原始消息]。
+    每次打开都追加一个新的gzip成员，写入在后台线程完成，不阻塞行情处理。
+    """
+
+    def __init__(self, path, maxsize=FEED_CAPTURE_QUEUE_SIZE):
+        self.path = path
+        self.frames = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name="feed-recorder", daemon=True)
+        self._thread.start()
+
+    def write(self, stream, message, received_ms=None):
+        if isinstance(message, bytes):
+            message = message.decode('utf-8')
+        try:
+            self._queue.put_nowait((received_ms or int(time.time() * 1000), stream, message))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._file.write(json.dumps(item, ensure_ascii=False) + "\n")
+            self.frames += 1
+            if self._queue.empty():
+                self._file.flush()
+        self._file.close()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+_capture = {"recorder": None}
+
+
+def start_capture(path):
+    stop_capture()
+    _capture["recorder"] = FrameRecorder(path)
+    logging.info(f"开始录制行情消息到 {path}")
+    return _capture["recorder"]
+
+
+def stop_capture():
+    recorder = _capture["recorder"]
+    if recorder is not None:
+        _capture["recorder"] = None
+        recorder.close()
+        logging.info(f"行情录制结束，共 {recorder.frames} 条，丢弃 {recorder.dropped} 条")
+
+
+def captured(stream):
+    """on_message 装饰器：录制模式下先记录原始消息，未录制时只多一次字典查找"""
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            recorder = _capture["recorder"]
+            if recorder is not None:
+                recorder.write(stream, args[-1])
+            return f(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def capture_snapshots(fetcher):
+    """包装深度快照获取函数，录制模式下同时记录快照"""
+    @wraps(fetcher)
+    def wrapped(*args, **kwargs):
+        snapshot = fetcher(*args, **kwargs)
+        recorder = _capture["recorder"]
+        if recorder is not None:
+            recorder.write(SNAPSHOT_STREAM, json.dumps(snapshot))
+        return snapshot
+    return wrapped
+
+
+# ========== 读取 ==========
+def read_frames(path, streams=None):
+    """依次读取 (接收毫秒, 流名, 原始消息)，录制中断导致的文件尾部残缺会被忽略"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                try:
+                    received_ms, stream, message = json.loads(line)
+                except ValueError:
+                    break
+                if streams is None or stream in streams:
+                    yield received_ms, stream, message
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            logging.warning(f"录制文件 {path} 末尾不完整，已读取到中断处")
+
+
+def load_frames(path, streams=None):
+    return list(read_frames(path, streams))
+
+
+def shift_frames(frames, offset_ms):
+    """
+    将录制数据整体平移 offset_ms：接收时间以及消息中的事件时间、成交时间和K线起止时间，
+    用于让旧录制以当前时间回放。平移K线时 offset_ms 应为整分钟。
+    """
+    shifted = []
+    for received_ms, stream, message in frames:
+        if stream != SNAPSHOT_STREAM:
+            event = json.loads(message)
+            data = event.get("data", event)
+            for key in ("E", "T"):
+                if key in data:
+                    data[key] += offset_ms
+            if "k" in data:
+                data["k"]["t"] += offset_ms
+                data["k"]["T"] += offset_ms
+            message = json.dumps(event)
+        shifted.append((received_ms + offset_ms, stream, message))
+    return shifted
+
+
+class RecordedSnapshots:
+    """依次返回录制的深度快照，用完后重复最后一个，可作为 OrderBookStream 的 snapshot_fetcher"""
+
+    def __init__(self, frames):
+        self.snapshots = [json.loads(message) for _, stream, message in frames if stream == SNAPSHOT_STREAM]
+
+    def __call__(self, symbol=None, limit=None):
+        if not self.snapshots:
+            raise RuntimeError("录制文件中没有深度快照")
+        if len(self.snapshots) > 1:
+            return self.snapshots.pop(0)
+        return self.snapshots[0]
+
+
+# ========== 回放 ==========
+class ReplayStats:
+    def __init__(self):
+        self.frames = 0
+        self.per_stream = {}
+        self.busy = 0.0  # 处理函数累计耗时
+        self.max_behind = 0.0  # 落后于录制时间线的最大秒数
+        self.elapsed = 0.0
+        self.span = 0.0  # 录制数据覆盖的时长
+        self.bus = None  # 进程内回放时各事件订阅者的统计
+
+    def add(self, stream, busy):
+        self.frames += 1
+        self.per_stream[stream] = self.per_stream.get(stream, 0) + 1
+        self.busy += busy
+
+    def report(self):
+        elapsed = self.elapsed or 1e-9
+        report = {
+            "frames": self.frames,
+            "per_stream": self.per_stream,
+            "elapsed_s": round(self.elapsed, 3),
+            "recorded_span_s": round(self.span, 3),
+            "frames_per_s": round(self.frames / elapsed, 1),
+            "avg_handler_us": round(self.busy / max(self.frames, 1) * 1e6, 1),
+            "handler_utilization": round(self.busy / elapsed, 3),
+            "max_behind_ms": round(self.max_behind * 1000, 1),
+        }
+        if self.bus is not None:
+            report["bus"] = self.bus
+        return report
+
+
+def paced(frames, speed=1.0):
+    """
+    按录制的时间间隔依次产出 (落后秒数, 流名, 原始消息)。
+    speed 为倍速，None 或 0 表示不等待、以最快速度回放。
+    """
+    start = time.perf_counter()
+    first_ms = None
+    for received_ms, stream, message in frames:
+        behind = 0.0
+        if speed:
+            if first_ms is None:
+                first_ms = received_ms
+            due = start + (received_ms - first_ms) / 1000 / speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                behind = -wait
+        yield behind, stream, message
+
+
+def replay(frames, handlers, speed=1.0):
+    """将录制的消息按倍速送入 handlers[流名](消息)，返回 ReplayStats"""
+    stats = ReplayStats()
+    if frames:
+        stats.span = (frames[-1][0] - frames[0][0]) / 1000
+    start = time.perf_counter()
+    for behind, stream, message in paced(frames, speed):
+        handler = handlers.get(stream)
+        if handler is None:
+            continue
+        t0 = time.perf_counter()
+        handler(message)
+        stats.add(stream, time.perf_counter() - t0)
+        if behind > stats.max_behind:
+            stats.max_behind = behind
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+@contextmanager
+def offline_collector(collector, root=None):
+    """
+    让采集流程离线运行，不影响正式数据和外部服务：
+    不写入 kline_history.json，分层存储写到临时目录（或 root），缺口不调用REST补齐，
+    提醒只保留在最近提醒中（不发送日志和Webhook），不自动调用 DeepSeek。退出时恢复原状。
+    """
+    from price_alerts import AlertDispatcher
+
+    data_root = root or tempfile.mkdtemp(prefix="replay-")
+    saved = {name: getattr(collector, name)
+             for name in ("save_data", "schedule_backfill", "fetch_klines", "ANOMALY_AUTO_ANALYZE")}
+    saved_root, saved_dispatcher = collector.retention.root, collector.alert_engine.dispatcher
+
+    def skip_backfill(gap):
+        logging.info(f"离线运行，跳过缺口补齐: {gap}")
+
+    def no_rest(*args, **kwargs):
+        raise RuntimeError("离线运行，不访问REST接口")
+
+    collector.save_data = lambda: None
+    collector.schedule_backfill = skip_backfill
+    collector.fetch_klines = no_rest
+    collector.ANOMALY_AUTO_ANALYZE = False
+    collector.chart_disk = None  # 图表缓存的磁盘K线来自正式数据目录
+    collector.retention.root = data_root
+    collector.alert_engine.dispatcher = AlertDispatcher([])
+    try:
+        yield data_root
+    finally:
+        for name, value in saved.items():
+            setattr(collector, name, value)
+        collector.retention.root = saved_root
+        collector.chart_disk = None
+        collector.alert_engine.dispatcher = saved_dispatcher
+        if root is None:
+            shutil.rmtree(data_root, ignore_errors=True)
+
+
+def replay_in_process(path, speed=1.0):
+    """在当前进程中把录制数据送入K线、盘口和逐笔成交的处理流程，离线运行（见 offline_collector）"""
+    import btc_kline_collector as collector
+    frames = load_frames(path)
+    collector.order_book_stream.snapshot_fetcher = RecordedSnapshots(frames)
+    collector.order_book_stream.background_snapshot = False  # 回放按录制顺序取快照，保持结果可复现
+    handlers = {
+        "kline": lambda message: collector.on_message(None, message),
+        "depth": lambda message: collector.order_book_stream.on_message(None, message),
+        "aggTrade": lambda message: collector.trade_stream.on_message(None, message),
+    }
+    with offline_collector(collector):
+        collector.start_event_subscribers()
+        stats = replay(frames, handlers, speed)
+        collector.event_bus.join()  # 等待订阅者处理完回放产生的事件
+    stats.bus = collector.event_bus.stats()
+    return stats
+
+
+# ========== 本地WebSocket替身 ==========
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _ws_frame(payload):
+    """服务端发往客户端的文本帧（不加掩码）"""
+    data = payload.encode('utf-8')
+    length = len(data)
+    if length < 126:
+        header = bytes((0x81, length))
+    elif length < 65536:
+        header = bytes((0x81, 126)) + length.to_bytes(2, 'big')
+    else:
+        header = bytes((0x81, 127)) + length.to_bytes(8, 'big')
+    return header + data
+
+
+def stream_for_path(path):
+    for marker, stream in STREAM_MARKERS:
+        if marker in path:
+            return stream
+    return None
+
+
+class ReplayServer:
+    """
+    本地行情替身：按Binance的地址格式提供录制数据，
+    /ws/btcusdt@kline_1m 等WebSocket地址按倍速推送对应流的消息，
+    /api/v3/depth 返回录制的深度快照。每个连接从头开始独立回放。
+    """
+
+    def __init__(self, frames, speed=1.0, host=FEED_REPLAY_HOST, port=FEED_REPLAY_PORT):
+        self.frames = frames
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self.snapshots = RecordedSnapshots(frames)
+        self._socket = None
+
+    def url(self, path):
+        return f"ws://{self.host}:{self.port}{path}"
+
+    def start(self):
+        self._socket = socket.create_server((self.host, self.port))
+        self.port = self._socket.getsockname()[1]
+        sock = self._socket
+        logging.info(f"行情替身已启动: ws://{self.host}:{self.port}/ws/<流>，快照 http://{self.host}:{self.port}/api/v3/depth")
+
+        def accept_loop():
+            while True:
+                try:
+                    conn, _ = sock.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+        thread = threading.Thread(target=accept_loop, name="replay-server", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        if self._socket is not None:
+            self._socket.close()
+
+    def _handle(self, conn):
+        try:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                request += chunk
+            lines = request.decode('latin-1').split("\r\n")
+            path = lines[0].split(" ")[1]
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+            if path.startswith("/api/v3/depth"):
+                body = json.dumps(self.snapshots()).encode('utf-8')
+                conn.sendall(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+                )
+                return
+            stream = stream_for_path(path)
+            key = headers.get("sec-websocket-key")
+            if stream is None or key is None:
+                conn.sendall(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+            conn.sendall(
+                "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+            )
+            frames = [frame for frame in self.frames if frame[1] == stream]
+            for _, _, message in paced(frames, self.speed):
+                conn.sendall(_ws_frame(message))
+            conn.sendall(b"\x88\x00")  # 回放结束，发送关闭帧
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 2:
+        print("用法: python feed_replay.py <录制文件> [倍速|max] [--serve]")
+        sys.exit(1)
+    path = sys.argv[1]
+    speed = 1.0
+    if len(sys.argv) > 2 and not sys.argv[2].startswith("--"):
+        speed = None if sys.argv[2] == "max" else float(sys.argv[2])
+
+    if "--serve" in sys.argv:
+        server = ReplayServer(load_frames(path), speed)
+        server.start().join()
+    else:
+        stats = replay_in_process(path, speed)
+        logging.info(f"回放完成: {json.dumps(stats.report(), ensure_ascii=False)}")
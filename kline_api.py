@@ -0,0 +1,179 @@
+import json
+import numpy as np
+import pandas as pd
+from flask import Response, jsonify, request, stream_with_context
+from technical_indicators import TechnicalIndicators
+from kline_retention import RESOLUTION
+from config import KLINE_API_CHUNK_ROWS, KLINE_API_INDICATOR_LOOKBACK
+
+KLINE_COLUMNS = ["开盘价", "最高价", "最低价", "收盘价", "成交量"]
+# 可按需计算的指标组及其输出列
+INDICATOR_GROUPS = {
+    "ma": (TechnicalIndicators.calculate_ma, ["MA5", "MA10", "MA20", "MA30"]),
+    "rsi": (TechnicalIndicators.calculate_rsi, ["RSI"]),
+    "macd": (TechnicalIndicators.calculate_macd, ["MACD", "Signal", "MACD_Hist"]),
+    "bollinger": (TechnicalIndicators.calculate_bollinger_bands, ["BB_Middle", "BB_Upper", "BB_Lower"]),
+}
+
+
+class QueryError(ValueError):
+    """请求参数错误，返回400"""
+
+
+def select_range(open_time, start_ms=None, end_ms=None):
+    """在升序的开盘时间索引上二分查找 [start_ms, end_ms] 对应的下标区间"""
+    lo = 0 if start_ms is None else int(np.searchsorted(open_time, start_ms, side='left'))
+    hi = len(open_time) if end_ms is None else int(np.searchsorted(open_time, end_ms, side='right'))
+    return lo, max(lo, hi)
+
+
+def interval_label(ms):
+    """周期毫秒数转为 1m / 15m / 1h 形式"""
+    ms = int(ms)
+    for unit, size in (("d", 86400000), ("h", 3600000), ("m", 60000), ("s", 1000)):
+        if ms % size == 0:
+            return f"{ms // size}{unit}"
+    return f"{ms}ms"
+
+
+def compute_indicators(columns, lo, hi, groups, lookback=KLINE_API_INDICATOR_LOOKBACK, floor=0):
+    """
+    只对查询区间计算指标，向前多取 lookback 根K线（不早于 floor）预热滚动窗口和EMA，
+    区间开头的EMA类指标与全量计算相比有微小差异。
+    """
+    start = max(floor, lo - lookback)
+    df = pd.DataFrame({column: columns[column][start:hi] for column in KLINE_COLUMNS})
+    result = {}
+    for group in groups:
+        calculate, outputs = INDICATOR_GROUPS[group]
+        df = calculate(df)
+        for column in outputs:
+            result[column] = df[column].to_numpy(dtype=np.float64)[lo - start:]
+    return result
+
+
+def parse_query(args, symbol, interval):
+    """解析 symbol/interval/start/end/indicators/format 参数"""
+    if args.get('symbol', symbol).upper() != symbol:
+        raise QueryError(f"不支持的交易对: {args.get('symbol')}，当前仅采集 {symbol}")
+    if args.get('interval', interval) != interval:
+        raise QueryError(f"不支持的周期: {args.get('interval')}，当前仅采集 {interval}")
+    try:
+        start_ms = int(args['start']) if args.get('start') else None
+        end_ms = int(args['end']) if args.get('end') else None
+    except ValueError:
+        raise QueryError("start/end 需为毫秒时间戳")
+    groups = [group for group in args.get('indicators', '').split(',') if group]
+    unknown = [group for group in groups if group not in INDICATOR_GROUPS]
+    if unknown:
+        raise QueryError(f"未知指标: {','.join(unknown)}，可选 {','.join(INDICATOR_GROUPS)}")
+    fmt = args.get('format', 'json')
+    if fmt not in ('json', 'arrow'):
+        raise QueryError("format 可选 json 或 arrow")
+    return start_ms, end_ms, groups, fmt
+
+
+def _json_chunk(values):
+    # JSON 不支持 NaN，未就绪的指标以 null 输出
+    if values.dtype.kind == 'f':
+        values = np.where(np.isnan(values), None, values).tolist()
+    else:
+        values = values.tolist()
+    return json.dumps(values)[1:-1]
+
+
+def iter_columnar_json(meta, arrays, chunk_rows=KLINE_API_CHUNK_ROWS):
+    """按列输出 {"...meta", "columns": {列名: [...]}}，每列分块序列化，避免一次性生成大字符串"""
+    yield json.dumps(meta, ensure_ascii=False)[:-1] + ', "columns": {'
+    for i, (name, values) in enumerate(arrays.items()):
+        yield ("" if i == 0 else ", ") + json.dumps(name, ensure_ascii=False) + ": ["
+        for offset in range(0, len(values), chunk_rows):
+            yield ("" if offset == 0 else ",") + _json_chunk(values[offset:offset + chunk_rows])
+        yield "]"
+    yield "}}"
+
+
+def iter_arrow_stream(arrays, chunk_rows=KLINE_API_CHUNK_ROWS):
+    """Arrow IPC 流格式，每 chunk_rows 行一个 RecordBatch"""
+    import pyarrow as pa
+
+    class _Sink:
+        def __init__(self):
+            self.buffers = []
+            self.closed = False
+
+        def write(self, data):
+            self.buffers.append(bytes(data))
+
+        def flush(self):
+            pass
+
+        def drain(self):
+            data = b"".join(self.buffers)
+            self.buffers = []
+            return data
+
+    names = list(arrays)
+    schema = pa.schema([(name, pa.from_numpy_dtype(arrays[name].dtype)) for name in names])
+    sink = _Sink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+    total = len(next(iter(arrays.values()))) if arrays else 0
+    for offset in range(0, total, chunk_rows):
+        batch = pa.record_batch([arrays[name][offset:offset + chunk_rows] for name in names], schema=schema)
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def register_kline_routes(server, get_columns, symbol, get_interval, token=None):
+    """
+    在Flask服务上注册 /api/klines 区间查询端点。
+    get_columns(start_ms, end_ms) 返回至少覆盖该区间的 (升序开盘时间数组, {列名: 数组})，
+    数组可以包含每行的周期（RESOLUTION 列，毫秒）：区间跨越降采样的冷层时逐行输出周期，
+    interval 返回区间内实际的周期，周期不一致时为 "mixed"，此时不计算指标；
+    设置 token 时要求 Bearer 认证。
+    """
+
+    @server.route('/api/klines')
+    def query_klines():
+        if token and request.headers.get('Authorization', '') != f"Bearer {token}":
+            return jsonify({"error": "未授权访问"}), 401
+        interval = get_interval()
+        try:
+            start_ms, end_ms, groups, fmt = parse_query(request.args, symbol, interval)
+        except QueryError as e:
+            return jsonify({"error": str(e)}), 400
+        if fmt == 'arrow':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return jsonify({"error": "服务端未安装 pyarrow，请使用 format=json"}), 400
+
+        open_time, columns = get_columns(start_ms, end_ms)
+        lo, hi = select_range(open_time, start_ms, end_ms)
+        arrays = {"开盘时间": open_time[lo:hi]}
+        arrays.update({column: columns[column][lo:hi] for column in KLINE_COLUMNS})
+        mixed, floor = False, 0
+        if RESOLUTION in columns:
+            arrays[RESOLUTION] = columns[RESOLUTION][lo:hi]
+            resolutions = np.unique(arrays[RESOLUTION])
+            mixed = len(resolutions) > 1
+            if len(resolutions) == 1:
+                interval = interval_label(resolutions[0])
+                # 预热指标的K线不跨入其他周期
+                other = np.flatnonzero(columns[RESOLUTION][:lo] != resolutions[0])
+                floor = int(other[-1]) + 1 if len(other) else 0
+        if groups:
+            if mixed:
+                return jsonify({"error": "区间包含降采样的历史K线，周期不一致，无法计算指标，请缩小 start"}), 400
+            arrays.update(compute_indicators(columns, lo, hi, groups, floor=floor))
+
+        if fmt == 'arrow':
+            return Response(stream_with_context(iter_arrow_stream(arrays)),
+                            mimetype='application/vnd.apache.arrow.stream')
+        meta = {"symbol": symbol, "interval": "mixed" if mixed else interval,
+                "mixed_resolution": mixed, "count": hi - lo}
+        return Response(stream_with_context(iter_columnar_json(meta, arrays)), mimetype='application/json')
+
+    return query_klines
@@ -0,0 +1,250 @@
+# K线和指标的批量导出/导入：按交易对和日期分区的 Parquet 数据集，或单个 Arrow IPC 文件。
+# 读取时支持列裁剪和按时间的谓词下推（先按日期分区裁剪，再用行组统计过滤）。需安装 pyarrow。
+# 导出和导入都经过分层存储（热层 kline_history.json + 温层/冷层分段），导入时应先停止采集进程。
+#
+#     python kline_archive.py export archive/ [开始毫秒] [结束毫秒]   # 热/温/冷三层 -> Parquet 数据集
+#     python kline_archive.py export klines.arrow          # -> Arrow IPC 文件
+#     python kline_archive.py import archive/ [开始毫秒] [结束毫秒]   # 最新K线进热层，更早的写入温层后压缩
+import calendar
+import logging
+import os
+import time
+import numpy as np
+import pandas as pd
+from config import SYMBOL, KLINE_ARCHIVE_ROWS_PER_GROUP
+import fast_json
+from candle_index import INSERTED, UPDATED, DUPLICATE
+from kline_retention import COLD, DAY_MS, RESOLUTION
+from shared_market_data import open_time_of
+from technical_indicators import TechnicalIndicators
+
+# 存储列名 -> 归档列名
+ARCHIVE_COLUMNS = {
+    "开盘时间": "open_time",
+    "开盘价": "open",
+    "最高价": "high",
+    "最低价": "low",
+    "收盘价": "close",
+    "成交量": "volume",
+}
+INDICATOR_COLUMNS = [
+    "MA5", "MA10", "MA20", "MA30", "RSI", "MACD", "Signal", "MACD_Hist", "BB_Middle", "BB_Upper", "BB_Lower"
+]
+PARTITION_COLUMNS = ["symbol", "date"]  # date 为开盘时间的UTC日期 YYYY-MM-DD
+RESOLUTION_COLUMN = "resolution"  # 每行的周期（毫秒），冷层降采样的K线大于 interval_ms
+IMPORT_BATCH_ROWS = 100000  # 导入温层时每批转换和追加的行数
+
+
+def _utc_day(ms):
+    return pd.Timestamp(ms, unit='ms', tz='UTC').strftime('%Y-%m-%d')
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]), flavor="hive")
+
+
+# ========== 导出 ==========
+def _day_labels(open_time):
+    """每行开盘时间的UTC日期，每天只格式化一次"""
+    days, inverse = np.unique(open_time // DAY_MS, return_inverse=True)
+    labels = np.array([_utc_day(int(day) * DAY_MS) for day in days], dtype=object)
+    return labels[inverse]
+
+
+def to_table(records, symbol=SYMBOL, indicators=True, interval_ms=60000):
+    """
+    K线记录（或包含同名列的DataFrame）转换为 Arrow 表，可同时计算技术指标。
+    跨层查询的记录中冷层K线带 周期毫秒 字段，写入 resolution 列；
+    指标只在最后一段 interval_ms 周期的K线上计算，不跨分辨率预热，冷层K线的指标为空。
+    """
+    import pyarrow as pa
+
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+    if "开盘时间" not in df.columns:
+        df = df.assign(开盘时间=[open_time_of(record) for record in df.to_dict('records')])
+    df = df.sort_values("开盘时间", kind='stable').reset_index(drop=True)
+    if RESOLUTION in df.columns:
+        resolution = df[RESOLUTION].fillna(interval_ms).to_numpy(dtype=np.int64)
+    else:
+        resolution = np.full(len(df), interval_ms, dtype=np.int64)
+    if indicators:
+        coarse = np.flatnonzero(resolution != interval_ms)
+        start = int(coarse[-1]) + 1 if len(coarse) else 0
+        fine = TechnicalIndicators.calculate_all_indicators(df.iloc[start:].reset_index(drop=True))
+        for column in INDICATOR_COLUMNS:
+            if column in fine.columns:
+                values = np.full(len(df), np.nan)
+                values[start:] = fine[column].to_numpy(dtype=np.float64)
+                df[column] = values
+
+    open_time = df["开盘时间"].to_numpy(dtype=np.int64)
+    columns = {"open_time": open_time}
+    for source, target in list(ARCHIVE_COLUMNS.items())[1:]:
+        columns[target] = df[source].to_numpy(dtype=np.float64)
+    for column in INDICATOR_COLUMNS:
+        if column in df.columns:
+            columns[column] = df[column].to_numpy(dtype=np.float64)
+    columns[RESOLUTION_COLUMN] = resolution
+    columns["symbol"] = pa.array([symbol] * len(df), type=pa.string())
+    columns["date"] = pa.array(_day_labels(open_time), type=pa.string())
+    return pa.table(columns)
+
+
+def export_parquet(table, root, rows_per_group=KLINE_ARCHIVE_ROWS_PER_GROUP):
+    """
+    写入按 symbol/date 分区的 Parquet 数据集（hive 目录格式）。
+    涉及的分区先与已有数据按开盘时间合并（新数据优先）再整体替换，重复导出是幂等的。
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    if os.path.isdir(root):
+        existing = ds.dataset(root, format="parquet", partitioning=_partitioning()).to_table(
+            filter=ds.field("symbol").isin(pc.unique(table["symbol"]))
+            & ds.field("date").isin(pc.unique(table["date"]))
+        )
+        if existing.num_rows:
+            existing = existing.filter(pc.invert(pc.is_in(existing["open_time"], value_set=table["open_time"])))
+            table = pa.concat_tables([existing, table], promote_options="default").sort_by("open_time")
+    ds.write_dataset(
+        table, root, format="parquet", partitioning=_partitioning(),
+        existing_data_behavior="delete_matching", basename_template="part-{i}.parquet",
+        max_rows_per_group=rows_per_group, min_rows_per_group=min(rows_per_group, 1024),
+    )
+
+
+def export_arrow(table, path):
+    """写入单个 Arrow IPC 文件（zstd 压缩）"""
+    import pyarrow as pa
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_file(path, table.schema, options=options) as writer:
+        writer.write_table(table, max_chunksize=KLINE_ARCHIVE_ROWS_PER_GROUP)
+
+
+# ========== 读取 ==========
+def read_table(path, symbol=None, start_ms=None, end_ms=None, columns=None):
+    """
+    读取 Parquet 数据集目录或 Arrow IPC 文件，按开盘时间升序返回 Arrow 表。
+    columns 为需要的列（归档列名），start_ms/end_ms 过滤开盘时间闭区间，
+    对 Parquet 数据集会先按日期分区裁剪，只读取相关文件和行组。
+    """
+    import pyarrow.dataset as ds
+
+    if os.path.isdir(path):
+        dataset = ds.dataset(path, format="parquet", partitioning=_partitioning())
+    else:
+        dataset = ds.dataset(path, format="arrow")
+
+    conditions = []
+    if symbol is not None:
+        conditions.append(ds.field("symbol") == symbol)
+    if start_ms is not None:
+        conditions.append(ds.field("date") >= _utc_day(start_ms))
+        conditions.append(ds.field("open_time") >= start_ms)
+    if end_ms is not None:
+        conditions.append(ds.field("date") <= _utc_day(end_ms))
+        conditions.append(ds.field("open_time") <= end_ms)
+    condition = None
+    for item in conditions:
+        condition = item if condition is None else condition & item
+
+    if columns is not None and "open_time" not in columns:
+        columns = ["open_time"] + list(columns)
+    table = dataset.to_table(columns=columns, filter=condition)
+    return table.sort_by("open_time")
+
+
+def _local_time_strings(open_time):
+    """开盘时间（毫秒）格式化为本地时间字符串，与 datetime.fromtimestamp(...).strftime 相同，按小时取一次时区偏移"""
+    seconds = open_time // 1000
+    hours, inverse = np.unique(seconds // 3600, return_inverse=True)
+    offsets = np.array([calendar.timegm(time.localtime(int(hour) * 3600)) - int(hour) * 3600 for hour in hours],
+                       dtype=np.int64)
+    local = (seconds + offsets[inverse]).astype('datetime64[s]')
+    return [text.replace('T', ' ') for text in np.datetime_as_string(local).tolist()]
+
+
+def to_records(table):
+    """Arrow 表转换为K线记录（与 kline_history 相同的格式），按列取出后一次组装"""
+    open_time = table.column("open_time").to_numpy()
+    data = [table.column(name).to_numpy().tolist() for name in list(ARCHIVE_COLUMNS.values())[1:]]
+    return [
+        {"时间": label, "开盘时间": t, "开盘价": o, "最高价": h, "最低价": l, "收盘价": c, "成交量": v}
+        for label, t, o, h, l, c, v in zip(_local_time_strings(open_time), open_time.tolist(), *data)
+    ]
+
+
+def export_history(manager, start_ms=0, end_ms=None, symbol=SYMBOL, indicators=True):
+    """跨热/温/冷三层读取 [start_ms, end_ms] 的K线并转换为 Arrow 表"""
+    return to_table(manager.query(start_ms, end_ms), symbol, indicators, manager.index.interval_ms)
+
+
+def import_into(manager, path, symbol=SYMBOL, start_ms=None, end_ms=None, batch_rows=IMPORT_BATCH_ROWS):
+    """
+    从归档读取K线导入分层存储（RetentionManager）：
+    与热层已有K线合起来最新的 hot_size 根批量合并进热层索引，更早的分批追加到温层，由 compact() 压缩到冷层。
+    冷层已有的日期跳过（冷层不能按开盘时间去重，重复导入会重复计入成交量），归档内重复的开盘时间取最后一行。
+    返回 {inserted, updated, duplicate: 热层合并结果, archived: 写入温层的行数, skipped: 跳过的行数}
+    """
+    table = read_table(path, symbol, start_ms, end_ms, columns=list(ARCHIVE_COLUMNS.values()))
+    open_time = table.column("open_time").to_numpy()
+    keep = np.ones(len(open_time), dtype=bool)
+    keep[:-1] = open_time[1:] != open_time[:-1]
+    counts = {INSERTED: 0, UPDATED: 0, DUPLICATE: 0, "archived": 0, "skipped": 0}
+    cold_days = manager.days(COLD)
+    if cold_days and len(open_time):
+        in_cold = np.isin(_day_labels(open_time), cold_days) & keep
+        counts["skipped"] = int(in_cold.sum())
+        keep &= ~in_cold
+
+    hot_times = np.array([open_time_of(record) for record in manager.index.snapshot()], dtype=np.int64)
+    newest = np.union1d(hot_times, open_time[keep])
+    threshold = newest[-manager.hot_size] if len(newest) > manager.hot_size else np.iinfo(np.int64).min
+    hot = keep & (open_time >= threshold)
+    warm = np.flatnonzero(keep & (open_time < threshold))
+    for i in range(0, len(warm), batch_rows):
+        manager.append_warm(to_records(table.take(warm[i:i + batch_rows])))
+    counts["archived"] = len(warm)
+    counts.update(manager.index.merge(to_records(table.filter(hot)), open_time[hot].tolist()))
+    manager.enforce()  # 热层原有的更早K线移到温层
+    return counts
+
+
+if __name__ == '__main__':
+    import sys
+    from candle_index import CandleIndex
+    from kline_retention import RetentionManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 3 or sys.argv[1] not in ("export", "import"):
+        print("用法: python kline_archive.py export|import <目录|文件.arrow> [开始毫秒] [结束毫秒]")
+        sys.exit(1)
+    command, target = sys.argv[1], sys.argv[2]
+    start_ms = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    end_ms = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    start = time.perf_counter()
+    index = CandleIndex()
+    if os.path.exists('kline_history.json'):
+        with open('kline_history.json', 'rb') as f:
+            index.upsert_many(fast_json.loads(f.read()))
+    manager = RetentionManager(index)
+
+    if command == "export":
+        table = export_history(manager, start_ms or 0, end_ms)
+        if target.endswith(".arrow"):
+            export_arrow(table, target)
+        else:
+            export_parquet(table, target)
+        logging.info(f"已导出 {table.num_rows} 根K线到 {target}，耗时 {time.perf_counter() - start:.2f}s")
+    else:
+        counts = import_into(manager, target, start_ms=start_ms, end_ms=end_ms)
+        manager.compact()
+        # 热层文件只保存最新的 hot_size 根，与采集进程的 save_data 格式相同
+        with open('kline_history.json', 'wb') as f:
+            f.write(fast_json.dumps_bytes(index.snapshot()))
+        logging.info(f"导入完成：热层新增 {counts['inserted']}，更新 {counts['updated']}，重复 {counts['duplicate']}，"
+                     f"写入温层 {counts['archived']}，冷层已有跳过 {counts['skipped']}，"
+                     f"热层共 {len(index)} 根，耗时 {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,277 @@
+# K线分层存储：
+#   热层  内存中最新的 MAX_KLINE_HISTORY 根K线（CandleIndex，即 kline_history）
+#   温层  移出热层的1分钟K线，按UTC日期追加写入 <RETENTION_DIR>/warm/<交易对>-<日期>.jsonl
+#   冷层  超过 RETENTION_WARM_DAYS 天的温层分段降采样为 RETENTION_COLD_INTERVAL_MS 周期，
+#         gzip 压缩写入 <RETENTION_DIR>/cold/<交易对>-<日期>.jsonl.gz
+# 内存占用只与热层大小有关，查询按时间范围只读取相关日期的分段。
+# 同一日期只以一种分辨率返回：已压缩日期后来补齐的K线先追加到温层，查询时与冷层合并降采样，下次压缩时写入冷层。
+#
+#     python kline_retention.py                     # 各层统计
+#     python kline_retention.py compact             # 立即将过期的温层分段压缩到冷层
+#     python kline_retention.py query 开始毫秒 [结束毫秒]
+import gzip
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+import fast_json
+from config import SYMBOL, MAX_KLINE_HISTORY, RETENTION_DIR, RETENTION_WARM_DAYS, RETENTION_COLD_INTERVAL_MS
+from shared_market_data import open_time_of
+
+DAY_MS = 86400000
+WARM = "warm"
+COLD = "cold"
+_SUFFIX = {WARM: ".jsonl", COLD: ".jsonl.gz"}
+RESOLUTION = "周期毫秒"  # query() 为冷层K线标注的周期，温层和热层的1分钟K线没有该字段
+_COMPACTING = ".compacting"  # 正在压缩的温层分段改名后的后缀，压缩期间的新K线写入新的温层分段
+
+
+def _utc_day(ms):
+    return time.strftime('%Y-%m-%d', time.gmtime(ms / 1000))
+
+
+def downsample(records, interval_ms):
+    """按 interval_ms 聚合K线：开盘取第一根、收盘取最后一根、最高/最低取极值、成交量求和"""
+    buckets = {}
+    for record in sorted(records, key=open_time_of):
+        bucket = open_time_of(record) // interval_ms * interval_ms
+        candle = buckets.get(bucket)
+        if candle is None:
+            buckets[bucket] = {
+                "时间": datetime.fromtimestamp(bucket / 1000).strftime('%Y-%m-%d %H:%M:%S'),
+                "开盘时间": bucket,
+                "开盘价": record["开盘价"],
+                "最高价": record["最高价"],
+                "最低价": record["最低价"],
+                "收盘价": record["收盘价"],
+                "成交量": record["成交量"],
+            }
+        else:
+            candle["最高价"] = max(candle["最高价"], record["最高价"])
+            candle["最低价"] = min(candle["最低价"], record["最低价"])
+            candle["收盘价"] = record["收盘价"]
+            candle["成交量"] += record["成交量"]
+    return list(buckets.values())
+
+
+def _read_lines(f):
+    records = []
+    for line in f:
+        try:
+            records.append(fast_json.loads(line))
+        except ValueError:
+            continue  # 写入中断留下的不完整行
+    return records
+
+
+class RetentionManager:
+    """
+    热/温/冷三层K线存储。enforce() 将热层超出 hot_size 的旧K线移到温层，
+    compact() 将过期的温层分段降采样压缩到冷层，query() 跨层按时间范围读取。
+    只读的服务进程可以传入空的 CandleIndex，只查询磁盘上的温层和冷层。
+    """
+
+    def __init__(self, index, root=RETENTION_DIR, symbol=SYMBOL, hot_size=MAX_KLINE_HISTORY,
+                 warm_days=RETENTION_WARM_DAYS, cold_interval_ms=RETENTION_COLD_INTERVAL_MS):
+        self.index = index
+        self.root = root
+        self.symbol = symbol
+        self.hot_size = hot_size
+        self.warm_days = warm_days
+        self.cold_interval_ms = cold_interval_ms
+        self.evicted = 0
+        self.compacted_days = 0
+        self._compacted_before = None  # 已检查过的压缩截止日期，同一天内不重复扫描
+        self._lock = threading.Lock()  # 温层文件的追加和改名，只做很短的文件操作
+        self._compact_lock = threading.Lock()  # 同一时间只有一个压缩，读写冷层在 _lock 之外进行
+
+    def _dir(self, tier):
+        return os.path.join(self.root, tier)
+
+    def _path(self, tier, day):
+        return os.path.join(self._dir(tier), f"{self.symbol}-{day}{_SUFFIX[tier]}")
+
+    def _compacting_path(self, day):
+        return self._path(WARM, day) + _COMPACTING
+
+    def days(self, tier, suffix=None):
+        """该层已有分段的日期（升序）"""
+        try:
+            names = os.listdir(self._dir(tier))
+        except FileNotFoundError:
+            return []
+        prefix, suffix = f"{self.symbol}-", suffix or _SUFFIX[tier]
+        return sorted(name[len(prefix):-len(suffix)] for name in names
+                      if name.startswith(prefix) and name.endswith(suffix))
+
+    def _warm_days(self):
+        """温层日期，包括正在压缩（或压缩中断）的分段"""
+        return sorted(set(self.days(WARM)) | set(self.days(WARM, _SUFFIX[WARM] + _COMPACTING)))
+
+    # ========== 热层 -> 温层 ==========
+    def enforce(self):
+        """热层超出 hot_size 的K线追加到温层分段，返回移出数量"""
+        evicted = self.index.evict_oldest(self.hot_size)
+        if evicted:
+            self.append_warm(evicted)
+            self.evicted += len(evicted)
+        return len(evicted)
+
+    def append_warm(self, records):
+        by_day = {}
+        for record in records:
+            by_day.setdefault(_utc_day(open_time_of(record)), []).append(record)
+        with self._lock:
+            os.makedirs(self._dir(WARM), exist_ok=True)
+            for day, items in by_day.items():
+                with open(self._path(WARM, day), 'ab') as f:
+                    f.write(b"".join(fast_json.dumps_bytes(record) + b"\n" for record in items))
+                if os.path.exists(self._path(COLD, day)):
+                    self._compacted_before = None  # 已压缩日期的补齐K线，下次压缩时合并到冷层
+
+    def _read_warm(self, day):
+        records = []
+        for path in (self._compacting_path(day), self._path(WARM, day)):
+            try:
+                with open(path, 'rb') as f:
+                    records += _read_lines(f)
+            except FileNotFoundError:
+                pass
+        # 补齐的K线可能晚于后续K线写入，按开盘时间去重（后写入的优先）并排序
+        unique = {open_time_of(record): record for record in records}
+        return [unique[key] for key in sorted(unique)]
+
+    # ========== 温层 -> 冷层 ==========
+    def compact(self, now_ms=None):
+        """将早于 warm_days 天的温层分段降采样写入冷层，返回压缩的天数"""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        cutoff = _utc_day(now_ms - self.warm_days * DAY_MS)
+        if cutoff == self._compacted_before:
+            return 0
+        compacted = 0
+        with self._compact_lock:
+            while True:
+                expired = [day for day in self._warm_days() if day < cutoff]
+                if not expired:
+                    with self._lock:
+                        # 检查和记录在同一把锁内，之后补齐的K线会重新清除记录
+                        if not any(day < cutoff for day in self._warm_days()):
+                            self._compacted_before = cutoff
+                            break
+                    continue
+                for day in expired:
+                    self._compact_day(day)
+                    compacted += 1
+        if compacted:
+            self.compacted_days += compacted
+            logging.info(f"已将 {compacted} 天的温层K线压缩到冷层")
+        return compacted
+
+    def _compact_day(self, day):
+        warm_path, compacting_path = self._path(WARM, day), self._compacting_path(day)
+        with self._lock:
+            # 改名后新的K线写入新的温层分段，追加不必等待下面的读写
+            if os.path.exists(warm_path) and not os.path.exists(compacting_path):
+                os.replace(warm_path, compacting_path)
+        try:
+            with open(compacting_path, 'rb') as f:
+                records = _read_lines(f)
+        except FileNotFoundError:
+            return
+        # 温层分段中同一开盘时间可能写入多次（补齐、重复导入），只保留最后一次，避免重复计入成交量
+        records = list({open_time_of(record): record for record in records}.values())
+        # 冷层已有该日数据时（晚到的补齐K线）与之合并后重新聚合
+        candles = downsample(self._read_cold(day) + records, self.cold_interval_ms)
+        os.makedirs(self._dir(COLD), exist_ok=True)
+        path = self._path(COLD, day)
+        with gzip.open(path + ".tmp", 'wb') as f:
+            f.write(b"".join(fast_json.dumps_bytes(candle) + b"\n" for candle in candles))
+        with self._lock:
+            os.replace(path + ".tmp", path)
+            os.remove(compacting_path)
+
+    def _read_cold(self, day):
+        try:
+            with gzip.open(self._path(COLD, day), 'rb') as f:
+                return _read_lines(f)
+        except FileNotFoundError:
+            return []
+
+    # ========== 查询 ==========
+    def query(self, start_ms, end_ms=None):
+        """
+        按开盘时间闭区间 [start_ms, end_ms] 跨层读取K线记录（升序），冷层的每条记录覆盖 cold_interval_ms。
+        同一天只有一种分辨率：冷层已有的日期，温层和热层中该日的K线与冷层合并重新降采样（与下次压缩的结果一致）；
+        其余日期同一开盘时间以热层为准。
+        """
+        end_ms = int(time.time() * 1000) if end_ms is None else end_ms
+        first_day, last_day = _utc_day(start_ms), _utc_day(end_ms)
+        fine = {}
+        for day in self._warm_days():
+            if first_day <= day <= last_day:
+                for record in self._read_warm(day):
+                    fine[open_time_of(record)] = record
+        for record in self.index.snapshot():
+            if first_day <= _utc_day(open_time_of(record)) <= last_day:
+                fine[open_time_of(record)] = record
+        cold = {day: self._read_cold(day) for day in self.days(COLD) if first_day <= day <= last_day}
+        merged, late = {}, {}
+        for open_time, record in fine.items():
+            day = _utc_day(open_time)
+            if day in cold:
+                late.setdefault(day, []).append(record)
+            else:
+                merged[open_time] = record
+        for day, records in cold.items():
+            if day in late:
+                records = downsample(records + late[day], self.cold_interval_ms)
+            for record in records:
+                record[RESOLUTION] = self.cold_interval_ms
+                merged[open_time_of(record)] = record
+        return [merged[key] for key in sorted(merged) if start_ms <= key <= end_ms]
+
+    def disk_usage(self, tier):
+        total = 0
+        for day in self.days(tier):
+            try:
+                total += os.path.getsize(self._path(tier, day))
+            except OSError:
+                pass
+        return total
+
+    def stats(self):
+        warm, cold = self.days(WARM), self.days(COLD)
+        return {
+            "hot": len(self.index),
+            "hot_capacity": self.hot_size,
+            "warm_days": len(warm),
+            "warm_bytes": self.disk_usage(WARM),
+            "cold_days": len(cold),
+            "cold_bytes": self.disk_usage(COLD),
+            "oldest_day": (cold or warm or [None])[0],
+            "evicted": self.evicted,
+            "compacted_days": self.compacted_days,
+        }
+
+
+if __name__ == '__main__':
+    import sys
+    from candle_index import CandleIndex
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = CandleIndex()
+    if os.path.exists('kline_history.json'):
+        with open('kline_history.json', 'rb') as f:
+            index.upsert_many(fast_json.loads(f.read()))
+    manager = RetentionManager(index)
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        manager.compact()
+    elif len(sys.argv) > 2 and sys.argv[1] == "query":
+        start = time.perf_counter()
+        records = manager.query(int(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) > 3 else None)
+        for record in records:
+            print(fast_json.dumps(record))
+        logging.info(f"共 {len(records)} 根，耗时 {time.perf_counter() - start:.3f}s")
+        sys.exit(0)
+    print(fast_json.dumps(manager.stats()))
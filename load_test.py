@@ -0,0 +1,613 @@
+# 看板压力测试：模拟 N 个已登录的浏览器按 interval-component 的节奏请求 Dash 回调，
+# 各自保持 /api/stream 推送长连接，偶尔点击分析按钮（DeepSeek 调用替换为固定延迟的桩），
+# 逐级增加客户端数并报告回调延迟分位数、错误率、推送连接情况以及服务进程的 CPU 和内存占用。
+# 被测进程离线运行（见 feed_replay.offline_collector），默认与生产环境一样使用
+# gunicorn gthread 工作进程和 SERVER_CONFIG["THREADS"] 个线程，长连接占满线程时会体现在回调延迟上。
+#
+#     python load_test.py --clients 10,50,100 --duration 60 [--capture capture.jsonl.gz] [--streams 1]
+#     python load_test.py --url http://127.0.0.1:8050 --pid <服务进程pid>   # 测试已运行的实例
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import requests
+from auth_config import SERVER_CONFIG
+from config import (
+    LOAD_TEST_PORT,
+    LOAD_TEST_LLM_LATENCY,
+    LOAD_TEST_SEED_CANDLES,
+    LOAD_TEST_ANALYZE_INTERVAL,
+    PUSH_ENABLED,
+    PUSH_HEARTBEAT_SECONDS,
+)
+
+LOGIN_OUTPUT = "login-status.children"
+ANALYZE_INPUT = "analyze-button.n_clicks"
+INTERVAL_INPUT = "interval-component.n_intervals"
+STATUS_INPUT = "status-interval.n_intervals"  # 盘口和提醒列表，不随推送连接放慢
+
+
+# ========== 被测服务 ==========
+def synthetic_history(count, end_ms, price=60000.0, seed=0):
+    """以 end_ms 为最后一根开盘时间、随机游走的已收盘1分钟K线"""
+    rng = np.random.default_rng(seed)
+    closes = price * np.exp(np.cumsum(rng.normal(0, 0.0008, count)))
+    history = []
+    for i, close in enumerate(closes):
+        open_ms = end_ms - (count - 1 - i) * 60000
+        open_price = closes[i - 1] if i else price
+        history.append({
+            "时间": datetime.fromtimestamp(open_ms / 1000).strftime('%Y-%m-%d %H:%M:%S'),
+            "开盘时间": open_ms,
+            "开盘价": float(open_price),
+            "最高价": float(max(open_price, close) * 1.0004),
+            "最低价": float(min(open_price, close) * 0.9996),
+            "收盘价": float(close),
+            "成交量": float(rng.uniform(5, 50)),
+        })
+    return history
+
+
+def synthetic_kline_frames(start_ms, seconds, price, seed=1):
+    """每秒一条K线推送、每分钟收盘一次的合成行情，格式与 Binance kline 流一致"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    candle = None
+    for i in range(seconds):
+        ts = start_ms + i * 1000
+        open_ms = ts // 60000 * 60000
+        price *= float(np.exp(rng.normal(0, 0.0002)))
+        if candle is None or candle["t"] != open_ms:
+            candle = {"t": open_ms, "T": open_ms + 59999, "o": price, "h": price, "l": price, "v": 0.0}
+        candle["h"] = max(candle["h"], price)
+        candle["l"] = min(candle["l"], price)
+        candle["v"] += float(rng.uniform(0, 2))
+        closed = (ts + 1000) % 60000 == 0
+        k = {
+            "t": candle["t"], "T": candle["T"], "s": "BTCUSDT", "i": "1m",
+            "o": f"{candle['o']:.2f}", "h": f"{candle['h']:.2f}", "l": f"{candle['l']:.2f}",
+            "c": f"{price:.2f}", "v": f"{candle['v']:.4f}", "x": closed,
+        }
+        frames.append((ts, "kline", json.dumps({"e": "kline", "E": ts, "s": "BTCUSDT", "k": k})))
+    return frames
+
+
+def first_kline_price(frames):
+    for _, stream, message in frames:
+        if stream == "kline":
+            return float(json.loads(message)["k"]["o"])
+    return 60000.0
+
+
+def prepare_target(stack, root, capture=None, llm_latency=LOAD_TEST_LLM_LATENCY):
+    """
+    在服务进程中准备被测采集器：离线运行（数据写到 root，不保存正式文件、不补齐缺口、不发送提醒），
+    预置K线历史，在后台按原速回放录制（或合成）的行情，DeepSeek 调用替换为固定延迟的桩。
+    离线状态登记在 stack 上，随进程一直保持。
+    """
+    from logging_setup import setup_logging
+    setup_logging(filename=None, force=True)  # 只输出到控制台，不写入正式的日志文件
+    import btc_kline_collector as collector
+    from feed_replay import load_frames, replay, shift_frames, offline_collector, RecordedSnapshots
+
+    def stub_llm(prompt):
+        time.sleep(llm_latency)
+        return f"【压测桩】建议观望。（提示词 {len(prompt)} 字符）"
+
+    stack.enter_context(offline_collector(collector, root))
+    collector.deepseek_api_call = stub_llm
+    # 被测进程按一层可信代理处理，模拟客户端通过 X-Forwarded-For 使用各自的限流桶
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    collector.server.wsgi_app = ProxyFix(collector.server.wsgi_app, x_for=1)
+
+    current_minute = int(time.time() * 1000) // 60000 * 60000
+    if capture:
+        frames = load_frames(capture)
+        first_kline = next((json.loads(m)["k"]["t"] for _, s, m in frames if s == "kline"), None)
+        if first_kline is not None:
+            # 整分钟平移，让回放的K线接在预置历史之后
+            frames = shift_frames(frames, current_minute - first_kline)
+        collector.order_book_stream.snapshot_fetcher = RecordedSnapshots(frames)
+    else:
+        frames = synthetic_kline_frames(current_minute, 6 * 3600, 60000.0)
+    collector.candle_index.upsert_many(synthetic_history(
+        LOAD_TEST_SEED_CANDLES, current_minute - 60000, first_kline_price(frames)
+    ))
+    collector.has_data = len(collector.kline_history) >= 14
+    collector.start_event_subscribers()
+    collector.publish_candles()
+    collector.get_chart_pyramid()
+
+    handlers = {
+        "kline": lambda message: collector.on_message(None, message),
+        "depth": lambda message: collector.order_book_stream.on_message(None, message),
+        "aggTrade": lambda message: collector.trade_stream.on_message(None, message),
+    }
+
+    def feed():
+        stats = replay(frames, handlers, 1.0)
+        logging.info(f"行情回放结束: {json.dumps(stats.report(), ensure_ascii=False)}")
+
+    threading.Thread(target=feed, name="replay-feed", daemon=True).start()
+    return collector
+
+
+def run_gunicorn_target(port, threads, root, capture, llm_latency):
+    """单个 gthread 工作进程，线程数与生产环境每个工作进程相同"""
+    from gunicorn.app.base import BaseApplication
+
+    class TargetApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"127.0.0.1:{port}")
+            self.cfg.set("workers", 1)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("threads", threads)
+            self.cfg.set("timeout", 120)
+
+        def load(self):
+            # 在工作进程中执行，回放线程和事件订阅者需要在 fork 之后启动
+            self.offline = contextlib.ExitStack()
+            return prepare_target(self.offline, root, capture, llm_latency).server
+
+    TargetApplication().run()
+
+
+def run_target(port, capture=None, llm_latency=LOAD_TEST_LLM_LATENCY, threads=SERVER_CONFIG["THREADS"]):
+    """被测进程：threads 为0或未安装 gunicorn 时使用 Dash 开发服务器（每个请求一个线程，不会出现线程耗尽）"""
+    root = tempfile.mkdtemp(prefix="loadtest-")
+    # start_target 以 SIGTERM 结束被测进程，转为正常退出以便清理临时目录
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if threads:
+            try:
+                import gunicorn  # noqa: F401
+            except ImportError:
+                logging.warning("未安装 gunicorn，被测服务退回 Dash 开发服务器")
+                threads = 0
+        if threads:
+            run_gunicorn_target(port, threads, root, capture, llm_latency)
+        else:
+            with contextlib.ExitStack() as stack:
+                collector = prepare_target(stack, root, capture, llm_latency)
+                collector.app.run_server(debug=False, host='127.0.0.1', port=port)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def start_target(port, capture=None, llm_latency=LOAD_TEST_LLM_LATENCY, threads=SERVER_CONFIG["THREADS"], timeout=120):
+    """在子进程中启动被测服务，等待其可以响应后返回进程对象"""
+    args = [sys.executable, os.path.abspath(__file__), "--target", "--port", str(port),
+            "--llm-latency", str(llm_latency), "--threads", str(threads)]
+    if capture:
+        args += ["--capture", capture]
+    process = subprocess.Popen(args)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"被测服务启动失败，退出码 {process.returncode}")
+        try:
+            if requests.get(f"{url}/_dash-layout", timeout=2).ok:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.kill()
+    raise RuntimeError("等待被测服务启动超时")
+
+
+# ========== 服务进程资源采样 ==========
+class ProcessSampler:
+    """每秒读取 /proc 统计服务进程及其子进程（gunicorn 工作进程）全部线程的 CPU 占用和常驻内存"""
+
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.cpu = []  # 每个采样周期的 CPU 百分比（单核为100）
+        self.rss = []  # 常驻内存（MB）
+        self._stop = threading.Event()
+        self._thread = None
+        self._ticks = os.sysconf('SC_CLK_TCK')
+        self._page = os.sysconf('SC_PAGE_SIZE')
+
+    def _pids(self):
+        pids = [self.pid]
+        for name in os.listdir("/proc"):
+            if name.isdigit():
+                try:
+                    with open(f"/proc/{name}/stat") as f:
+                        if int(f.read().rsplit(")", 1)[1].split()[1]) == self.pid:  # ppid
+                            pids.append(int(name))
+                except (OSError, IndexError, ValueError):
+                    continue
+        return pids
+
+    def _read(self):
+        cpu_seconds = rss_mb = 0.0
+        for pid in self._pids():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                with open(f"/proc/{pid}/statm") as f:
+                    pages = int(f.read().split()[1])
+            except OSError:
+                if pid == self.pid:
+                    raise
+                continue  # 子进程已退出
+            cpu_seconds += (int(fields[11]) + int(fields[12])) / self._ticks  # utime + stime
+            rss_mb += pages * self._page / 1024 / 1024
+        return cpu_seconds, rss_mb
+
+    def _run(self):
+        last_cpu, _ = self._read()
+        last_time = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            try:
+                cpu_seconds, rss_mb = self._read()
+            except OSError:
+                break
+            now = time.perf_counter()
+            self.cpu.append((cpu_seconds - last_cpu) / (now - last_time) * 100)
+            self.rss.append(rss_mb)
+            last_cpu, last_time = cpu_seconds, now
+
+    def start(self):
+        if self.pid is None or not os.path.exists(f"/proc/{self.pid}"):
+            return self
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def summary(self):
+        if not self.cpu:
+            return {}
+        return {
+            "cpu_avg_pct": round(float(np.mean(self.cpu)), 1),
+            "cpu_max_pct": round(float(np.max(self.cpu)), 1),
+            "rss_max_mb": round(float(np.max(self.rss)), 1),
+        }
+
+
+# ========== 模拟客户端 ==========
+def _find_props(node, props):
+    """遍历 /_dash-layout，收集各组件 id 的初始属性"""
+    if isinstance(node, dict):
+        if "props" in node and "type" in node:
+            component_id = node["props"].get("id")
+            if isinstance(component_id, str):
+                props[component_id] = node["props"]
+            _find_props(node["props"].get("children"), props)
+        else:
+            for value in node.values():
+                _find_props(value, props)
+    elif isinstance(node, list):
+        for item in node:
+            _find_props(item, props)
+    return props
+
+
+class DashSchema:
+    """从服务端读取回调依赖和组件初始值，用于构造与浏览器相同的回调请求"""
+
+    def __init__(self, url):
+        self.url = url
+        self.dependencies = [
+            dep for dep in requests.get(f"{url}/_dash-dependencies", timeout=10).json()
+            if not dep.get("clientside_function")
+        ]
+        self.props = _find_props(requests.get(f"{url}/_dash-layout", timeout=10).json(), {})
+        interval = self.props.get("interval-component", {}).get("interval", 1000)
+        self.interval = interval / 1000
+        self.status_interval = self.props.get("status-interval", {}).get("interval", 1000) / 1000
+
+    def value(self, prop_id, overrides):
+        if prop_id in overrides:
+            return overrides[prop_id]
+        component_id, prop = prop_id.split(".", 1)
+        return self.props.get(component_id, {}).get(prop)
+
+    def find(self, input_id):
+        return [dep for dep in self.dependencies
+                if any(f"{i['id']}.{i['property']}" == input_id for i in dep["inputs"])]
+
+    def payload(self, dep, changed, overrides):
+        def items(specs):
+            return [{"id": s["id"], "property": s["property"],
+                     "value": self.value(f"{s['id']}.{s['property']}", overrides)} for s in specs]
+        return {
+            "output": dep["output"],
+            "inputs": items(dep["inputs"]),
+            "state": items(dep["state"]),
+            "changedPropIds": [changed],
+        }
+
+
+def callback_name(dep):
+    return dep["output"].strip(".").split(".")[0]
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = {}  # 回调名 -> [毫秒]
+        self.statuses = {}
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def add(self, name, status, elapsed):
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status == 200:
+                self.latencies.setdefault(name, []).append(elapsed * 1000)
+            else:
+                self.errors += 1
+
+    def summary(self, seconds):
+        total = sum(self.statuses.values())
+        callbacks = {}
+        for name, values in sorted(self.latencies.items()):
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            callbacks[name] = {
+                "count": len(values),
+                "p50_ms": round(float(p50), 1),
+                "p90_ms": round(float(p90), 1),
+                "p99_ms": round(float(p99), 1),
+                "max_ms": round(float(max(values)), 1),
+            }
+        return {
+            "requests": total,
+            "rps": round(total / seconds, 1),
+            "errors": self.errors,
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items(), key=lambda kv: str(kv[0]))},
+            "callbacks": callbacks,
+        }
+
+
+class StreamStats:
+    """推送长连接：各状态码的连接次数、同时保持的连接数和收到的事件数"""
+
+    def __init__(self):
+        self.statuses = {}
+        self.open = 0
+        self.max_open = 0
+        self.events = 0
+        self.lock = threading.Lock()
+
+    def connected(self, status):
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status == 200:
+                self.open += 1
+                self.max_open = max(self.max_open, self.open)
+
+    def closed(self):
+        with self.lock:
+            self.open -= 1
+
+    def event(self):
+        with self.lock:
+            self.events += 1
+
+    def summary(self, seconds):
+        return {
+            "max_open": self.max_open,
+            "events": self.events,
+            "events_per_s": round(self.events / seconds, 1),
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items(), key=lambda kv: str(kv[0]))},
+        }
+
+
+class SimulatedClient:
+    """
+    一个浏览器：独立的连接和来源地址，登录后每个轮询回调一个线程，另有一个线程偶尔点击分析，
+    每个推送长连接一个线程（与浏览器一样被拒绝时按 Retry-After 重试，服务端关闭后3秒重连）
+    """
+
+    def __init__(self, index, schema, stats, stop, password, analyze_interval, streams=0,
+                 stream_stats=None, timeout=60):
+        self.schema = schema
+        self.stats = stats
+        self.stop = stop
+        self.password = password
+        self.analyze_interval = analyze_interval
+        self.streams = streams
+        self.stream_stats = stream_stats
+        self.timeout = timeout
+        self.cookies = None
+        # 每个客户端使用不同的来源地址，避免共用同一个限流桶；
+        # 只有被测服务信任代理（TRUSTED_PROXY_COUNT，或 --target 进程）时才生效
+        self.headers = {"X-Forwarded-For": f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"}
+        self.overrides = {"login-status.children": "登录成功", "session-id.data": f"loadtest-{index}"}
+        self.threads = []
+
+    def post(self, session, dep, changed, overrides=None, stats=None):
+        payload = self.schema.payload(dep, changed, {**self.overrides, **(overrides or {})})
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{self.schema.url}/_dash-update-component", json=payload,
+                                    headers=self.headers, timeout=self.timeout)
+            status = response.status_code
+        except requests.RequestException:
+            status = "error"
+        (stats or self.stats).add(callback_name(dep), status, time.perf_counter() - start)
+        return status
+
+    def login(self, stats):
+        """登录并完成首次完整渲染，计入单独的统计；登录下发的推送凭证 Cookie 供推送连接使用"""
+        with requests.Session() as session:
+            for dep in self.schema.dependencies:
+                if dep["output"] == LOGIN_OUTPUT:
+                    self.post(session, dep, "login-button.n_clicks",
+                              {"login-button.n_clicks": 1, "password-input.value": self.password}, stats)
+            for dep in self.schema.find("login-status.children"):
+                self.post(session, dep, "login-status.children", stats=stats)
+            self.cookies = session.cookies
+
+    def poll(self, dep, input_id=INTERVAL_INPUT, interval=None):
+        interval = interval or self.schema.interval
+        with requests.Session() as session:
+            # 浏览器之间的轮询时刻互不同步
+            if self.stop.wait(random.uniform(0, interval)):
+                return
+            n = 0
+            while not self.stop.is_set():
+                n += 1
+                started = time.perf_counter()
+                self.post(session, dep, input_id, {input_id: n})
+                self.stop.wait(max(0.0, interval - (time.perf_counter() - started)))
+
+    def hold_stream(self):
+        with requests.Session() as session:
+            if self.cookies is not None:
+                session.cookies.update(self.cookies)
+            while not self.stop.is_set():
+                retry = 3.0
+                try:
+                    with session.get(f"{self.schema.url}/api/stream", headers=self.headers, stream=True,
+                                     timeout=(10, PUSH_HEARTBEAT_SECONDS * 2)) as response:
+                        self.stream_stats.connected(response.status_code)
+                        if response.status_code != 200:
+                            retry = float(response.headers.get("Retry-After", PUSH_HEARTBEAT_SECONDS * 2))
+                        else:
+                            try:
+                                for line in response.iter_lines(chunk_size=None):
+                                    if line.startswith(b"data:"):
+                                        self.stream_stats.event()
+                                    if self.stop.is_set():
+                                        break
+                            finally:
+                                self.stream_stats.closed()
+                except requests.RequestException:
+                    self.stream_stats.connected("error")
+                self.stop.wait(retry)
+
+    def click_analyze(self, dep):
+        with requests.Session() as session:
+            clicks = 0
+            while not self.stop.wait(random.expovariate(1 / self.analyze_interval)):
+                clicks += 1
+                self.post(session, dep, ANALYZE_INPUT, {ANALYZE_INPUT: clicks})
+
+    def start(self):
+        for dep in self.schema.find(INTERVAL_INPUT):
+            self.threads.append(threading.Thread(target=self.poll, args=(dep,), daemon=True))
+        for dep in self.schema.find(STATUS_INPUT):
+            self.threads.append(threading.Thread(
+                target=self.poll, args=(dep, STATUS_INPUT, self.schema.status_interval), daemon=True
+            ))
+        for _ in range(self.streams):
+            self.threads.append(threading.Thread(target=self.hold_stream, daemon=True))
+        if self.analyze_interval:
+            for dep in self.schema.find(ANALYZE_INPUT):
+                self.threads.append(threading.Thread(target=self.click_analyze, args=(dep,), daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+
+def run_level(schema, clients, duration, pid, password, analyze_interval, streams=0):
+    """以 clients 个客户端（每个保持 streams 个推送连接）持续压测 duration 秒，返回统计结果"""
+    stats = LoadStats()
+    login_stats = LoadStats()
+    stream_stats = StreamStats()
+    stop = threading.Event()
+    simulated = [SimulatedClient(i, schema, stats, stop, password, analyze_interval, streams, stream_stats)
+                 for i in range(clients)]
+    login_started = time.perf_counter()
+    for client in simulated:
+        client.login(login_stats)
+    login = login_stats.summary(time.perf_counter() - login_started)
+    sampler = ProcessSampler(pid).start()
+    started = time.perf_counter()
+    for client in simulated:
+        client.start()
+    stop.wait(duration)
+    stop.set()
+    for client in simulated:
+        client.join()
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+    return {
+        "clients": clients,
+        "duration_s": round(elapsed, 1),
+        **stats.summary(elapsed),
+        **sampler.summary(),
+        "streams": {"requested": clients * streams, **stream_stats.summary(elapsed)},
+        "login": {"errors": login["errors"], "callbacks": login["callbacks"]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dash 看板压力测试")
+    parser.add_argument("--clients", default="10,50,100", help="逐级测试的客户端数，逗号分隔")
+    parser.add_argument("--duration", type=float, default=60, help="每一级的持续时间（秒）")
+    parser.add_argument("--interval", type=float, help="轮询间隔（秒），默认读取 interval-component 的设置")
+    parser.add_argument("--analyze-interval", type=float, default=LOAD_TEST_ANALYZE_INTERVAL,
+                        help="每个客户端点击分析的平均间隔（秒），0 表示不点击")
+    parser.add_argument("--streams", type=int, default=1 if PUSH_ENABLED else 0,
+                        help="每个客户端保持的 /api/stream 推送长连接数")
+    parser.add_argument("--threads", type=int, default=SERVER_CONFIG["THREADS"],
+                        help="被测服务 gunicorn 工作进程的线程数，0 表示使用 Dash 开发服务器")
+    parser.add_argument("--capture", help="回放的行情录制文件，默认使用合成行情")
+    parser.add_argument("--url", help="测试已运行的实例，不启动被测进程")
+    parser.add_argument("--pid", type=int, help="配合 --url 指定服务进程以采样 CPU 和内存")
+    parser.add_argument("--port", type=int, default=LOAD_TEST_PORT)
+    parser.add_argument("--llm-latency", type=float, default=LOAD_TEST_LLM_LATENCY, help="DeepSeek 桩的响应延迟（秒）")
+    parser.add_argument("--target", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.target:
+        run_target(args.port, args.capture, args.llm_latency, args.threads)
+        return
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from auth_config import ACCESS_TOKEN
+
+    process = None
+    url, pid = args.url, args.pid
+    if url is None:
+        process, url = start_target(args.port, args.capture, args.llm_latency, args.threads)
+        pid = process.pid
+    try:
+        schema = DashSchema(url)
+        if args.interval:
+            schema.interval = args.interval
+        logging.info(f"轮询间隔 {schema.interval:.1f} 秒，轮询回调 {len(schema.find(INTERVAL_INPUT))} 个，"
+                     f"状态回调 {len(schema.find(STATUS_INPUT))} 个（间隔 {schema.status_interval:.1f} 秒）")
+        for clients in [int(n) for n in args.clients.split(",") if n]:
+            result = run_level(schema, clients, args.duration, pid, ACCESS_TOKEN, args.analyze_interval, args.streams)
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+            charts = result["callbacks"].get("kline-graph", {})
+            logging.info(
+                f"{clients} 个客户端: {result['rps']} 请求/秒，错误率 {result['error_rate']:.2%}，"
+                f"图表回调 p50 {charts.get('p50_ms')}ms / p99 {charts.get('p99_ms')}ms，"
+                f"推送连接 {result['streams']['max_open']}/{result['streams']['requested']}，"
+                f"CPU {result.get('cpu_avg_pct')}%，内存 {result.get('rss_max_mb')}MB"
+            )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
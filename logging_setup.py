@@ -0,0 +1,152 @@
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import sys
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from config import (
+    LOG_FILE,
+    LOG_MAX_BYTES,
+    LOG_ROTATE_WHEN,
+    LOG_BACKUP_COUNT,
+    LOG_QUEUE_SIZE,
+    LOG_MAX_MESSAGE_CHARS,
+)
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+_listener = None
+
+
+class TruncateFilter(logging.Filter):
+    """截断过长的日志内容（完整的提示词、模型回复等），避免大字符串进入队列和磁盘"""
+
+    def __init__(self, max_chars=LOG_MAX_MESSAGE_CHARS):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def filter(self, record):
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            record.msg = f"{message[:self.max_chars]}...（已截断，共 {len(message)} 字符）"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """队列满时丢弃日志并计数，写日志的线程永远不会被磁盘阻塞"""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行JSON"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SizedTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """按时间轮转，文件超过 max_bytes 时也提前轮转，轮转出的文件用gzip压缩"""
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, when=LOG_ROTATE_WHEN, backup_count=LOG_BACKUP_COUNT):
+        super().__init__(filename, when=when, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.max_bytes = max_bytes
+        self.rotator = self._compress
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes > 0 and self.stream is not None:
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def rotation_filename(self, default_name):
+        # 同一时间段内按大小多次轮转时，追加时分秒，避免覆盖已有的压缩文件
+        name = default_name + ".gz"
+        if os.path.exists(name):
+            name = f"{default_name}.{datetime.now().strftime('%H%M%S%f')}.gz"
+        return name
+
+    def getFilesToDelete(self):
+        # 同一天按大小轮转的文件名带时分秒，按文件名排序会排在当天第一个文件之前，改为按修改时间保留最新的 backupCount 个
+        backup_count, self.backupCount = self.backupCount, 0
+        try:
+            files = super().getFilesToDelete()
+        finally:
+            self.backupCount = backup_count
+        if len(files) <= backup_count:
+            return []
+        files.sort(key=lambda path: (os.path.getmtime(path), path))
+        return files[:len(files) - backup_count]
+
+    @staticmethod
+    def _compress(source, dest):
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+
+def setup_logging(filename=LOG_FILE, level=logging.INFO, force=False):
+    """
+    日志通过有界队列交给后台线程写入：控制台输出文本格式，日志文件为按大小/时间轮转并压缩的JSON行。
+    根日志器已有处理器时（例如被上层进程配置过）不做修改，除非 force=True。
+    """
+    global _listener
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return None
+    shutdown_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers = [console]
+    if filename:
+        file_handler = SizedTimedRotatingFileHandler(filename)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    queue_handler.addFilter(TruncateFilter())
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """写完队列中剩余的日志后停止后台线程"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,222 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from flask import Response, jsonify, request
+from config import METRICS_ALLOWED_IPS
+
+# 延迟类直方图的桶边界（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DURATION_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1, 0.5)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()  # 无标签的指标从0开始输出
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ('value', 'func', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.func = None
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, func):
+        """抓取时调用 func 取值，用于队列长度等现成的状态"""
+        self.func = func
+
+    def get(self):
+        if self.func is not None:
+            try:
+                return self.func()
+            except Exception:
+                return float('nan')
+        return self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', 'lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def _render_child(self, values, child):
+        with child.lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY = []
+
+# ========== 采集指标 ==========
+WS_MESSAGES = Counter("btc_ws_messages_total", "收到的WebSocket消息数", ["stream"])
+WS_RECONNECTS = Counter("btc_ws_reconnects_total", "WebSocket重新连接次数", ["stream"])
+FEED_LAG = Histogram("btc_feed_lag_seconds", "交易所事件时间到本地接收的延迟", ["stream"])
+FEED_LAG_LAST = Gauge("btc_feed_lag_last_seconds", "最近一条消息的事件时间延迟", ["stream"])
+HANDLER_DURATION = Histogram("btc_handler_duration_seconds", "单条消息的处理耗时", ["stream"], DURATION_BUCKETS)
+KLINE_GAPS = Counter("btc_kline_gaps_total", "收盘K线与上一根不连续的次数")
+MISSING_CANDLES = Counter("btc_missing_candles_total", "缺口中缺失的K线数量")
+DUPLICATE_CANDLES = Counter("btc_duplicate_candles_total", "按开盘时间去重丢弃的重复K线数量")
+BACKFILLED_CANDLES = Counter("btc_backfilled_candles_total", "通过REST补齐的缺失K线数量")
+DEPTH_RESYNCS = Counter("btc_depth_resyncs_total", "盘口增量不连续导致的重新同步次数")
+PERSIST_DURATION = Histogram("btc_persist_seconds", "K线持久化写入耗时")
+BUFFER_ITEMS = Gauge("btc_buffer_items", "内存缓冲区当前占用", ["buffer"])
+BUFFER_CAPACITY = Gauge("btc_buffer_capacity", "内存缓冲区容量", ["buffer"])
+ANOMALIES = Counter("btc_anomalies_total", "检测到的收益率/成交量异常数", ["metric"])
+RETENTION_BYTES = Gauge("btc_retention_bytes", "K线分层存储各层占用的磁盘空间", ["tier"])
+EVENT_LAG = Gauge("btc_event_lag_seconds", "事件总线订阅者最早待处理事件的等待时间", ["subscriber"])
+EVENTS_DROPPED = Counter("btc_events_dropped_total", "事件总线订阅者队列满时丢弃的事件数", ["subscriber"])
+STATUS_DROPPED = Counter("btc_market_status_dropped_total", "状态超出共享存储状态区容量而丢弃的次数")
+
+
+def observe_lag(stream, event_ms):
+    """记录交易所事件时间（毫秒）到当前的延迟"""
+    if not event_ms:
+        return
+    lag = max(0.0, time.time() - event_ms / 1000)
+    FEED_LAG.labels(stream).observe(lag)
+    FEED_LAG_LAST.labels(stream).set(lag)
+
+
+def instrument_handler(stream):
+    """WebSocket on_message 装饰器：计数并记录处理耗时"""
+    messages = WS_MESSAGES.labels(stream)
+    duration = HANDLER_DURATION.labels(stream)
+
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                messages.inc()
+                duration.observe(time.perf_counter() - start)
+        return wrapped
+    return decorator
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def register_metrics_route(server, source=render, allowed_ips=METRICS_ALLOWED_IPS):
+    """注册 Prometheus 文本格式的 /metrics 端点，只允许本机或白名单地址抓取"""
+
+    @server.route('/metrics')
+    def metrics():
+        if request.remote_addr not in allowed_ips:
+            return jsonify({"error": "未授权访问"}), 403
+        return Response(source(), mimetype='text/plain; version=0.0.4')
+
+    return metrics
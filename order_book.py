@@ -0,0 +1,377 @@
+import json
+import logging
+import threading
+import time
+import numpy as np
+import requests
+from websocket import WebSocketApp
+from config import (
+    DEPTH_WS_URL,
+    DEPTH_SNAPSHOT_URL,
+    DEPTH_SNAPSHOT_LIMIT,
+    DEPTH_MAX_LEVELS,
+    SYMBOL,
+    RETRY_DELAY
+)
+from metrics import DEPTH_RESYNCS, WS_RECONNECTS, instrument_handler, observe_lag
+from feed_replay import captured
+import fast_json
+
+
+# ========== 有序数组盘口 ==========
+class BookSide:
+    """单边盘口，价格升序存放在预分配的 NumPy 数组中"""
+
+    def __init__(self, descending, capacity=DEPTH_MAX_LEVELS):
+        self.descending = descending  # 买盘最优价在末尾，卖盘最优价在开头
+        self.capacity = capacity
+        self.prices = np.empty(capacity, dtype=np.float64)
+        self.quantities = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+
+    def clear(self):
+        self.size = 0
+
+    def load(self, levels):
+        """用快照重建盘口"""
+        self.size = 0
+        self.apply(levels)
+
+    def apply(self, levels):
+        """批量应用档位更新，数量为0表示删除该档位"""
+        if len(levels) == 0:
+            return
+        updates = np.asarray(levels, dtype=np.float64).reshape(-1, 2)
+        # 同一消息中同一价格只保留最后一次更新
+        order = np.argsort(updates[:, 0], kind='stable')
+        updates = updates[order]
+        last = np.append(updates[1:, 0] != updates[:-1, 0], True)
+        upd_px = updates[last, 0]
+        upd_qty = updates[last, 1]
+
+        n = self.size
+        px = self.prices[:n]
+        qty = self.quantities[:n]
+        idx = np.searchsorted(px, upd_px)
+        found = idx < n
+        found[found] = px[idx[found]] == upd_px[found]
+        qty[idx[found]] = upd_qty[found]
+
+        added = ~found & (upd_qty > 0)
+        if added.any():
+            merged_px = np.concatenate((px, upd_px[added]))
+            merged_qty = np.concatenate((qty, upd_qty[added]))
+            order = np.argsort(merged_px, kind='stable')
+            merged_px = merged_px[order]
+            merged_qty = merged_qty[order]
+        else:
+            merged_px = px
+            merged_qty = qty
+
+        keep = merged_qty > 0
+        merged_px = merged_px[keep]
+        merged_qty = merged_qty[keep]
+
+        # 超出容量时丢弃离最优价最远的档位
+        if len(merged_px) > self.capacity:
+            if self.descending:
+                merged_px = merged_px[-self.capacity:]
+                merged_qty = merged_qty[-self.capacity:]
+            else:
+                merged_px = merged_px[:self.capacity]
+                merged_qty = merged_qty[:self.capacity]
+
+        self.size = len(merged_px)
+        self.prices[:self.size] = merged_px
+        self.quantities[:self.size] = merged_qty
+
+    def best(self):
+        """最优价和数量，O(1)"""
+        if self.size == 0:
+            return None, None
+        i = self.size - 1 if self.descending else 0
+        return float(self.prices[i]), float(self.quantities[i])
+
+    def top(self, n):
+        """按从优到劣的顺序返回前 n 档（价格数组, 数量数组）"""
+        n = min(n, self.size)
+        if self.descending:
+            return self.prices[self.size - n:self.size][::-1], self.quantities[self.size - n:self.size][::-1]
+        return self.prices[:n], self.quantities[:n]
+
+    def range_slice(self, low, high):
+        """价格在 [low, high] 内的档位"""
+        px = self.prices[:self.size]
+        start = np.searchsorted(px, low, side='left')
+        end = np.searchsorted(px, high, side='right')
+        return px[start:end], self.quantities[start:end]
+
+
+class LocalOrderBook:
+    """本地盘口，提供最优价、前N档和价格范围内深度查询"""
+
+    def __init__(self, capacity=DEPTH_MAX_LEVELS):
+        self.bids = BookSide(descending=True, capacity=capacity)
+        self.asks = BookSide(descending=False, capacity=capacity)
+        self.last_update_id = 0
+        self.updated_at = 0.0
+        self._lock = threading.Lock()
+
+    def load_snapshot(self, snapshot):
+        with self._lock:
+            self.bids.load(snapshot["bids"])
+            self.asks.load(snapshot["asks"])
+            self.last_update_id = snapshot["lastUpdateId"]
+            self.updated_at = time.time()
+
+    def apply_diff(self, event):
+        with self._lock:
+            self.bids.apply(event["b"])
+            self.asks.apply(event["a"])
+            self.last_update_id = event["u"]
+            self.updated_at = time.time()
+
+    def best_bid(self):
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def mid_price(self):
+        bid, _ = self.bids.best()
+        ask, _ = self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    def top(self, n=10):
+        """前 n 档买卖盘"""
+        with self._lock:
+            bid_px, bid_qty = self.bids.top(n)
+            ask_px, ask_qty = self.asks.top(n)
+            return {
+                "bids": np.column_stack((bid_px, bid_qty)),
+                "asks": np.column_stack((ask_px, ask_qty)),
+            }
+
+    def depth_within(self, percent):
+        """中间价上下 percent% 范围内的买卖盘总量"""
+        with self._lock:
+            mid = self.mid_price()
+            if mid is None:
+                return 0.0, 0.0
+            _, bid_qty = self.bids.range_slice(mid * (1 - percent / 100), mid)
+            _, ask_qty = self.asks.range_slice(mid, mid * (1 + percent / 100))
+            return float(bid_qty.sum()), float(ask_qty.sum())
+
+    def walls(self, percent=1.0, count=3):
+        """中间价上下 percent% 范围内挂单量最大的价位（买墙、卖墙）"""
+        with self._lock:
+            mid = self.mid_price()
+            if mid is None:
+                return [], []
+            result = []
+            for side, low, high in ((self.bids, mid * (1 - percent / 100), mid),
+                                    (self.asks, mid, mid * (1 + percent / 100))):
+                px, qty = side.range_slice(low, high)
+                largest = np.argsort(qty)[::-1][:count]
+                result.append([(float(px[i]), float(qty[i])) for i in largest])
+            return result[0], result[1]
+
+    def summary_text(self, percent=1.0):
+        """供AI分析提示使用的盘口摘要"""
+        bid, _ = self.best_bid()
+        ask, _ = self.best_ask()
+        if bid is None or ask is None:
+            return ""
+        bid_depth, ask_depth = self.depth_within(percent)
+        bid_walls, ask_walls = self.walls(percent)
+        return (
+            f"盘口深度：\n"
+            f"- 买一: {bid:.2f}，卖一: {ask:.2f}，价差: {ask - bid:.2f}\n"
+            f"- ±{percent}% 范围内买盘总量: {bid_depth:.3f} BTC，卖盘总量: {ask_depth:.3f} BTC\n"
+            f"- 买墙: {'，'.join(f'{p:.2f}({q:.3f})' for p, q in bid_walls)}\n"
+            f"- 卖墙: {'，'.join(f'{p:.2f}({q:.3f})' for p, q in ask_walls)}"
+        )
+
+
+# ========== 快照同步 ==========
+def fetch_depth_snapshot(symbol=SYMBOL, limit=DEPTH_SNAPSHOT_LIMIT):
+    """通过REST接口获取盘口快照"""
+    response = requests.get(DEPTH_SNAPSHOT_URL, params={"symbol": symbol, "limit": limit}, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+class OrderBookStream:
+    """
+    增量深度流与快照同步：
+    先缓存增量事件，再拉取快照，丢弃 u <= lastUpdateId 的事件，
+    之后每个事件的 U 必须等于上一个事件的 u + 1，否则重新同步。
+    快照默认在后台线程获取，行情线程不等待REST请求，期间继续缓存增量事件，
+    快照到达后按同样的 lastUpdateId 规则应用缓存的事件。
+    """
+
+    def __init__(self, book=None, snapshot_fetcher=fetch_depth_snapshot, symbol=SYMBOL, ws_url=DEPTH_WS_URL,
+                 background_snapshot=True):
+        self.book = book or LocalOrderBook()
+        self.snapshot_fetcher = snapshot_fetcher
+        self.symbol = symbol
+        self.ws_url = ws_url
+        self.background_snapshot = background_snapshot
+        self.synced = False
+        self.resyncs = 0
+        self._buffer = []
+        self._snapshot = None
+        self._fetching = False
+        self._generation = 0  # 每次重新同步加1，丢弃重新同步之前发出的快照请求的结果
+        self._lock = threading.RLock()  # 行情线程和快照线程共用的同步状态
+        self._ws = None
+
+    @captured("depth")
+    @instrument_handler("depth")
+    def on_message(self, ws, message):
+        try:
+            event = fast_json.loads(message)
+            if "data" in event:  # 组合流格式
+                event = event["data"]
+            observe_lag("depth", event.get("E"))
+            self.handle_event(event)
+        except Exception as e:
+            logging.error(f"处理深度消息时出错: {e}")
+
+    def handle_event(self, event):
+        with self._lock:
+            self._handle(event)
+
+    def _handle(self, event):
+        if not self.synced:
+            self._buffer.append(event)
+            self._sync()
+            return
+        if event["u"] <= self.book.last_update_id:
+            return
+        if event["U"] != self.book.last_update_id + 1:
+            logging.warning(f"深度数据不连续（期望 {self.book.last_update_id + 1}，收到 {event['U']}），重新同步")
+            DEPTH_RESYNCS.inc()
+            self._reset()
+            self._buffer.append(event)
+            self._sync()
+            return
+        self.book.apply_diff(event)
+
+    def _reset(self):
+        self.synced = False
+        self.resyncs += 1
+        self._buffer = []
+        self._snapshot = None
+        self._generation += 1
+
+    def _request_snapshot(self):
+        if self._fetching:
+            return
+        self._fetching = True
+        if self.background_snapshot:
+            threading.Thread(target=self._fetch_snapshot, args=(self._generation,),
+                             name="depth-snapshot", daemon=True).start()
+        else:
+            self._fetch_snapshot(self._generation)
+
+    def _fetch_snapshot(self, generation):
+        try:
+            snapshot = self.snapshot_fetcher(self.symbol, DEPTH_SNAPSHOT_LIMIT)
+        except Exception as e:
+            logging.error(f"获取盘口快照失败: {e}")
+            snapshot = None
+        with self._lock:
+            self._fetching = False
+            # 获取失败或期间已重新同步时丢弃结果，下一条事件到达时重新请求
+            if snapshot is None or generation != self._generation or self.synced:
+                return
+            self._snapshot = snapshot
+            self._sync()
+
+    def _sync(self):
+        if self._snapshot is None:
+            self._request_snapshot()
+            return
+        last_update_id = self._snapshot["lastUpdateId"]
+        self._buffer = [e for e in self._buffer if e["u"] > last_update_id]
+        if not self._buffer:
+            # 缓存的事件都早于快照，等待后续事件
+            return
+        first = self._buffer[0]
+        if first["U"] > last_update_id + 1:
+            # 快照太旧，下一条事件到达时重新获取
+            self._snapshot = None
+            return
+        self.book.load_snapshot(self._snapshot)
+        pending = self._buffer
+        self._buffer = []
+        self._snapshot = None
+        self.synced = True
+        self.book.apply_diff(first)
+        for event in pending[1:]:
+            self._handle(event)
+        logging.info(f"盘口快照同步完成，lastUpdateId={self.book.last_update_id}")
+
+    def feed(self, messages):
+        """依次处理原始消息，用于回放录制数据"""
+        for message in messages:
+            self.on_message(None, message)
+
+    def on_error(self, ws, error):
+        logging.error(f"深度WebSocket错误: {error}")
+
+    def on_close(self, ws, close_status_code, close_msg):
+        logging.warning("深度WebSocket连接关闭")
+        with self._lock:
+            self._reset()
+
+    def run_forever(self):
+        """阻塞运行，断线后重新连接并重新同步"""
+        while True:
+            self._ws = WebSocketApp(self.ws_url, on_message=self.on_message,
+                                    on_error=self.on_error, on_close=self.on_close)
+            self._ws.run_forever()
+            time.sleep(RETRY_DELAY)
+            WS_RECONNECTS.labels("depth").inc()
+
+    def start(self):
+        thread = threading.Thread(target=self.run_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+# ========== 录制数据替身 ==========
+class RecordedDepthFeed:
+    """
+    录制的深度数据，文件每行一条JSON：
+    {"snapshot": {...}} 为REST快照，其余行为原始WebSocket消息。
+    """
+
+    def __init__(self, path):
+        self.snapshots = []
+        self.messages = []
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if "snapshot" in record:
+                    self.snapshots.append(record["snapshot"])
+                else:
+                    self.messages.append(line)
+
+    def fetch_snapshot(self, symbol=SYMBOL, limit=DEPTH_SNAPSHOT_LIMIT):
+        # 依次返回录制的快照，最后一个重复使用
+        if len(self.snapshots) > 1:
+            return self.snapshots.pop(0)
+        return self.snapshots[0]
+
+    def replay(self, stream=None):
+        """将录制的消息回放到盘口流中"""
+        stream = stream or OrderBookStream(snapshot_fetcher=self.fetch_snapshot, background_snapshot=False)
+        stream.feed(self.messages)
+        return stream
@@ -0,0 +1,249 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory, util
+import numpy as np
+import pandas as pd
+from backtest import ENTRY, EXIT, SignalRules, _cross_above, evaluate_signals
+from config import BACKTEST_FEE_RATE, BACKTEST_MAINTENANCE_RATE, DEFAULT_LEVERAGE, DEFAULT_POSITION_SIZE
+
+# 共享内存中依次存放：收盘价、去均值收盘价的前缀和、平方前缀和、最低价、最高价
+_SHARED_ARRAYS = 5
+
+
+# ========== 前缀和预计算 ==========
+class PrefixSums:
+    """一次性计算前缀和，任意窗口的均线和布林带均为 O(n)"""
+
+    def __init__(self, close, csum=None, csum2=None):
+        self.close = close
+        if csum is None:
+            # 去均值后再累加，减小平方和相减时的精度损失
+            centered = close - close.mean()
+            csum = np.concatenate(([0.0], np.cumsum(centered)))
+            csum2 = np.concatenate(([0.0], np.cumsum(centered * centered)))
+        self.csum = csum
+        self.csum2 = csum2
+        self.offset = close.mean() if len(close) else 0.0
+
+    def ma(self, period):
+        """简单移动平均，与 rolling(window=period).mean() 一致"""
+        out = np.full(len(self.close), np.nan)
+        if period <= len(self.close):
+            out[period - 1:] = (self.csum[period:] - self.csum[:-period]) / period + self.offset
+        return out
+
+    def bollinger(self, period, std_dev=2):
+        """布林带上下轨，标准差与 rolling(window=period).std() 一致（样本标准差）"""
+        middle = self.ma(period)
+        upper = np.full(len(self.close), np.nan)
+        lower = np.full(len(self.close), np.nan)
+        if 1 < period <= len(self.close):
+            window_sum = self.csum[period:] - self.csum[:-period]
+            window_sum2 = self.csum2[period:] - self.csum2[:-period]
+            var = (window_sum2 - window_sum * window_sum / period) / (period - 1)
+            std = np.sqrt(np.maximum(var, 0.0))
+            upper[period - 1:] = middle[period - 1:] + std * std_dev
+            lower[period - 1:] = middle[period - 1:] - std * std_dev
+        return middle, upper, lower
+
+
+# ========== 数组版信号规则 ==========
+def _ma_cross_signals(prefix, fast, slow):
+    fast_ma = prefix.ma(fast)
+    slow_ma = prefix.ma(slow)
+    signals = np.zeros(len(prefix.close), dtype=np.int8)
+    signals[_cross_above(fast_ma, slow_ma)] = ENTRY
+    signals[_cross_above(slow_ma, fast_ma)] = EXIT
+    return signals
+
+
+def _bollinger_signals(prefix, period, std_dev):
+    _, upper, lower = prefix.bollinger(period, std_dev)
+    signals = np.zeros(len(prefix.close), dtype=np.int8)
+    signals[prefix.close <= lower] = ENTRY
+    signals[prefix.close >= upper] = EXIT
+    return signals
+
+
+def _ewm_signals(rule, prefix, params):
+    # RSI 和 MACD 基于指数平均，无法用前缀和，直接复用回测规则
+    df = pd.DataFrame({'收盘价': prefix.close}, copy=False)
+    return rule(df, **params)
+
+
+def build_signals(strategy, prefix, params):
+    """根据策略名称和参数生成信号数组"""
+    if strategy == 'ma':
+        return _ma_cross_signals(prefix, params['fast'], params['slow'])
+    if strategy == 'bollinger':
+        return _bollinger_signals(prefix, params['period'], params.get('std_dev', 2))
+    if strategy == 'rsi':
+        return _ewm_signals(SignalRules.rsi_threshold, prefix, params)
+    if strategy == 'macd':
+        return _ewm_signals(SignalRules.macd_cross, prefix, params)
+    raise ValueError(f"未知策略: {strategy}")
+
+
+def expand_grid(grid):
+    """将 {参数名: 取值列表} 展开为参数组合列表"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+# ========== 进程池工作函数 ==========
+_worker_state = {}
+
+
+def _attach_shared(shm_name, length):
+    """子进程挂载共享内存，数组均为零拷贝视图"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    arrays = np.ndarray((_SHARED_ARRAYS, length + 1), dtype=np.float64, buffer=shm.buf)
+    close = arrays[0, :length]
+    _worker_state['shm'] = shm
+    _worker_state['prefix'] = PrefixSums(close, csum=arrays[1], csum2=arrays[2])
+    _worker_state['low'] = arrays[3, :length]
+    _worker_state['high'] = arrays[4, :length]
+    # 子进程退出时不运行 atexit，用 multiprocessing 的退出回调释放映射
+    util.Finalize(None, _detach_shared, exitpriority=10)
+
+
+def _detach_shared():
+    """先释放指向共享内存的数组视图，再关闭映射（存在视图时 close 会失败）"""
+    for key in ('prefix', 'low', 'high'):
+        _worker_state.pop(key, None)
+    shm = _worker_state.pop('shm', None)
+    if shm is not None:
+        shm.close()
+
+
+def _evaluate_shard(strategy, shard, settings):
+    prefix = _worker_state['prefix']
+    results = []
+    for params in shard:
+        signals = build_signals(strategy, prefix, params)
+        metrics = evaluate_signals(prefix.close, signals, low=_worker_state['low'],
+                                   high=_worker_state['high'], **settings)
+        results.append({
+            "strategy": strategy,
+            "params": params,
+            "total_pnl": metrics["total_pnl"],
+            "total_fees": metrics["total_fees"],
+            "max_drawdown": metrics["max_drawdown"],
+            "trade_count": metrics["trade_count"],
+            "win_rate": metrics["win_rate"],
+            "liquidations": metrics["liquidations"],
+        })
+    return results
+
+
+# ========== 参数扫描 ==========
+class ParameterSweep:
+    """
+    在进程池中并行扫描指标参数，结果按完成顺序流式返回。
+    强平与 Backtester 一致：传入 low/high 时用K线最低/最高价判断，否则只用收盘价。
+    """
+
+    def __init__(self, close, low=None, high=None, workers=None, direction='long', leverage=DEFAULT_LEVERAGE,
+                 position_size=DEFAULT_POSITION_SIZE, fee_rate=BACKTEST_FEE_RATE,
+                 maintenance_rate=BACKTEST_MAINTENANCE_RATE, metric='total_pnl', top_k=50):
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+        self.low = self.close if low is None else np.ascontiguousarray(low, dtype=np.float64)
+        self.high = self.close if high is None else np.ascontiguousarray(high, dtype=np.float64)
+        self.workers = workers or os.cpu_count() or 1
+        self.settings = {
+            "direction": direction,
+            "leverage": leverage,
+            "position_size": position_size,
+            "fee_rate": fee_rate,
+            "maintenance_rate": maintenance_rate,
+        }
+        self.metric = metric
+        self.top_k = top_k
+        self._heap = []
+        self._counter = itertools.count()
+
+    def _create_shared(self):
+        length = len(self.close)
+        shm = shared_memory.SharedMemory(create=True, size=_SHARED_ARRAYS * (length + 1) * 8)
+        arrays = np.ndarray((_SHARED_ARRAYS, length + 1), dtype=np.float64, buffer=shm.buf)
+        prefix = PrefixSums(self.close)
+        arrays[0, :length] = self.close
+        arrays[1] = prefix.csum
+        arrays[2] = prefix.csum2
+        arrays[3, :length] = self.low
+        arrays[4, :length] = self.high
+        del arrays
+        return shm
+
+    def _rank(self, result):
+        # 小顶堆只保留前 top_k 个结果
+        item = (result[self.metric], next(self._counter), result)
+        if len(self._heap) < self.top_k:
+            heapq.heappush(self._heap, item)
+        elif item[0] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+
+    def top(self):
+        """当前排名前 top_k 的结果，按指标从高到低排序"""
+        return [item[2] for item in sorted(self._heap, key=lambda x: (-x[0], x[1]))]
+
+    def run(self, strategy, grid, shard_size=None):
+        """扫描参数网格，逐个产出完成的结果；提前关闭生成器时取消尚未开始的分片，只等待正在运行的分片"""
+        combos = expand_grid(grid) if isinstance(grid, dict) else list(grid)
+        if not combos:
+            return
+        if shard_size is None:
+            shard_size = max(1, len(combos) // (self.workers * 8))
+        shards = [combos[i:i + shard_size] for i in range(0, len(combos), shard_size)]
+
+        shm = self._create_shared()
+        executor = None
+        try:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_attach_shared,
+                initargs=(shm.name, len(self.close))
+            )
+            futures = [executor.submit(_evaluate_shard, strategy, shard, self.settings) for shard in shards]
+            for future in as_completed(futures):
+                for result in future.result():
+                    self._rank(result)
+                    yield result
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+            shm.close()
+            shm.unlink()
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    from backtest import load_kline_frame
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    path = sys.argv[1] if len(sys.argv) > 1 else 'kline_history.json'
+    df = load_kline_frame(path)
+
+    grids = {
+        # 快线周期不小于慢线时交叉信号与反向组合重复，不参与扫描
+        'ma': [params for params in expand_grid({'fast': list(range(3, 30)), 'slow': list(range(10, 120, 2))})
+               if params['fast'] < params['slow']],
+        'bollinger': {'period': list(range(10, 60)), 'std_dev': [1.5, 2, 2.5, 3]},
+        'rsi': {'period': [7, 14, 21], 'lower': [20, 25, 30, 35], 'upper': [65, 70, 75, 80]},
+        'macd': {'fast': [8, 12, 16], 'slow': [21, 26, 34], 'signal': [7, 9, 12]},
+    }
+    sweep = ParameterSweep(df['收盘价'].to_numpy(), low=df['最低价'].to_numpy(), high=df['最高价'].to_numpy())
+    start = time.perf_counter()
+    count = 0
+    for name, grid in grids.items():
+        for result in sweep.run(name, grid):
+            count += 1
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+    logging.info(f"扫描完成：{count} 组参数，耗时 {time.perf_counter() - start:.2f}s")
+    for result in sweep.top()[:10]:
+        logging.info(f"{result['strategy']} {result['params']}: 盈亏 {result['total_pnl']:.2f} USDT")
@@ -0,0 +1,260 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime
+import requests
+from config import ALERT_QUEUE_SIZE, ALERT_RECENT_SIZE, ALERT_WEBHOOK_URL
+
+# 提醒类型
+PRICE_CROSS = "price"
+PERCENT_MOVE = "percent"
+INDICATOR_CROSS = "indicator"
+
+UP = "up"
+DOWN = "down"
+
+
+def check_percent(percent):
+    """涨跌幅提醒的幅度不能为0：阈值等于参考价格，方向也无法确定"""
+    if percent == 0:
+        raise ValueError("涨跌幅不能为0")
+    return percent
+
+
+# ========== 阈值索引 ==========
+class ThresholdIndex:
+    """
+    按阈值排序的上穿/下穿索引。
+    每次价格变化只需二分查找穿越区间，复杂度 O(log n + 触发数)。
+    """
+
+    def __init__(self):
+        self._up_keys = []
+        self._up_ids = []
+        self._down_keys = []
+        self._down_ids = []
+
+    def __len__(self):
+        return len(self._up_ids) + len(self._down_ids)
+
+    def add(self, alert_id, threshold, direction):
+        keys, ids = self._side(direction)
+        pos = bisect_right(keys, threshold)
+        keys.insert(pos, threshold)
+        ids.insert(pos, alert_id)
+
+    def remove(self, alert_id, threshold, direction):
+        keys, ids = self._side(direction)
+        pos = bisect_left(keys, threshold)
+        while pos < len(keys) and keys[pos] == threshold:
+            if ids[pos] == alert_id:
+                del keys[pos]
+                del ids[pos]
+                return True
+            pos += 1
+        return False
+
+    def crossed(self, previous, current):
+        """返回从 previous 变化到 current 时被穿越的提醒，并将其移出索引"""
+        if current > previous:
+            # 上穿：previous < 阈值 <= current
+            keys, ids = self._up_keys, self._up_ids
+            start = bisect_right(keys, previous)
+            end = bisect_right(keys, current)
+        elif current < previous:
+            # 下穿：current <= 阈值 < previous
+            keys, ids = self._down_keys, self._down_ids
+            start = bisect_left(keys, current)
+            end = bisect_left(keys, previous)
+        else:
+            return []
+        if start >= end:
+            return []
+        fired = ids[start:end]
+        del keys[start:end]
+        del ids[start:end]
+        return fired
+
+    def _side(self, direction):
+        if direction == UP:
+            return self._up_keys, self._up_ids
+        return self._down_keys, self._down_ids
+
+
+# ========== 异步分发 ==========
+class AlertDispatcher:
+    """每个通知渠道独立的队列和线程，慢渠道不会阻塞行情处理"""
+
+    def __init__(self, sinks=None, maxsize=ALERT_QUEUE_SIZE):
+        self._workers = []
+        self.dropped = 0
+        for sink in sinks or []:
+            self.add_sink(sink, maxsize)
+
+    def add_sink(self, sink, maxsize=ALERT_QUEUE_SIZE):
+        q = queue.Queue(maxsize=maxsize)
+        thread = threading.Thread(target=self._run, args=(sink, q), daemon=True)
+        thread.start()
+        self._workers.append((sink, q, thread))
+
+    def pending(self):
+        """各渠道队列中等待发送的提醒数"""
+        return sum(q.qsize() for _, q, _ in self._workers)
+
+    def capacity(self):
+        return sum(q.maxsize for _, q, _ in self._workers)
+
+    def dispatch(self, event):
+        """非阻塞投递，队列已满时丢弃并计数"""
+        for sink, q, _ in self._workers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                self.dropped += 1
+                logging.warning(f"提醒队列已满，丢弃提醒: {event['message']}")
+
+    @staticmethod
+    def _run(sink, q):
+        while True:
+            event = q.get()
+            try:
+                sink(event)
+            except Exception as e:
+                logging.error(f"发送提醒失败: {e}")
+
+
+def logging_sink(event):
+    """将提醒写入日志"""
+    logging.info(f"价格提醒: {event['message']}")
+
+
+def webhook_sink(event, url=ALERT_WEBHOOK_URL):
+    """将提醒以JSON推送到Webhook"""
+    if not url:
+        return
+    requests.post(url, json=event, timeout=10)
+
+
+# ========== 提醒引擎 ==========
+class AlertEngine:
+    """价格穿越、涨跌幅和RSI/MACD阈值提醒，每个tick调用 on_price 检查"""
+
+    def __init__(self, dispatcher=None, recent_size=ALERT_RECENT_SIZE):
+        self.dispatcher = dispatcher or AlertDispatcher([logging_sink])
+        self.recent = deque(maxlen=recent_size)  # 最近触发的提醒，供界面展示
+        self._alerts = {}
+        self._price_index = ThresholdIndex()
+        self._indicator_index = {}
+        self._last_price = None
+        self._last_indicators = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def last_price(self):
+        return self._last_price
+
+    def add_price_alert(self, price, direction, message=None):
+        """价格上穿/下穿提醒"""
+        message = message or f"价格{'上穿' if direction == UP else '下穿'} {price:.2f}"
+        return self._add(PRICE_CROSS, float(price), direction, message, self._price_index)
+
+    def add_percent_alert(self, percent, reference_price=None, message=None):
+        """相对参考价格（默认最新价格）的涨跌幅提醒，正数为上涨，负数为下跌"""
+        check_percent(percent)
+        reference_price = reference_price or self._last_price
+        if not reference_price:
+            raise ValueError("暂无参考价格")
+        threshold = reference_price * (1 + percent / 100)
+        direction = UP if percent > 0 else DOWN
+        message = message or f"价格较 {reference_price:.2f} {'上涨' if percent > 0 else '下跌'} {abs(percent):.2f}%"
+        return self._add(PERCENT_MOVE, threshold, direction, message, self._price_index)
+
+    def add_indicator_alert(self, indicator, threshold, direction, message=None):
+        """技术指标（如 RSI、MACD、MACD_Hist）上穿/下穿阈值提醒"""
+        message = message or f"{indicator}{'上穿' if direction == UP else '下穿'} {threshold}"
+        with self._lock:
+            index = self._indicator_index.setdefault(indicator, ThresholdIndex())
+        return self._add(INDICATOR_CROSS, float(threshold), direction, message, index, indicator=indicator)
+
+    def remove_alert(self, alert_id):
+        with self._lock:
+            alert = self._alerts.pop(alert_id, None)
+            if alert is None:
+                return False
+            index = self._index_for(alert)
+            return index.remove(alert_id, alert["threshold"], alert["direction"])
+
+    def list_alerts(self):
+        with self._lock:
+            return list(self._alerts.values())
+
+    def on_price(self, price):
+        """每个tick调用，检查价格类提醒"""
+        with self._lock:
+            previous = self._last_price
+            self._last_price = price
+            if previous is None or not len(self._price_index):
+                return []
+            fired = self._pop_fired(self._price_index.crossed(previous, price))
+        self._emit(fired, price)
+        return fired
+
+    def on_indicators(self, values):
+        """K线收盘后调用，values 为 {指标名: 最新值}"""
+        fired = []
+        with self._lock:
+            for indicator, value in values.items():
+                if value != value:  # NaN
+                    continue
+                previous = self._last_indicators.get(indicator)
+                self._last_indicators[indicator] = value
+                index = self._indicator_index.get(indicator)
+                if previous is None or not index:
+                    continue
+                fired.extend(self._pop_fired(index.crossed(previous, value)))
+        self._emit(fired, self._last_price)
+        return fired
+
+    def notify(self, message, **fields):
+        """外部检测（如异常检测）产生的提醒，与触发的提醒一样记录并分发"""
+        event = dict(fields, message=message, price=self._last_price, fired_at=time.time())
+        self.recent.append(event)
+        self.dispatcher.dispatch(event)
+        return event
+
+    def _add(self, alert_type, threshold, direction, message, index, indicator=None):
+        if direction not in (UP, DOWN):
+            raise ValueError(f"未知方向: {direction}")
+        with self._lock:
+            alert_id = next(self._ids)
+            self._alerts[alert_id] = {
+                "id": alert_id,
+                "type": alert_type,
+                "indicator": indicator,
+                "threshold": threshold,
+                "direction": direction,
+                "message": message,
+                "created": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            index.add(alert_id, threshold, direction)
+        return alert_id
+
+    def _index_for(self, alert):
+        if alert["type"] == INDICATOR_CROSS:
+            return self._indicator_index[alert["indicator"]]
+        return self._price_index
+
+    def _pop_fired(self, alert_ids):
+        return [self._alerts.pop(alert_id) for alert_id in alert_ids if alert_id in self._alerts]
+
+    def _emit(self, fired, price):
+        now = time.time()
+        for alert in fired:
+            event = dict(alert, price=price, fired_at=now)
+            self.recent.append(event)
+            self.dispatcher.dispatch(event)
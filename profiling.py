@@ -0,0 +1,290 @@
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import wraps
+from flask import Response, g, jsonify, request
+from config import PROFILING_ENABLED, PROFILE_MAX_SECONDS, PROFILE_SAMPLE_INTERVAL
+
+_state = {"enabled": PROFILING_ENABLED}
+_local = threading.local()
+_stats = {}  # (名称, 阶段) -> [次数, 总耗时, 最大耗时]
+_stats_lock = threading.Lock()
+_sampling_lock = threading.Lock()  # 同一时间只允许一个采样任务
+
+
+def enable(enabled=True):
+    _state["enabled"] = enabled
+
+
+def is_enabled():
+    return _state["enabled"]
+
+
+def record(name, stage, seconds):
+    key = (name, stage)
+    with _stats_lock:
+        entry = _stats.get(key)
+        if entry is None:
+            _stats[key] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+
+def stats():
+    """按名称汇总的各阶段耗时（毫秒）"""
+    with _stats_lock:
+        items = sorted(_stats.items())
+    result = {}
+    for (name, stage), (count, total, worst) in items:
+        result.setdefault(name, {})[stage] = {
+            "count": count,
+            "avg_ms": round(total / count * 1000, 3),
+            "max_ms": round(worst * 1000, 3),
+            "total_ms": round(total * 1000, 3),
+        }
+    return result
+
+
+def reset():
+    with _stats_lock:
+        _stats.clear()
+
+
+# ========== 计时 ==========
+def timed(name=None):
+    """记录函数总耗时的装饰器，未启用时只多一次字典查找"""
+    def decorator(f):
+        span = name or f.__name__
+
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            if not _state["enabled"]:
+                return f(*args, **kwargs)
+            previous = getattr(_local, 'span', None)
+            _local.span = span
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                record(span, "total", time.perf_counter() - start)
+                _local.span = previous
+        return wrapped
+    return decorator
+
+
+class StageTimer:
+    """分阶段计时：每次 lap 记录距上一次 lap（或创建时）的耗时"""
+
+    __slots__ = ('span', 'last')
+
+    def __init__(self, span):
+        self.span = span
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        record(self.span, stage, now - self.last)
+        self.last = now
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def lap(self, stage):
+        pass
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def stage_timer(span=None):
+    """当前 timed 函数内的分阶段计时器，未启用时返回空操作计时器"""
+    if not _state["enabled"]:
+        return _NOOP_TIMER
+    return StageTimer(span or getattr(_local, 'span', None) or "unknown")
+
+
+# ========== 采样分析 ==========
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds, interval=PROFILE_SAMPLE_INTERVAL):
+    """
+    在 seconds 秒内每隔 interval 秒采样所有线程的调用栈，
+    返回折叠栈格式（"线程;外层;...;内层 次数"），可直接用于 flamegraph.pl 或 speedscope。
+    """
+    me = threading.get_ident()
+    names = {}
+    counts = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if len(names) != threading.active_count():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
+
+
+def prefix_stacks(folded, process):
+    """在折叠栈每行前加上进程名，合并多个进程的采样结果"""
+    return "".join(f"{process};{line}\n" for line in folded.splitlines() if line)
+
+
+# ========== 多进程：转发到采集进程 ==========
+def handle_command(command):
+    """
+    采集进程处理服务进程转发的分析命令：
+    profile         开关计时或清空统计
+    profile_sample  在后台线程采样，结果先写临时文件再改名到 path，服务进程轮询该文件
+    """
+    if command["command"] == "profile":
+        if command.get("enable") is not None:
+            enable(command["enable"])
+        if command.get("reset"):
+            reset()
+    elif command["command"] == "profile_sample":
+        def run():
+            try:
+                output = sample_stacks(command["seconds"], command["interval"])
+                with open(command["path"] + ".tmp", 'w', encoding='utf-8') as f:
+                    f.write(output)
+                os.replace(command["path"] + ".tmp", command["path"])
+            except Exception as e:
+                logging.error(f"采集进程采样失败: {e}")
+        threading.Thread(target=run, name="profile-sample", daemon=True).start()
+
+
+def published_timings():
+    """采集进程随状态发布的计时，未启用且没有统计时返回 None 以节省状态区"""
+    timings = stats()
+    if not _state["enabled"] and not timings:
+        return None
+    return {"enabled": _state["enabled"], "timings": timings}
+
+
+class IngestorProfiler:
+    """
+    服务进程一侧：经命令队列把计时开关和采样请求转发给采集进程，
+    从共享状态读取采集进程发布的计时（随状态每秒更新一次）。
+    """
+
+    def __init__(self, send, status, directory=None, timeout=5.0):
+        self.send = send
+        self.status = status
+        self.directory = directory or tempfile.gettempdir()
+        self.timeout = timeout  # 采样结束后等待采集进程写出结果的最长时间（秒）
+
+    def control(self, enabled=None, reset=False):
+        self.send({"command": "profile", "enable": enabled, "reset": reset})
+
+    def timings(self):
+        return self.status().get("profile") or {"enabled": False, "timings": {}}
+
+    def request_sample(self, seconds, interval):
+        """提交采样请求，返回结果文件路径，采样与本进程的采样同时进行"""
+        path = os.path.join(self.directory, f"btc-profile-{uuid.uuid4().hex}.folded")
+        self.send({"command": "profile_sample", "seconds": seconds, "interval": interval, "path": path})
+        return path
+
+    def collect(self, path):
+        """等待并读取采集进程的采样结果，超时返回 None"""
+        deadline = time.monotonic() + self.timeout
+        while not os.path.exists(path):
+            if time.monotonic() > deadline:
+                logging.warning(f"等待采集进程采样结果超时: {path}")
+                return None
+            time.sleep(0.05)
+        try:
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+
+def register_profile_routes(server, token, ingestor=None):
+    """
+    注册需 Bearer 认证的分析端点：
+    /api/profile/sample?seconds=N  采样 N 秒并返回折叠栈
+    /api/profile/timings           查看分阶段耗时，enable=0/1 开关计时，reset=1 清空
+    同时按回调记录整个请求的耗时（名称 request），减去回调本身的耗时即为反序列化和序列化的开销。
+    ingestor 返回 IngestorProfiler 时（多进程模式）：开关同时转发给采集进程，
+    timings 另附采集进程的计时，sample 合并本服务进程和采集进程的调用栈，每行以进程名开头。
+    请求计时只在处理该请求的服务进程中开关，其他服务进程不受影响。
+    """
+
+    @server.before_request
+    def start_request_timer():
+        if _state["enabled"] and request.path == '/_dash-update-component':
+            g.profile_started = time.perf_counter()
+
+    @server.after_request
+    def stop_request_timer(response):
+        started = g.pop('profile_started', None)
+        if started is not None:
+            output = (request.get_json(silent=True) or {}).get('output', '')
+            record("request", output.strip('.').split('.')[0] or "unknown", time.perf_counter() - started)
+        return response
+
+    def authorized():
+        return request.headers.get('Authorization', '') == f"Bearer {token}"
+
+    @server.route('/api/profile/sample')
+    def profile_sample():
+        if not authorized():
+            return jsonify({"error": "未授权访问"}), 401
+        try:
+            seconds = min(float(request.args.get('seconds', 10)), PROFILE_MAX_SECONDS)
+            interval = float(request.args.get('interval', PROFILE_SAMPLE_INTERVAL))
+        except ValueError:
+            return jsonify({"error": "seconds/interval 需为数字"}), 400
+        if not _sampling_lock.acquire(blocking=False):
+            return jsonify({"error": "已有采样任务在运行"}), 409
+        interval = max(interval, 0.001)
+        remote = ingestor() if ingestor else None
+        try:
+            path = remote.request_sample(seconds, interval) if remote else None
+            output = sample_stacks(seconds, interval)
+        finally:
+            _sampling_lock.release()
+        if remote:
+            output = prefix_stacks(output, f"web-{os.getpid()}")
+            output += prefix_stacks(remote.collect(path) or "", "ingestor")
+        return Response(output, mimetype='text/plain')
+
+    @server.route('/api/profile/timings')
+    def profile_timings():
+        if not authorized():
+            return jsonify({"error": "未授权访问"}), 401
+        enabled = request.args['enable'] in ('1', 'true') if 'enable' in request.args else None
+        clear = request.args.get('reset') in ('1', 'true')
+        if enabled is not None:
+            enable(enabled)
+        if clear:
+            reset()
+        result = {"enabled": is_enabled(), "timings": stats()}
+        remote = ingestor() if ingestor else None
+        if remote:
+            if enabled is not None or clear:
+                remote.control(enabled, clear)
+            result["ingestor"] = remote.timings()
+        return jsonify(result)
+
+    return profile_sample, profile_timings
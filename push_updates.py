@@ -0,0 +1,198 @@
+import logging
+import math
+import queue
+import threading
+import time
+from flask import Response, jsonify, stream_with_context
+from config import (
+    PUSH_QUEUE_SIZE, PUSH_HEARTBEAT_SECONDS, PUSH_WATCH_INTERVAL,
+    PUSH_MAX_STREAMS, PUSH_MAX_STREAMS_PER_CLIENT, PUSH_STREAM_MAX_SECONDS
+)
+import fast_json
+
+# 推送给浏览器的指标列
+INDICATOR_COLUMNS = [
+    "MA5", "MA10", "MA20", "MA30",
+    "RSI", "MACD", "Signal", "MACD_Hist",
+    "BB_Upper", "BB_Lower",
+]
+
+
+def _clean(value):
+    # JSON 不支持 NaN，未就绪的指标以 null 推送
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def candle_payload(row):
+    """由包含指标的一行K线生成推送内容"""
+    return {
+        "time": str(row["时间"]),
+        "open": _clean(row["开盘价"]),
+        "high": _clean(row["最高价"]),
+        "low": _clean(row["最低价"]),
+        "close": _clean(row["收盘价"]),
+        "volume": _clean(row["成交量"]),
+        "indicators": {column: _clean(row[column]) for column in INDICATOR_COLUMNS if column in row},
+    }
+
+
+# ========== 推送中心 ==========
+class PushHub:
+    """
+    向所有订阅的浏览器广播行情事件，每个订阅者一个有界队列，慢客户端丢弃最旧事件。
+    每个推送连接占用一个服务线程，按进程和客户端限制同时打开的连接数。
+    """
+
+    def __init__(self, queue_size=PUSH_QUEUE_SIZE, max_streams=PUSH_MAX_STREAMS,
+                 max_per_client=PUSH_MAX_STREAMS_PER_CLIENT):
+        self.queue_size = queue_size
+        self.max_streams = max_streams
+        self.max_per_client = max_per_client
+        self.rejected = 0
+        self._subscribers = set()
+        self._clients = {}  # 订阅者队列 -> 客户端
+        self._client_counts = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()  # 有订阅者时置位
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, client=None):
+        """新建订阅，连接数已达进程或该客户端的上限时返回 None"""
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            count = self._client_counts.get(client, 0)
+            if len(self._subscribers) >= self.max_streams or count >= self.max_per_client:
+                self.rejected += 1
+                return None
+            self._subscribers.add(q)
+            self._clients[q] = client
+            self._client_counts[client] = count + 1
+            self._active.set()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            if q not in self._subscribers:
+                return
+            self._subscribers.discard(q)
+            client = self._clients.pop(q)
+            self._client_counts[client] -= 1
+            if not self._client_counts[client]:
+                del self._client_counts[client]
+            if not self._subscribers:
+                self._active.clear()
+
+    def pending(self):
+        """所有订阅者队列中待发送的事件数"""
+        with self._lock:
+            return sum(q.qsize() for q in self._subscribers)
+
+    def wait_active(self, timeout=None):
+        return self._active.wait(timeout)
+
+    def publish(self, event, payload):
+        if not self._subscribers:
+            return
+        message = f"event: {event}\ndata: {fast_json.dumps(payload)}\n\n"
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    q.put_nowait(message)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def stream(self, q, heartbeat=PUSH_HEARTBEAT_SECONDS, max_seconds=PUSH_STREAM_MAX_SECONDS):
+        """
+        SSE 响应生成器，空闲时只发送心跳注释：已断开的客户端在写心跳时出错，及时释放线程。
+        连接最长保持 max_seconds 后由服务端关闭，浏览器自动重连，半开连接也不会一直占用线程。
+        """
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    yield q.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(q)
+
+
+# ========== 共享存储监视 ==========
+class StoreWatcher:
+    """
+    多进程模式下，每个服务进程用一个线程监视共享存储的序号，
+    有变化时广播最新价格和新收盘的K线；没有订阅者时不轮询。
+    """
+
+    def __init__(self, hub, store, interval=PUSH_WATCH_INTERVAL):
+        self.hub = hub
+        self.store = store
+        self.interval = interval
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        last_seq = -1
+        last_tick = None
+        last_candle = None
+        while True:
+            self.hub.wait_active()
+            try:
+                seq = self.store.sequence
+                if seq != last_seq:
+                    last_seq = seq
+                    price, tick_ms = self.store.last_price()
+                    if tick_ms and tick_ms != last_tick:
+                        last_tick = tick_ms
+                        self.hub.publish("tick", {"price": price, "time": tick_ms})
+                    open_time, _ = self.store.view()
+                    if len(open_time) and open_time[-1] != last_candle:
+                        df = self.store.to_frame()
+                        last_candle = int(df["开盘时间"].iloc[-1])
+                        self.hub.publish("candle", candle_payload(df.iloc[-1]))
+            except Exception as e:
+                logging.error(f"监视共享存储失败: {e}")
+            time.sleep(self.interval)
+
+
+def register_push_routes(server, hub, on_subscribe=None, authorize=None, get_client=None):
+    """
+    在Flask服务上注册 /api/stream SSE 端点。
+    authorize() 为 False 时返回401；连接数已满时返回503，浏览器退回定时刷新。
+    """
+
+    @server.route('/api/stream')
+    def stream_updates():
+        if authorize is not None and not authorize():
+            return jsonify({"error": "未授权访问"}), 401
+        q = hub.subscribe(get_client() if get_client is not None else None)
+        if q is None:
+            response = jsonify({"error": "推送连接数已满，请使用定时刷新"})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(PUSH_HEARTBEAT_SECONDS * 2)
+            return response
+        if on_subscribe is not None:
+            on_subscribe()
+        response = Response(stream_with_context(hub.stream(q)), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'  # 关闭反向代理缓冲
+        return response
+
+    return stream_updates
@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from flask import jsonify, request
+from config import RATE_LIMIT_MAX_KEYS, RATE_LIMIT_WHEEL_TICK
+
+OVERFLOW_KEY = ("__overflow__",)  # 跟踪的键已满时，新键共用的桶
+CALLBACK_PATH = '/_dash-update-component'
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated', 'slot')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+        self.slot = -1
+
+
+# ========== 令牌桶限流 ==========
+class RateLimiter:
+    """
+    按键（客户端、客户端+接口）的令牌桶限流。
+    空闲的桶挂在时间轮上按槽过期，数量超过上限时淘汰最久未使用且已补满的桶；
+    最久未使用的桶仍未补满时不淘汰（否则被限流的客户端可借大量新键重置额度），
+    新键改为共用一个溢出桶。每次检查为 O(1)，内存有上界。
+    """
+
+    def __init__(self, rate, capacity, idle_ttl=None, max_keys=RATE_LIMIT_MAX_KEYS, tick=RATE_LIMIT_WHEEL_TICK):
+        self.rate = rate  # 每秒补充的令牌数
+        self.capacity = capacity  # 桶容量（允许的突发请求数）
+        # 桶补满所需时间之后即可丢弃，重新创建的桶与补满的桶等价
+        self.idle_ttl = idle_ttl or max(capacity / rate, tick)
+        self.max_keys = max_keys
+        self.tick = tick
+        self.rejected = 0
+        self.overflowed = 0  # 因键已满而使用溢出桶的次数
+        self._buckets = OrderedDict()
+        self._wheel = [set() for _ in range(int(self.idle_ttl / tick) + 2)]
+        self._current_tick = int(time.monotonic() / tick)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def allow(self, key, cost=1):
+        """消耗 cost 个令牌，令牌不足时返回 False"""
+        now = time.monotonic()
+        with self._lock:
+            self._advance(now)
+            bucket = self._touch(self._resolve(key, now), now)
+            if bucket.tokens >= cost:
+                bucket.tokens -= cost
+                return True
+            self.rejected += 1
+            return False
+
+    def available(self, key):
+        """当前可用的令牌数，不消耗"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(self._resolve(key, now))
+            if bucket is None:
+                return self.capacity
+            return min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+
+    def retry_after(self, key, cost=1):
+        """距离可用 cost 个令牌还需等待的秒数"""
+        return max(0.0, (cost - self.available(key)) / self.rate)
+
+    def reset(self, key):
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            if bucket is not None:
+                self._wheel[bucket.slot].discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            for slot in self._wheel:
+                slot.clear()
+
+    def _refilled(self, bucket, now):
+        return bucket.tokens + (now - bucket.updated) * self.rate >= self.capacity
+
+    def _resolve(self, key, now):
+        """键已满且无法淘汰时，新键映射到溢出桶"""
+        if key in self._buckets or len(self._buckets) < self.max_keys:
+            return key
+        oldest = next(iter(self._buckets.values()))
+        if self._refilled(oldest, now):
+            return key
+        self.overflowed += 1
+        return OVERFLOW_KEY
+
+    def _touch(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys and key != OVERFLOW_KEY:
+                # _resolve 已确认最久未使用的桶已补满，淘汰它与保留等价
+                oldest, evicted = self._buckets.popitem(last=False)
+                self._wheel[evicted.slot].discard(oldest)
+            bucket = _Bucket(self.capacity, now)
+            self._buckets[key] = bucket
+        else:
+            bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+            self._buckets.move_to_end(key)
+        # 重新挂到过期时间对应的槽
+        slot = int((now + self.idle_ttl) / self.tick) % len(self._wheel)
+        if slot != bucket.slot:
+            if bucket.slot >= 0:
+                self._wheel[bucket.slot].discard(key)
+            self._wheel[slot].add(key)
+            bucket.slot = slot
+        return bucket
+
+    def _advance(self, now):
+        """推进时间轮，清理已过期槽中的桶"""
+        target = int(now / self.tick)
+        steps = min(target - self._current_tick, len(self._wheel))
+        for step in range(1, steps + 1):
+            slot = self._wheel[(self._current_tick + step) % len(self._wheel)]
+            for key in slot:
+                bucket = self._buckets.get(key)
+                if bucket is not None and now - bucket.updated >= self.idle_ttl:
+                    del self._buckets[key]
+            slot.difference_update([key for key in slot if key not in self._buckets])
+        self._current_tick = target
+
+
+def get_client_ip(request):
+    """
+    客户端IP，只使用连接的对端地址。X-Forwarded-For 由客户端控制，不能直接信任；
+    部署在反向代理之后时设置 TRUSTED_PROXY_COUNT，由 ProxyFix 按可信代理层数改写 remote_addr。
+    """
+    return request.remote_addr or 'unknown'
+
+
+def callback_endpoint(payload, known_outputs):
+    """
+    Dash 回调请求的限流接口名。output 由客户端填写，只接受已注册的回调，
+    未知或非字符串的 output 共用一个键，避免单个客户端用随机 output 占满限流器的键。
+    """
+    output = payload.get('output') if isinstance(payload, dict) else None
+    if isinstance(output, str) and output in known_outputs:
+        return output
+    return CALLBACK_PATH
+
+
+def register_request_throttle(server, limiter, known_outputs, paths=()):
+    """在进入Dash回调和 paths 中的接口之前按 (客户端IP, 接口) 拒绝过量请求，返回429"""
+
+    @server.before_request
+    def throttle_callbacks():
+        if request.path == CALLBACK_PATH:
+            endpoint = callback_endpoint(request.get_json(silent=True), known_outputs)
+        elif request.path in paths:
+            endpoint = request.path
+        else:
+            return None
+        client_ip = get_client_ip(request)
+        key = (client_ip, endpoint)
+        if limiter.allow(key):
+            return None
+        logging.warning(f"回调请求过于频繁: {client_ip} {endpoint}")
+        response = jsonify({"message": "请求过于频繁"})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, round(limiter.retry_after(key))))
+        return response
+
+    return throttle_callbacks
@@ -0,0 +1,76 @@
+# 生产部署入口：一个采集进程负责行情WebSocket并写入共享行情存储，
+# 多个无状态的Dash服务进程只读映射同一存储。
+#
+#     python serve.py
+import logging
+import multiprocessing
+import os
+from auth_config import SERVER_CONFIG
+from config import MARKET_STORE_PATH
+from logging_setup import setup_logging
+
+
+def run_ingestor(queue):
+    """采集进程：唯一持有行情连接的进程，也是唯一写入并轮转日志文件的进程"""
+    setup_logging(force=True)
+    import btc_kline_collector as collector
+    collector.command_queue = queue
+    collector.attach_market_store(writer=True)
+    ws_thread = collector.start_ingestion()
+    ws_thread.join()
+
+
+def attach_worker(queue):
+    """服务进程：挂载共享存储，不启动任何行情连接"""
+    setup_logging(filename=None, force=True)  # 日志只经队列输出到控制台
+    import btc_kline_collector as collector
+    from session_store import SessionStore, SqliteSessionBackend
+    collector.command_queue = queue
+    collector.attach_market_store(writer=False)
+    # 各服务进程共享会话，请求可以落在任意进程上
+    collector.session_store = SessionStore(SqliteSessionBackend())
+    return collector.server
+
+
+def run_gunicorn(queue, workers):
+    from gunicorn.app.base import BaseApplication
+
+    class DashApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{SERVER_CONFIG['HOST']}:{SERVER_CONFIG['PORT']}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("threads", SERVER_CONFIG["THREADS"])
+            self.cfg.set("timeout", 120)  # DeepSeek 分析最长等待60秒
+
+        def load(self):
+            return attach_worker(queue)
+
+    DashApplication().run()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    workers = SERVER_CONFIG["WORKERS"]
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        logging.warning("未安装 gunicorn，退回单进程模式")
+        import btc_kline_collector as collector
+        collector.start_ingestion()
+        collector.app.run_server(debug=False, host=SERVER_CONFIG["HOST"], port=SERVER_CONFIG["PORT"])
+        return
+
+    if os.path.exists(MARKET_STORE_PATH):
+        os.remove(MARKET_STORE_PATH)
+
+    queue = multiprocessing.Queue()
+    ingestor = multiprocessing.Process(target=run_ingestor, args=(queue,), name="ingestor", daemon=True)
+    ingestor.start()
+    logging.info(f"采集进程已启动 (pid={ingestor.pid})，启动 {workers} 个服务进程")
+    run_gunicorn(queue, workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import SESSION_MAX_SESSIONS, SESSION_MAX_BYTES, SESSION_CHAT_HISTORY, SESSION_DB_PATH
+from auth_config import SECURITY_CONFIG
+
+SESSION_TTL = SECURITY_CONFIG["SESSION_TIMEOUT"]
+
+
+# ========== 内存后端 ==========
+class MemorySessionBackend:
+    """
+    LRU + TTL 的内存会话存储，查找和更新均为 O(1)。
+    按最近访问顺序排列，过期或超出数量/内存上限时从最久未访问的一端淘汰。
+    """
+
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS, max_bytes=SESSION_MAX_BYTES, ttl=SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self.evicted = 0
+        self._items = OrderedDict()  # session_id -> (最后访问时间, 大小, 数据)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(session_id)
+            if item is None:
+                return None
+            accessed, size, data = item
+            if now - accessed > self.ttl:
+                self._remove(session_id)
+                return None
+            self._items[session_id] = (now, size, data)
+            self._items.move_to_end(session_id)
+            return data
+
+    def set(self, session_id, data):
+        size = len(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            if session_id in self._items:
+                self._remove(session_id)
+            self._items[session_id] = (now, size, data)
+            self.total_bytes += size
+            self._evict(now)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._remove(session_id)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.total_bytes = 0
+
+    def _remove(self, session_id):
+        item = self._items.pop(session_id, None)
+        if item is not None:
+            self.total_bytes -= item[1]
+
+    def _evict(self, now):
+        while self._items:
+            oldest_id, (accessed, _, _) = next(iter(self._items.items()))
+            if (now - accessed > self.ttl
+                    or len(self._items) > self.max_sessions
+                    or self.total_bytes > self.max_bytes):
+                self._remove(oldest_id)
+                self.evicted += 1
+            else:
+                break
+
+
+# ========== SQLite 后端 ==========
+class SqliteSessionBackend:
+    """本地 SQLite 会话存储，供多进程部署时各服务进程共享"""
+
+    def __init__(self, path=SESSION_DB_PATH, max_sessions=SESSION_MAX_SESSIONS, ttl=SESSION_TTL):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, data TEXT NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_accessed ON sessions (accessed)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT data FROM sessions WHERE id = ? AND accessed >= ?",
+            (session_id, time.time() - self.ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE sessions SET accessed = ? WHERE id = ?", (time.time(), session_id))
+        conn.commit()
+        return json.loads(row[0])
+
+    def set(self, session_id, data):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, data, accessed) VALUES (?, ?, ?)",
+            (session_id, json.dumps(data, ensure_ascii=False), now)
+        )
+        # 淘汰过期及超出数量上限的会话
+        conn.execute("DELETE FROM sessions WHERE accessed < ?", (now - self.ttl,))
+        conn.execute(
+            "DELETE FROM sessions WHERE id IN ("
+            "SELECT id FROM sessions ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,)
+        )
+        conn.commit()
+
+    def delete(self, session_id):
+        conn = self._conn()
+        conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        conn.commit()
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM sessions")
+        conn.commit()
+
+
+# ========== 会话状态 ==========
+class SessionStore:
+    """按会话隔离的聊天记录、持仓输入和最近一次分析结果"""
+
+    def __init__(self, backend=None, chat_limit=SESSION_CHAT_HISTORY):
+        self.backend = backend or MemorySessionBackend()
+        self.chat_limit = chat_limit
+
+    def get(self, session_id):
+        if not session_id:
+            return self._empty()
+        return self.backend.get(session_id) or self._empty()
+
+    def save_position(self, session_id, entry_price, direction, leverage, position_size):
+        if not session_id:
+            return
+        state = self.get(session_id)
+        state["position"] = {
+            "entry_price": entry_price,
+            "direction": direction,
+            "leverage": leverage,
+            "position_size": position_size,
+        }
+        self.backend.set(session_id, state)
+
+    def add_analysis(self, session_id, chat_entry):
+        """记录一次分析结果，聊天记录只保留最近 chat_limit 条"""
+        if not session_id:
+            return
+        state = self.get(session_id)
+        state["chat_history"] = (state["chat_history"] + [chat_entry])[-self.chat_limit:]
+        state["last_analysis"] = chat_entry
+        self.backend.set(session_id, state)
+
+    def clear(self):
+        self.backend.clear()
+
+    @staticmethod
+    def _empty():
+        return {"chat_history": [], "position": None, "last_analysis": None}
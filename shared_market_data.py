@@ -0,0 +1,218 @@
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from config import MARKET_STORE_PATH, MARKET_STORE_CAPACITY, MARKET_STORE_STATUS_SIZE, MARKET_STORE_READ_TIMEOUT
+
+# K线和指标列，与 TechnicalIndicators 计算结果的列名一致
+VALUE_COLUMNS = [
+    "开盘价", "最高价", "最低价", "收盘价", "成交量",
+    "MA5", "MA10", "MA20", "MA30",
+    "RSI", "MACD", "Signal", "MACD_Hist",
+    "BB_Middle", "BB_Upper", "BB_Lower",
+]
+
+_MAGIC = 0x4B4C494E45  # "KLINE"
+_HEADER_SIZE = 4096
+# 头部 int64 字段位置
+_H_MAGIC, _H_CAPACITY, _H_COUNT, _H_SEQ, _H_TICK_MS, _H_STATUS_LEN, _H_UPDATED_MS = range(7)
+# 头部 float64 字段位置（紧随 int64 字段之后）
+_H_LAST_PRICE = 0
+
+
+def open_time_of(record):
+    """K线记录的开盘时间（毫秒）"""
+    if "开盘时间" in record:
+        return int(record["开盘时间"])
+    return int(datetime.strptime(record["时间"], '%Y-%m-%d %H:%M:%S').timestamp() * 1000)
+
+
+class SharedKlineStore:
+    """
+    基于 mmap 文件的共享行情存储：单个采集进程写入K线、指标和最新价格，
+    多个服务进程只读映射同一文件，无需序列化传输。
+    写入使用顺序锁（seqlock）：采集进程内的多个写入线程由互斥锁串行化，
+    读取方发现序号变化时重试，超过 read_timeout 秒仍读不到一致的快照（写入方卡在写入中途）时抛出 TimeoutError。
+    """
+
+    def __init__(self, path=MARKET_STORE_PATH, capacity=MARKET_STORE_CAPACITY,
+                 status_size=MARKET_STORE_STATUS_SIZE, writer=False, read_timeout=MARKET_STORE_READ_TIMEOUT):
+        self.path = path
+        self.writer = writer
+        self.read_timeout = read_timeout
+        self.status_dropped = 0  # 超出状态区容量而丢弃的状态数
+        self._write_lock = threading.Lock()
+        if writer:
+            size = self._file_size(capacity, status_size)
+            with open(path, 'wb') as f:
+                f.truncate(size)
+            self._file = open(path, 'r+b')
+            self._mm = mmap.mmap(self._file.fileno(), size)
+        else:
+            self._file = open(path, 'rb')
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            capacity = int(np.frombuffer(self._mm, dtype=np.int64, count=2)[_H_CAPACITY])
+            status_size = len(self._mm) - self._file_size(capacity, 0)
+        self.capacity = capacity
+        self.status_size = status_size
+
+        self._ints = np.frombuffer(self._mm, dtype=np.int64, count=16)
+        self._floats = np.frombuffer(self._mm, dtype=np.float64, count=16, offset=128)
+        offset = _HEADER_SIZE
+        self._open_time = np.frombuffer(self._mm, dtype=np.int64, count=capacity, offset=offset)
+        offset += capacity * 8
+        self._values = np.frombuffer(
+            self._mm, dtype=np.float64, count=capacity * len(VALUE_COLUMNS), offset=offset
+        ).reshape(len(VALUE_COLUMNS), capacity)
+        offset += capacity * 8 * len(VALUE_COLUMNS)
+        self._status = np.frombuffer(self._mm, dtype=np.uint8, count=status_size, offset=offset)
+
+        if writer:
+            self._ints[_H_CAPACITY] = capacity
+            self._ints[_H_MAGIC] = _MAGIC
+        elif self._ints[_H_MAGIC] != _MAGIC:
+            raise ValueError(f"{path} 不是有效的行情存储文件")
+
+    @staticmethod
+    def _file_size(capacity, status_size):
+        return _HEADER_SIZE + capacity * 8 * (1 + len(VALUE_COLUMNS)) + status_size
+
+    # ========== 写入（仅采集进程） ==========
+    @contextmanager
+    def _writing(self):
+        """一次写入：序号为奇数期间读取方会重试；加锁保证并发写入的线程不会交错修改序号"""
+        with self._write_lock:
+            self._ints[_H_SEQ] += 1
+            try:
+                yield
+            finally:
+                self._ints[_H_UPDATED_MS] = int(time.time() * 1000)
+                self._ints[_H_SEQ] += 1
+
+    def write_candles(self, df):
+        """写入最近的K线及指标，df 需包含 开盘时间 或 时间 列"""
+        df = df.iloc[-self.capacity:]
+        n = len(df)
+        if "开盘时间" in df.columns:
+            open_time = df["开盘时间"].to_numpy(dtype=np.int64)
+        else:
+            open_time = pd.to_datetime(df["时间"]).map(lambda t: int(t.timestamp() * 1000)).to_numpy(dtype=np.int64)
+        with self._writing():
+            self._open_time[:n] = open_time
+            for i, column in enumerate(VALUE_COLUMNS):
+                if column in df.columns:
+                    self._values[i, :n] = df[column].to_numpy(dtype=np.float64)
+                else:
+                    self._values[i, :n] = np.nan
+            self._ints[_H_COUNT] = n
+
+    def write_tick(self, price, event_ms=None):
+        """写入最新成交价"""
+        with self._writing():
+            self._floats[_H_LAST_PRICE] = price
+            self._ints[_H_TICK_MS] = event_ms or int(time.time() * 1000)
+
+    def write_status(self, status):
+        """写入JSON状态（盘口摘要、秒级K线摘要、最近提醒等），超出容量时丢弃并返回 False，服务进程继续读到上一次的状态"""
+        payload = json.dumps(status, ensure_ascii=False).encode('utf-8')
+        if len(payload) > self.status_size:
+            self.status_dropped += 1
+            if self.status_dropped == 1 or self.status_dropped % 60 == 0:
+                logging.warning(f"状态 {len(payload)} 字节超出状态区容量 {self.status_size} 字节，"
+                                f"已丢弃（累计 {self.status_dropped} 次）")
+            return False
+        with self._writing():
+            self._status[:len(payload)] = np.frombuffer(payload, dtype=np.uint8)
+            self._ints[_H_STATUS_LEN] = len(payload)
+        return True
+
+    # ========== 读取（任意进程） ==========
+    @property
+    def sequence(self):
+        return int(self._ints[_H_SEQ])
+
+    def _consistent(self, read):
+        deadline = time.monotonic() + self.read_timeout
+        while True:
+            seq = self._ints[_H_SEQ]
+            if seq % 2 == 0:
+                result = read()
+                if self._ints[_H_SEQ] == seq:
+                    return result
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{self.path} 在 {self.read_timeout} 秒内没有一致的快照（序号 {int(seq)}），写入方可能已中断")
+            time.sleep(0)
+
+    def view(self):
+        """不复制的列视图，调用方需自行处理并发写入"""
+        n = int(self._ints[_H_COUNT])
+        return self._open_time[:n], self._values[:, :n]
+
+    def snapshot(self):
+        """一致的列快照：(开盘时间数组, {列名: 数组})"""
+        def read():
+            n = int(self._ints[_H_COUNT])
+            return self._open_time[:n].copy(), self._values[:, :n].copy()
+        open_time, values = self._consistent(read)
+        return open_time, dict(zip(VALUE_COLUMNS, values))
+
+    def last_price(self):
+        return self._consistent(lambda: (float(self._floats[_H_LAST_PRICE]), int(self._ints[_H_TICK_MS])))
+
+    def status(self):
+        def read():
+            length = int(self._ints[_H_STATUS_LEN])
+            return self._status[:length].tobytes()
+        payload = self._consistent(read)
+        return json.loads(payload) if payload else {}
+
+    def __len__(self):
+        return int(self._ints[_H_COUNT])
+
+    def to_frame(self):
+        """包含指标列的DataFrame"""
+        open_time, columns = self.snapshot()
+        df = pd.DataFrame(columns)
+        df.insert(0, "时间", pd.to_datetime([datetime.fromtimestamp(t / 1000) for t in open_time]))
+        df.insert(0, "开盘时间", open_time)
+        return df
+
+    def to_records(self):
+        """与 kline_history 相同格式的记录列表"""
+        open_time, columns = self.snapshot()
+        return [
+            {
+                "时间": datetime.fromtimestamp(t / 1000).strftime('%Y-%m-%d %H:%M:%S'),
+                "开盘时间": int(t),
+                "开盘价": float(columns["开盘价"][i]),
+                "最高价": float(columns["最高价"][i]),
+                "最低价": float(columns["最低价"][i]),
+                "收盘价": float(columns["收盘价"][i]),
+                "成交量": float(columns["成交量"][i]),
+            }
+            for i, t in enumerate(open_time)
+        ]
+
+    def close(self):
+        self._ints = self._floats = self._open_time = self._values = self._status = None
+        self._mm.close()
+        self._file.close()
+
+
+def wait_for_store(path=MARKET_STORE_PATH, timeout=60):
+    """等待采集进程创建存储文件"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if os.path.exists(path) and os.path.getsize(path) > _HEADER_SIZE:
+            try:
+                return SharedKlineStore(path)
+            except ValueError:
+                pass
+        time.sleep(0.2)
+    raise TimeoutError(f"等待行情存储 {path} 超时")
@@ -0,0 +1,115 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from anomaly_detector import AnomalyDetector, Ewma, OnlineStats, SeriesMonitor, RETURN, VOLUME
+
+MINUTE = 60000
+
+
+def samples(n=500, loc=5.0, scale=2.0, seed=3):
+    return np.random.default_rng(seed).normal(loc, scale, n)
+
+
+@pytest.mark.parametrize("offset", [0.0, 1e9])
+def test_welford_matches_numpy(offset):
+    # 大偏移下仍与两遍算法一致（朴素的平方和相减会失去全部精度）
+    x = samples() + offset
+    stats = OnlineStats()
+    for value in x:
+        stats.update(value)
+    assert stats.count == len(x)
+    assert stats.mean == pytest.approx(x.mean(), rel=1e-12)
+    assert stats.variance == pytest.approx(x.var(ddof=1), rel=1e-6)
+    assert stats.zscore(x[0]) == pytest.approx((x[0] - x.mean()) / x.std(ddof=1), rel=1e-6)
+
+
+def test_welford_degenerate_cases():
+    stats = OnlineStats()
+    assert stats.variance == 0.0 and stats.zscore(1.0) == 0.0
+    stats.update(2.0)
+    stats.update(2.0)
+    assert stats.variance == 0.0 and stats.zscore(3.0) == 0.0
+
+
+def test_ewma_matches_pandas():
+    x = samples()
+    ewma = Ewma(alpha=0.1)
+    means, variances = [], []
+    for value in x:
+        ewma.update(value)
+        means.append(ewma.mean)
+        variances.append(ewma.variance)
+    expected = pd.Series(x).ewm(alpha=0.1, adjust=False)
+    np.testing.assert_allclose(means, expected.mean().to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(variances[1:], expected.var(bias=True).to_numpy()[1:], rtol=1e-10)
+
+
+def test_ewma_tracks_volatility_regime_change():
+    monitor = SeriesMonitor(alpha=0.1)
+    for value in samples(500, 0.0, 1.0):
+        monitor.observe(value)
+    for value in samples(200, 0.0, 5.0, seed=4):
+        monitor.observe(value)
+    # 波动率放大后近期基线跟上，长期基线仍偏小
+    assert math.sqrt(monitor.ewma.variance) > 3
+    assert math.sqrt(monitor.welford.variance) < 3.5
+
+
+def test_observe_scores_against_previous_baseline():
+    monitor = SeriesMonitor()
+    for value in [1.0, 2.0, 3.0]:
+        monitor.observe(value)
+    z, ewma_z, count = monitor.observe(10.0)
+    assert count == 3
+    assert z == pytest.approx((10.0 - 2.0) / 1.0)
+    assert ewma_z > 0
+    assert monitor.welford.count == 4
+
+
+def feed(detector, closes, volumes, start=0):
+    found = []
+    for i, (close, volume) in enumerate(zip(closes, volumes)):
+        found.extend(detector.on_candle("BTCUSDT", "1m", (start + i) * MINUTE, close, volume))
+    return found
+
+
+def quiet_market(n=200, seed=5):
+    rng = np.random.default_rng(seed)
+    closes = 30000 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    volumes = rng.lognormal(2, 0.2, n)
+    return list(closes), list(volumes)
+
+
+def test_detector_flags_price_jump_and_volume_spike():
+    detector = AnomalyDetector(threshold=4.0, alpha=0.05, min_samples=30)
+    closes, volumes = quiet_market()
+    assert feed(detector, closes, volumes) == []
+    anomalies = feed(detector, [closes[-1] * 1.03], [volumes[-1] * 50], start=len(closes))
+    assert {anomaly.metric for anomaly in anomalies} == {RETURN, VOLUME}
+    assert all(anomaly.zscore >= 4.0 and anomaly.ewma_zscore >= 4.0 for anomaly in anomalies)
+    assert detector.flagged == 2 and detector.checked == len(closes) + 1
+
+
+def test_detector_ignores_volume_drop_and_warm_up():
+    detector = AnomalyDetector(min_samples=30)
+    closes, volumes = quiet_market()
+    # 预热期内的跳变不判断
+    assert feed(detector, closes[:10] + [closes[9] * 1.05], volumes[:11]) == []
+    detector = AnomalyDetector(min_samples=30)
+    feed(detector, closes, volumes)
+    # 缩量只检测放量，不算异常
+    assert feed(detector, [closes[-1]], [0.0], start=len(closes)) == []
+
+
+def test_detector_skips_duplicate_and_out_of_order_candles():
+    detector = AnomalyDetector()
+    closes, volumes = quiet_market(50)
+    feed(detector, closes, volumes)
+    checked = detector.checked
+    assert detector.on_candle("BTCUSDT", "1m", 49 * MINUTE, closes[-1] * 2, 1e6) == []
+    assert detector.on_candle("BTCUSDT", "1m", 10 * MINUTE, closes[-1] * 2, 1e6) == []
+    assert detector.checked == checked
+    # 不同周期是独立的序列
+    detector.on_candle("BTCUSDT", "5m", 0, closes[0], volumes[0])
+    assert len(detector) == 2
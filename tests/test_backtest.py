@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from backtest import ENTRY, EXIT, evaluate_signals
+
+MARGIN = 50.0
+
+
+def run(close, signals, **kwargs):
+    settings = {"leverage": 10, "position_size": MARGIN, "fee_rate": 0.0, "maintenance_rate": 0.004}
+    settings.update(kwargs)
+    return evaluate_signals(np.array(close, dtype=float), np.array(signals, dtype=np.int8), **settings)
+
+
+def test_profitable_trade_matches_equity():
+    result = run([100, 101, 102, 103], [ENTRY, 0, EXIT, 0], fee_rate=0.001)
+    trade = result["trades"].iloc[0]
+    assert not trade["强平"]
+    assert trade["盈亏"] == pytest.approx(0.02 * 500 - 2 * 500 * 0.001)
+    assert result["total_pnl"] == pytest.approx(result["trades"]["盈亏"].sum())
+    assert result["liquidations"] == 0
+
+
+def test_liquidation_caps_loss_at_margin_and_stops_run():
+    # 10倍杠杆下跌20%（超过强平线 9.6%），之后的信号不再开仓
+    close = [100, 95, 80, 85, 90, 95, 100]
+    signals = [ENTRY, 0, 0, EXIT, ENTRY, 0, EXIT]
+    result = run(close, signals)
+    trades = result["trades"]
+    assert len(trades) == 1 and bool(trades.iloc[0]["强平"])
+    assert trades.iloc[0]["平仓索引"] == 2
+    assert trades.iloc[0]["平仓价"] == pytest.approx(100 * (1 - (0.1 - 0.004)))
+    assert trades.iloc[0]["盈亏"] == pytest.approx(-MARGIN)
+    assert result["total_pnl"] == pytest.approx(-MARGIN)
+    assert result["equity"].min() >= 0
+    assert result["bankrupt"]
+
+
+def test_reentry_after_liquidation_when_equity_remains():
+    # 先盈利 100（权益150），强平亏损50后仍可继续交易
+    close = [100, 120, 100, 80, 80, 88]
+    signals = [ENTRY, EXIT, ENTRY, 0, ENTRY, EXIT]
+    result = run(close, signals)
+    assert list(result["trades"]["强平"]) == [False, True, False]
+    assert result["trades"]["开仓索引"].tolist() == [0, 2, 4]
+    assert result["total_pnl"] == pytest.approx(100 - MARGIN + 50)
+    assert not result["bankrupt"]
+
+
+def test_intrabar_low_triggers_liquidation():
+    close = [100, 99, 101, 102]
+    low = [100, 90, 100, 101]
+    signals = [ENTRY, 0, 0, EXIT]
+    assert run(close, signals)["liquidations"] == 0
+    result = run(close, signals, low=low, high=close)
+    assert result["liquidations"] == 1
+    assert result["trades"].iloc[0]["平仓索引"] == 1
+
+
+def test_short_liquidation_on_rally():
+    close = [100, 105, 115, 100]
+    # 空头使用相反的信号：EXIT 开空，ENTRY 平空
+    result = run(close, [EXIT, 0, 0, ENTRY], direction='short')
+    assert result["liquidations"] == 1
+    assert result["trades"].iloc[0]["平仓价"] == pytest.approx(100 * (1 + 0.096))
+    assert result["total_pnl"] == pytest.approx(-MARGIN)
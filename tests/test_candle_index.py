@@ -0,0 +1,77 @@
+import threading
+from candle_index import CandleIndex, INSERTED, UPDATED, DUPLICATE
+
+MINUTE = 60000
+
+
+def candle(minute, close=1.0):
+    return {"开盘时间": minute * MINUTE, "收盘价": close}
+
+
+def test_upsert_deduplicates_by_open_time():
+    index = CandleIndex()
+    assert index.upsert(candle(1)) == INSERTED
+    assert index.upsert(candle(1)) == DUPLICATE
+    assert index.upsert(candle(1, close=2.0)) == UPDATED
+    assert index.records == [candle(1, close=2.0)]
+    assert (index.inserted, index.updated, index.duplicates) == (1, 1, 1)
+
+
+def test_out_of_order_inserts_stay_sorted():
+    index = CandleIndex()
+    counts = index.upsert_many([candle(5), candle(1), candle(3), candle(1)])
+    assert counts == {INSERTED: 3, UPDATED: 0, DUPLICATE: 1}
+    index.upsert(candle(2))
+    assert [r["开盘时间"] // MINUTE for r in index.records] == [1, 2, 3, 5]
+    assert index.last_open_time() == 5 * MINUTE
+
+
+def test_gaps():
+    index = CandleIndex()
+    index.upsert_many([candle(1), candle(2), candle(5), candle(7)])
+    assert index.gaps() == [(3 * MINUTE, 4 * MINUTE), (6 * MINUTE, 6 * MINUTE)]
+    assert index.missing_count((3 * MINUTE, 4 * MINUTE)) == 2
+    assert index.gap_before(8 * MINUTE) is None
+    assert index.gap_before(10 * MINUTE) == (8 * MINUTE, 9 * MINUTE)
+    assert CandleIndex().gap_before(MINUTE) is None
+
+
+def test_evict_oldest_forgets_open_times():
+    index = CandleIndex()
+    index.upsert_many([candle(i) for i in range(5)])
+    evicted = index.evict_oldest(2)
+    assert [r["开盘时间"] // MINUTE for r in evicted] == [0, 1, 2]
+    assert 0 not in index and 3 * MINUTE in index
+    assert index.upsert(candle(0)) == INSERTED  # 已移出的K线可以再次写入
+
+
+def test_snapshot_is_a_copy():
+    index = CandleIndex()
+    index.upsert_many([candle(i) for i in range(5)])
+    snapshot = index.snapshot()
+    index.evict_oldest(4)
+    assert len(snapshot) == 5 and len(index) == 4
+    assert index.snapshot(2) == [candle(3), candle(4)]
+
+
+def test_snapshot_consistent_under_concurrent_writes():
+    index = CandleIndex()
+    stop = threading.Event()
+
+    def write():
+        minute = 0
+        while not stop.is_set():
+            index.upsert(candle(minute))
+            index.evict_oldest(50)
+            minute += 1
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        for _ in range(2000):
+            times = [r["开盘时间"] for r in index.snapshot()]
+            assert times == sorted(set(times))
+            assert not times or times[-1] - times[0] == (len(times) - 1) * MINUTE
+    finally:
+        stop.set()
+        thread.join()
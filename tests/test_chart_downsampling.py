@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from chart_downsampling import CandlePyramid, lttb
+
+MINUTE = 60000
+QUARTER = 15 * MINUTE
+
+
+def frame(open_time):
+    n = len(open_time)
+    close = np.linspace(100, 200, n)
+    return pd.DataFrame({
+        "开盘时间": np.asarray(open_time, dtype=np.int64),
+        "开盘价": close, "最高价": close + 1, "最低价": close - 1, "收盘价": close,
+        "成交量": np.ones(n), "MA5": close,
+    })
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[500] = 10
+    keep = lttb(x, y, 50)
+    assert len(keep) == 50 and keep[0] == 0 and keep[-1] == 999
+    assert 500 in keep
+
+
+def test_viewport_selects_level_by_time_span():
+    pyramid = CandlePyramid(frame(np.arange(3 * 1440) * MINUTE), base_ms=MINUTE)
+    assert pyramid.query(0, 60 * MINUTE, max_points=250)[0] == 1
+    factor, candles, lines = pyramid.query(max_points=250)
+    assert factor == 30 and len(candles) <= 250
+    assert len(lines["MA5"][0]) <= 250
+
+
+def test_sparse_cold_rows_use_coarse_level():
+    # 10 天的15分钟冷层K线接 1 天的1分钟K线：按行数只有约 2400 根，按时长相当于 15840 根1分钟K线
+    cold = np.arange(10 * 96) * QUARTER
+    fine = cold[-1] + QUARTER + np.arange(1440) * MINUTE
+    pyramid = CandlePyramid(frame(np.concatenate([cold, fine])), base_ms=MINUTE)
+    factor, candles, _ = pyramid.query(max_points=250)
+    assert factor == 240 and len(candles) <= 250
+    # 聚合的成交量守恒：冷层每行代表一个15分钟桶
+    assert candles["成交量"].sum() == len(cold) + len(fine)
+    assert pyramid.query(int(cold[0]), int(cold[15]), max_points=250)[0] == 1
@@ -0,0 +1,123 @@
+import threading
+import time
+from typing import NamedTuple
+import pytest
+from event_bus import EventBus, Subscription, BLOCK, DROP_OLDEST, DROP_NEWEST
+
+
+class First(NamedTuple):
+    value: int
+
+
+class Second(NamedTuple):
+    value: int
+
+
+def blocked_subscription(overflow, maxsize=2):
+    """处理函数卡在第一个事件上，之后的事件留在队列中"""
+    entered, release = threading.Event(), threading.Event()
+    handled = []
+
+    def handler(event):
+        entered.set()
+        release.wait(5)
+        handled.append(event)
+
+    subscription = Subscription("test", handler, [First], maxsize=maxsize, overflow=overflow)
+    subscription.put(First(0))
+    assert entered.wait(5)
+    return subscription, release, handled
+
+
+def test_join_waits_for_running_and_chained_handlers():
+    bus = EventBus()
+    done = []
+
+    def first(event):
+        time.sleep(0.2)
+        bus.publish(Second(event.value))
+
+    def second(event):
+        time.sleep(0.2)
+        done.append(event.value)
+
+    bus.subscribe("first", first, [First])
+    bus.subscribe("second", second, [Second])
+    bus.publish(First(1))
+    time.sleep(0.05)  # 第一个处理函数已取出事件，队列为空
+    bus.join()
+    assert done == [1]
+    assert bus.stats()["second"]["processed"] == 1
+
+
+def test_drop_oldest_keeps_newest_events():
+    subscription, release, handled = blocked_subscription(DROP_OLDEST)
+    try:
+        for value in range(1, 5):
+            subscription.put(First(value))
+        assert subscription.dropped == 2 and subscription.pending() == 2
+    finally:
+        release.set()
+    subscription.join()
+    assert [event.value for event in handled] == [0, 3, 4]
+
+
+def test_drop_newest_keeps_queued_events():
+    subscription, release, handled = blocked_subscription(DROP_NEWEST)
+    try:
+        for value in range(1, 5):
+            subscription.put(First(value))
+        assert subscription.dropped == 2
+    finally:
+        release.set()
+    subscription.join()
+    assert [event.value for event in handled] == [0, 1, 2]
+
+
+def test_block_waits_for_space_without_dropping():
+    subscription, release, handled = blocked_subscription(BLOCK, maxsize=1)
+    subscription.put(First(1))
+    publisher = threading.Thread(target=subscription.put, args=(First(2),), daemon=True)
+    publisher.start()
+    publisher.join(0.2)
+    try:
+        assert publisher.is_alive()  # 队列已满，发布方等待
+    finally:
+        release.set()
+    publisher.join(5)
+    subscription.join()
+    assert [event.value for event in handled] == [0, 1, 2]
+    assert subscription.dropped == 0
+
+
+def test_lag_reports_oldest_pending_event():
+    subscription, release, _ = blocked_subscription(DROP_OLDEST, maxsize=4)
+    try:
+        assert subscription.lag() == 0.0
+        subscription.put(First(1))
+        time.sleep(0.1)
+        assert subscription.lag() >= 0.1
+    finally:
+        release.set()
+    subscription.join()
+    assert subscription.lag() == 0.0
+
+
+def test_handler_exceptions_counted_as_failed():
+    bus = EventBus()
+
+    def handler(event):
+        if event.value % 2:
+            raise RuntimeError("boom")
+
+    bus.subscribe("flaky", handler, [First])
+    for value in range(4):
+        bus.publish(First(value))
+    bus.join()
+    stats = bus.stats()["flaky"]
+    assert stats["processed"] == 4 and stats["failed"] == 2
+
+
+def test_unknown_overflow_policy_rejected():
+    with pytest.raises(ValueError):
+        Subscription("bad", print, [First], overflow="spill")
@@ -0,0 +1,76 @@
+import importlib.util
+import json
+
+import numpy as np
+import pytest
+
+import config
+import fast_json
+
+FRAME = {
+    "e": "kline", "E": 1700000000123, "s": "BTCUSDT",
+    "k": {"t": 1700000000000, "T": 1700000059999, "s": "BTCUSDT", "i": "1m",
+          "o": "37012.01", "c": "37020.55", "h": "37025.00", "l": "37010.10",
+          "v": "12.34567", "n": 501, "x": False},
+}
+EXPECTED = (1700000000123, 1700000000000, 37012.01, 37025.0, 37010.1, 37020.55, 12.34567, False)
+
+RECORDS = [
+    {"时间": "2023-11-15 06:13:00", "开盘时间": 1700000000000, "开盘价": 37012.01,
+     "最高价": 37025.0, "最低价": 37010.1, "收盘价": 37020.55, "成交量": 12.34567, "MA5": None},
+    {"时间": "2023-11-15 06:14:00", "开盘时间": 1700000060000, "开盘价": 37020.55,
+     "最高价": 37030.0, "最低价": 37015.0, "收盘价": 37028.0, "成交量": 0.0, "MA5": 37018.2},
+]
+
+
+def load_backend(monkeypatch, backend):
+    """按 JSON_BACKEND 重新加载一份独立的 fast_json，不影响其他测试使用的模块"""
+    monkeypatch.setattr(config, "JSON_BACKEND", backend)
+    spec = importlib.util.spec_from_file_location(f"fast_json_{backend}", fast_json.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    modules = [load_backend(monkeypatch, "json")]
+    if fast_json.orjson is not None:
+        modules.append(load_backend(monkeypatch, "auto"))
+    assert modules[0].BACKEND == "json"
+    return modules
+
+
+@pytest.mark.parametrize("combined", [False, True])
+@pytest.mark.parametrize("as_bytes", [False, True])
+def test_parse_kline_frames(backends, combined, as_bytes):
+    frame = {"stream": "btcusdt@kline_1m", "data": FRAME} if combined else FRAME
+    message = json.dumps(frame)
+    if as_bytes:
+        message = message.encode()
+    for module in backends:
+        assert module.parse_kline(message) == EXPECTED
+
+
+def test_round_trip_across_backends(backends):
+    for writer in backends:
+        payload = writer.dumps_bytes(RECORDS)
+        assert writer.dumps(RECORDS).encode("utf-8") == payload
+        for reader in backends:
+            assert reader.loads(payload) == RECORDS
+            assert reader.loads(payload.decode("utf-8")) == RECORDS
+
+
+def test_backends_write_identical_bytes(backends):
+    outputs = {module.dumps_bytes(RECORDS) for module in backends}
+    assert len(outputs) == 1
+
+
+def test_nan_and_numpy_written_as_orjson_does(backends):
+    record = {"MA5": float("nan"), "上轨": float("inf"), "成交量": np.float64(1.5),
+              "笔数": np.int64(7), "序列": np.array([1.0, np.nan])}
+    expected = {"MA5": None, "上轨": None, "成交量": 1.5, "笔数": 7, "序列": [1.0, None]}
+    for writer in backends:
+        payload = writer.dumps_bytes(record)
+        for reader in backends:
+            assert reader.loads(payload) == expected
@@ -0,0 +1,51 @@
+import gzip
+import json
+import os
+from types import SimpleNamespace
+import pytest
+from feed_replay import offline_collector, read_frames, shift_frames
+
+
+def _collector(tmp_path):
+    calls = []
+    return SimpleNamespace(
+        save_data=lambda: calls.append("save"),
+        schedule_backfill=lambda gap: calls.append("backfill"),
+        fetch_klines=lambda *args, **kwargs: calls.append("rest"),
+        ANOMALY_AUTO_ANALYZE=True,
+        retention=SimpleNamespace(root=str(tmp_path / "live")),
+        alert_engine=SimpleNamespace(dispatcher="live-dispatcher"),
+    ), calls
+
+
+def test_offline_collector_swaps_side_effects_and_restores(tmp_path):
+    collector, calls = _collector(tmp_path)
+    with offline_collector(collector) as root:
+        collector.save_data()
+        collector.schedule_backfill((0, 60000))
+        with pytest.raises(RuntimeError):
+            collector.fetch_klines(0, 1)
+        assert collector.retention.root == root != str(tmp_path / "live")
+        assert collector.alert_engine.dispatcher != "live-dispatcher"
+        assert collector.ANOMALY_AUTO_ANALYZE is False
+    assert calls == []
+    assert not os.path.exists(root)
+    assert collector.retention.root == str(tmp_path / "live")
+    assert collector.alert_engine.dispatcher == "live-dispatcher"
+    collector.save_data()
+    assert calls == ["save"]
+
+
+def test_read_frames_tolerates_truncated_tail(tmp_path):
+    path = tmp_path / "capture.jsonl.gz"
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps([1, "kline", "{}"]) + "\n")
+        f.write('[2, "kline", "{')
+    assert [frame[0] for frame in read_frames(str(path))] == [1]
+
+
+def test_shift_frames_moves_event_and_kline_times():
+    message = json.dumps({"E": 1000, "k": {"t": 0, "T": 59999}})
+    (received, stream, shifted), = shift_frames([(5, "kline", message)], 60000)
+    data = json.loads(shifted)
+    assert (data["E"], data["k"]["t"], data["k"]["T"]) == (61000, 60000, 119999)
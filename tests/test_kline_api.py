@@ -0,0 +1,54 @@
+import json
+import numpy as np
+from flask import Flask
+from kline_api import register_kline_routes, interval_label, KLINE_COLUMNS
+from kline_retention import RESOLUTION
+
+MINUTE = 60000
+QUARTER = 15 * MINUTE
+
+
+def make_client(open_time, resolution):
+    n = len(open_time)
+    columns = {column: np.linspace(100, 100 + n, n) for column in KLINE_COLUMNS}
+    columns[RESOLUTION] = np.array(resolution, dtype=np.int64)
+    app = Flask(__name__)
+    register_kline_routes(app, lambda start, end: (np.array(open_time, dtype=np.int64), columns),
+                          "BTCUSDT", lambda: "1m")
+    return app.test_client()
+
+
+def mixed_client():
+    # 4 根15分钟冷层K线，之后 40 根1分钟K线
+    cold = [i * QUARTER for i in range(4)]
+    fine = [4 * QUARTER + i * MINUTE for i in range(40)]
+    return make_client(cold + fine, [QUARTER] * 4 + [MINUTE] * 40)
+
+
+def test_interval_label():
+    assert interval_label(MINUTE) == "1m"
+    assert interval_label(QUARTER) == "15m"
+    assert interval_label(3600000) == "1h"
+
+
+def test_mixed_range_reports_per_row_resolution():
+    body = json.loads(mixed_client().get("/api/klines").data)
+    assert body["interval"] == "mixed" and body["mixed_resolution"]
+    assert body["columns"][RESOLUTION][:5] == [QUARTER] * 4 + [MINUTE]
+
+
+def test_uniform_ranges_report_actual_interval():
+    client = mixed_client()
+    body = json.loads(client.get(f"/api/klines?end={3 * QUARTER}").data)
+    assert body["interval"] == "15m" and not body["mixed_resolution"]
+    body = json.loads(client.get(f"/api/klines?start={4 * QUARTER}").data)
+    assert body["interval"] == "1m" and body["count"] == 40
+
+
+def test_indicators_rejected_for_mixed_range():
+    client = mixed_client()
+    assert client.get("/api/klines?indicators=ma").status_code == 400
+    body = json.loads(client.get(f"/api/klines?start={4 * QUARTER + 28 * MINUTE}&indicators=ma").data)
+    # 预热只使用1分钟K线：连同第一根只有29根，MA30 在区间第一根还不能就绪
+    assert body["columns"]["MA30"][0] is None
+    assert body["columns"]["MA5"][0] is not None
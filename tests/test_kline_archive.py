@@ -0,0 +1,117 @@
+import os
+import time
+from datetime import datetime
+import numpy as np
+import pyarrow as pa
+import pytest
+import kline_archive
+from candle_index import CandleIndex, INSERTED, UPDATED, DUPLICATE
+from kline_archive import export_arrow, export_history, import_into, to_table
+from kline_retention import RetentionManager, DAY_MS
+
+MINUTE = 60000
+START = 1711846800000  # 2024-03-31 01:00 UTC，欧洲夏令时切换当天
+
+
+def candle(minute, close=1.0):
+    open_time = START + minute * MINUTE
+    return {
+        "时间": datetime.fromtimestamp(open_time / 1000).strftime('%Y-%m-%d %H:%M:%S'),
+        "开盘时间": open_time, "开盘价": close, "最高价": close, "最低价": close, "收盘价": close, "成交量": 1.0,
+    }
+
+
+def test_merge_matches_upsert_many_in_place():
+    existing = [candle(i) for i in range(0, 20, 2)]
+    incoming = [candle(i, close=2.0 if i % 4 == 0 else 1.0) for i in range(5, 25)]
+    expected = CandleIndex()
+    expected.upsert_many(existing)
+    expected_counts = expected.upsert_many(incoming)
+
+    index = CandleIndex()
+    index.upsert_many(existing)
+    records = index.records
+    counts = index.merge(incoming)
+    assert counts == expected_counts
+    assert counts == {INSERTED: 13, UPDATED: 3, DUPLICATE: 4}
+    assert index.records is records and records == expected.records
+    assert START + 21 * MINUTE in index and index.gaps() == expected.gaps()
+    assert index.upsert(candle(21)) == DUPLICATE
+
+
+@pytest.mark.parametrize("zone", ["UTC", "Europe/Berlin", "Asia/Kolkata"])
+def test_local_time_strings_match_fromtimestamp(zone, monkeypatch):
+    monkeypatch.setenv("TZ", zone)
+    time.tzset()
+    try:
+        open_time = START - 3 * 3600000 + np.arange(0, 6 * 60) * MINUTE
+        expected = [datetime.fromtimestamp(t / 1000).strftime('%Y-%m-%d %H:%M:%S') for t in open_time.tolist()]
+        assert kline_archive._local_time_strings(open_time) == expected
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def manager_at(tmp_path, hot_size=5):
+    return RetentionManager(CandleIndex(), root=str(tmp_path / "retention"), hot_size=hot_size, warm_days=2,
+                            cold_interval_ms=15 * MINUTE)
+
+
+def test_import_into_deduplicates_archive_rows(tmp_path):
+    table = to_table([candle(i) for i in range(10)], indicators=False)
+    # 归档内重复的开盘时间取最后一行
+    table = pa.concat_tables([table, to_table([candle(3, close=5.0)], indicators=False)]).sort_by("open_time")
+    path = str(tmp_path / "klines.arrow")
+    export_arrow(table, path)
+
+    manager = manager_at(tmp_path, hot_size=100)
+    manager.index.upsert_many([candle(i) for i in range(8, 12)])
+    counts = import_into(manager, path)
+    assert counts == {INSERTED: 8, UPDATED: 0, DUPLICATE: 2, "archived": 0, "skipped": 0}
+    assert len(manager.index) == 12
+    assert manager.index.records[3] == candle(3, close=5.0)
+    assert manager.index.records[:3] == [candle(i) for i in range(3)]
+
+
+def test_import_keeps_only_newest_in_hot_tier(tmp_path):
+    path = str(tmp_path / "klines.arrow")
+    export_arrow(to_table([candle(i) for i in range(20)], indicators=False), path)
+    manager = manager_at(tmp_path)
+    manager.index.upsert_many([candle(i) for i in range(18, 22)])
+    counts = import_into(manager, path)
+    # 热层与归档合起来最新的5根留在内存，其余写入温层
+    assert [r["开盘时间"] for r in manager.index.snapshot()] == [START + i * MINUTE for i in range(17, 22)]
+    assert counts["archived"] == 17 and counts["skipped"] == 0
+    assert manager.query(START, START + 30 * MINUTE) == [candle(i) for i in range(22)]
+    # 重复导入不会在温层产生重复K线
+    import_into(manager, path)
+    assert manager.query(START, START + 30 * MINUTE) == [candle(i) for i in range(22)]
+
+
+def test_import_skips_days_already_in_cold_tier(tmp_path):
+    old = START - 5 * DAY_MS
+    manager = manager_at(tmp_path, hot_size=1)
+    manager.append_warm([{**candle(i), "开盘时间": old + i * MINUTE} for i in range(3)])
+    manager.compact(now_ms=START)
+    path = str(tmp_path / "klines.arrow")
+    export_arrow(to_table([{**candle(i), "开盘时间": old + i * MINUTE} for i in range(3)] + [candle(0)],
+                          indicators=False), path)
+    counts = import_into(manager, path)
+    assert counts["skipped"] == 3
+    assert [r["成交量"] for r in manager.query(old, old + DAY_MS - 1)] == [3.0]
+
+
+def test_export_history_spans_tiers_with_resolution(tmp_path):
+    old = START - 5 * DAY_MS
+    manager = manager_at(tmp_path)
+    manager.append_warm([{**candle(i), "开盘时间": old + i * MINUTE} for i in range(30)])
+    manager.compact(now_ms=START)
+    manager.index.upsert_many([candle(i) for i in range(40)])
+    manager.enforce()
+    table = export_history(manager, 0, START + DAY_MS)
+    assert table.num_rows == 2 + 40
+    resolution = table.column("resolution").to_pylist()
+    assert resolution[:2] == [15 * MINUTE] * 2 and set(resolution[2:]) == {MINUTE}
+    ma5 = table.column("MA5").to_numpy()
+    # 指标不跨分辨率：冷层为空，1分钟K线从第5根起有值
+    assert np.isnan(ma5[:6]).all() and not np.isnan(ma5[6:]).any()
@@ -0,0 +1,86 @@
+import threading
+import pytest
+import kline_retention
+from candle_index import CandleIndex
+from kline_retention import RetentionManager, WARM, COLD, DAY_MS
+
+MINUTE = 60000
+QUARTER = 15 * MINUTE
+NOW = 20 * DAY_MS  # 1970-01-21
+
+
+def candle(open_time, close=1.0, volume=1.0):
+    return {"开盘时间": open_time, "开盘价": close, "最高价": close, "最低价": close, "收盘价": close, "成交量": volume}
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return RetentionManager(CandleIndex(), root=str(tmp_path), hot_size=3, warm_days=2, cold_interval_ms=QUARTER)
+
+
+def open_times(records):
+    return [record["开盘时间"] for record in records]
+
+
+def test_enforce_moves_oldest_to_warm(manager):
+    manager.index.upsert_many([candle(NOW + i * MINUTE) for i in range(5)])
+    assert manager.enforce() == 2
+    assert len(manager.index) == 3
+    assert manager.days(WARM) == ["1970-01-21"]
+    assert open_times(manager.query(NOW, NOW + 10 * MINUTE)) == [NOW + i * MINUTE for i in range(5)]
+
+
+def test_compact_boundary_and_resolution(manager):
+    old_day, recent_day = NOW - 3 * DAY_MS, NOW - 1 * DAY_MS
+    manager.append_warm([candle(old_day + i * MINUTE) for i in range(30)])
+    manager.append_warm([candle(recent_day + i * MINUTE) for i in range(30)])
+    assert manager.compact(now_ms=NOW) == 1
+    assert manager.days(COLD) == ["1970-01-18"]
+    assert manager.days(WARM) == ["1970-01-20"]
+    cold = manager.query(old_day, old_day + DAY_MS - 1)
+    assert open_times(cold) == [old_day, old_day + QUARTER]
+    assert [record["成交量"] for record in cold] == [15.0, 15.0]
+    assert len(manager.query(recent_day, recent_day + DAY_MS - 1)) == 30
+    assert manager.compact(now_ms=NOW) == 0
+
+
+def test_late_candles_for_compacted_day_do_not_mix_resolutions(manager):
+    day = NOW - 3 * DAY_MS
+    manager.append_warm([candle(day + i * MINUTE) for i in range(10)])
+    manager.compact(now_ms=NOW)
+    # 补齐的K线写到温层，查询时与冷层合并为同一分辨率
+    manager.append_warm([candle(day + i * MINUTE) for i in range(20, 25)])
+    records = manager.query(day, day + DAY_MS - 1)
+    assert open_times(records) == [day, day + QUARTER]
+    assert [record["成交量"] for record in records] == [10.0, 5.0]
+    # 同一截止日期也会重新压缩，之后该日只在冷层
+    assert manager.compact(now_ms=NOW) == 1
+    assert manager.days(WARM) == []
+    assert manager.query(day, day + DAY_MS - 1) == records
+
+
+def test_append_is_not_blocked_by_compaction_io(manager, monkeypatch):
+    day = NOW - 3 * DAY_MS
+    manager.append_warm([candle(day)])
+    entered, release = threading.Event(), threading.Event()
+    original = kline_retention.downsample
+
+    def slow_downsample(records, interval_ms):
+        entered.set()
+        release.wait(5)
+        return original(records, interval_ms)
+
+    monkeypatch.setattr(kline_retention, "downsample", slow_downsample)
+    thread = threading.Thread(target=manager.compact, kwargs={"now_ms": NOW}, daemon=True)
+    thread.start()
+    assert entered.wait(5)
+    appended = threading.Thread(target=manager.append_warm, args=([candle(NOW)],), daemon=True)
+    appended.start()
+    appended.join(1)
+    try:
+        assert not appended.is_alive()
+    finally:
+        release.set()
+    thread.join(5)
+    assert manager.days(COLD) == ["1970-01-18"]
+    assert manager.days(WARM) == ["1970-01-21"]
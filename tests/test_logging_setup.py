@@ -0,0 +1,96 @@
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+
+import pytest
+
+from logging_setup import JsonFormatter, SizedTimedRotatingFileHandler, TruncateFilter
+
+
+def make_record(msg, *args, exc_info=None):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, msg, args or None, exc_info)
+
+
+@pytest.fixture
+def handler_factory(tmp_path):
+    handlers = []
+
+    def factory(**kwargs):
+        handler = SizedTimedRotatingFileHandler(str(tmp_path / "app.log"), **kwargs)
+        handler.setFormatter(JsonFormatter())
+        handlers.append(handler)
+        return handler
+
+    yield factory
+    for handler in handlers:
+        handler.close()
+
+
+def archives(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if name.endswith(".gz"))
+
+
+def read_lines(path):
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_truncate_filter_shortens_long_messages():
+    record = make_record("%s", "x" * 50)
+    assert TruncateFilter(max_chars=10).filter(record)
+    assert record.getMessage().startswith("x" * 10 + "...")
+    assert "共 50 字符" in record.getMessage()
+    assert record.args is None
+
+    short = make_record("价格 %d", 100)
+    TruncateFilter(max_chars=10).filter(short)
+    assert short.getMessage() == "价格 100"
+
+
+def test_json_formatter_one_line_per_record():
+    line = JsonFormatter().format(make_record("多行\n消息 %s", "ok"))
+    assert "\n" not in line
+    entry = json.loads(line)
+    assert entry["message"] == "多行\n消息 ok"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test"
+    assert "exception" not in entry
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        entry = json.loads(JsonFormatter().format(make_record("失败", exc_info=sys.exc_info())))
+    assert "ValueError: boom" in entry["exception"]
+
+
+def test_size_rotation_compresses_and_keeps_newest(tmp_path, handler_factory):
+    handler = handler_factory(max_bytes=200, backup_count=2)
+    for i in range(30):
+        handler.emit(make_record(f"消息 {i:03d} " + "x" * 100))
+        time.sleep(0.002)
+    handler.close()
+
+    names = archives(tmp_path)
+    assert len(names) == 2
+    messages = [entry["message"] for name in names for entry in read_lines(tmp_path / name)]
+    newest = [entry["message"] for entry in read_lines(tmp_path / "app.log")]
+    # 保留的是最新的两个压缩文件，紧接在当前日志文件之前
+    numbers = sorted(int(m.split()[1]) for m in messages + newest)
+    assert numbers == list(range(numbers[0], 30))
+
+
+def test_time_rotation_compresses_previous_period(tmp_path, handler_factory):
+    handler = handler_factory(max_bytes=0, backup_count=3)
+    handler.emit(make_record("第一天"))
+    handler.rolloverAt = int(time.time()) - 1
+    handler.emit(make_record("第二天"))
+    handler.close()
+
+    names = archives(tmp_path)
+    assert len(names) == 1
+    assert [e["message"] for e in read_lines(tmp_path / names[0])] == ["第一天"]
+    assert [e["message"] for e in read_lines(tmp_path / "app.log")] == ["第二天"]
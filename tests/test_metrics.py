@@ -0,0 +1,87 @@
+import pytest
+from flask import Flask
+import metrics
+from metrics import Counter, Gauge, Histogram, instrument_handler, register_metrics_route, render
+
+
+@pytest.fixture(autouse=True)
+def isolated_registry():
+    saved = list(metrics.REGISTRY)
+    yield
+    metrics.REGISTRY[:] = saved
+
+
+def test_counter_and_gauge_text():
+    counter = Counter("test_events_total", "事件数", ["stream"])
+    counter.labels("kline").inc()
+    counter.labels("kline").inc(2)
+    counter.labels("depth").inc()
+    gauge = Gauge("test_queue", "队列长度")
+    gauge.set(7)
+    assert counter.render() == [
+        "# HELP test_events_total 事件数",
+        "# TYPE test_events_total counter",
+        'test_events_total{stream="depth"} 1.0',
+        'test_events_total{stream="kline"} 3.0',
+    ]
+    assert gauge.render()[1:] == ["# TYPE test_queue gauge", "test_queue 7.0"]
+
+
+def test_unlabelled_metric_starts_at_zero_and_appears_in_render():
+    Counter("test_unused_total", "未使用")
+    assert "test_unused_total 0.0\n" in render()
+
+
+def test_label_values_are_escaped():
+    gauge = Gauge("test_escape", "转义", ["path"])
+    gauge.labels('a"b\\c\nd').set(1)
+    assert gauge.render()[2] == 'test_escape{path="a\\"b\\\\c\\nd"} 1.0'
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "耗时", ["stream"], buckets=(0.1, 1))
+    child = histogram.labels("kline")
+    for value in (0.05, 0.1, 0.5, 3):
+        child.observe(value)
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{stream="kline",le="0.1"} 2',
+        'test_seconds_bucket{stream="kline",le="1.0"} 3',
+        'test_seconds_bucket{stream="kline",le="+Inf"} 4',
+        'test_seconds_sum{stream="kline"} 3.65',
+        'test_seconds_count{stream="kline"} 4',
+    ]
+
+
+def test_set_function_gauge_reads_at_scrape_time():
+    items = []
+    gauge = Gauge("test_items", "占用", ["buffer"])
+    gauge.labels("queue").set_function(lambda: len(items))
+    items.extend([1, 2])
+    assert gauge.render()[2] == 'test_items{buffer="queue"} 2.0'
+    gauge.labels("broken").set_function(lambda: 1 / 0)
+    assert 'test_items{buffer="broken"} nan' in gauge.render()
+
+
+def test_instrument_handler_counts_failures_too():
+    @instrument_handler("test-stream")
+    def handler(fail):
+        if fail:
+            raise ValueError
+    handler(False)
+    with pytest.raises(ValueError):
+        handler(True)
+    try:
+        assert metrics.WS_MESSAGES.labels("test-stream").get() == 2
+    finally:
+        metrics.WS_MESSAGES._children.pop(("test-stream",), None)
+        metrics.HANDLER_DURATION._children.pop(("test-stream",), None)
+
+
+def test_metrics_route_allowlist():
+    app = Flask(__name__)
+    register_metrics_route(app, source=lambda: "test_metric 1.0\n", allowed_ips=("127.0.0.1",))
+    client = app.test_client()
+    response = client.get('/metrics', environ_base={"REMOTE_ADDR": "127.0.0.1"})
+    assert response.status_code == 200 and response.get_data(as_text=True) == "test_metric 1.0\n"
+    assert response.mimetype == "text/plain"
+    assert client.get('/metrics', environ_base={"REMOTE_ADDR": "203.0.113.5"}).status_code == 403
@@ -0,0 +1,106 @@
+import threading
+import time
+from order_book import OrderBookStream
+
+SNAPSHOT = {"lastUpdateId": 100, "bids": [["99", "1"]], "asks": [["101", "1"]]}
+
+
+def diff(first, last, bid="99", qty="2"):
+    return {"U": first, "u": last, "b": [[bid, qty]], "a": []}
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_snapshot_fetched_off_message_thread_and_buffer_applied():
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_fetcher(symbol, limit):
+        entered.set()
+        release.wait(5)
+        return SNAPSHOT
+
+    stream = OrderBookStream(snapshot_fetcher=slow_fetcher)
+    try:
+        started = time.monotonic()
+        stream.handle_event(diff(95, 99))
+        assert entered.wait(5)
+        # 快照请求未返回时继续缓存增量事件，行情线程不等待
+        stream.handle_event(diff(100, 101, bid="98", qty="3"))
+        stream.handle_event(diff(102, 102, bid="99", qty="0"))
+        assert time.monotonic() - started < 1
+        assert not stream.synced
+    finally:
+        release.set()
+    assert wait_for(lambda: stream.synced)
+    assert stream.book.last_update_id == 102
+    assert stream.book.best_bid()[0] == 98.0
+    stream.handle_event(diff(103, 103, bid="97", qty="1"))
+    assert stream.book.last_update_id == 103
+
+
+def test_snapshot_requested_once_while_fetching():
+    calls, release = [], threading.Event()
+
+    def fetcher(symbol, limit):
+        calls.append(symbol)
+        release.wait(5)
+        return SNAPSHOT
+
+    stream = OrderBookStream(snapshot_fetcher=fetcher)
+    try:
+        for update_id in range(101, 106):
+            stream.handle_event(diff(update_id, update_id))
+    finally:
+        release.set()
+    assert wait_for(lambda: stream.synced)
+    assert len(calls) == 1
+    assert stream.book.last_update_id == 105
+
+
+def test_stale_snapshot_discarded_after_reset():
+    release = threading.Event()
+
+    def fetcher(symbol, limit):
+        release.wait(5)
+        return SNAPSHOT
+
+    stream = OrderBookStream(snapshot_fetcher=fetcher)
+    try:
+        stream.handle_event(diff(101, 101))
+        stream.on_close(None, None, None)
+    finally:
+        release.set()
+    assert wait_for(lambda: not stream._fetching)
+    assert not stream.synced and stream._snapshot is None
+
+
+def test_foreground_snapshot_is_deterministic():
+    stream = OrderBookStream(snapshot_fetcher=lambda symbol, limit: SNAPSHOT, background_snapshot=False)
+    stream.handle_event(diff(101, 101))
+    assert stream.synced and stream.book.last_update_id == 101
+    # 不连续时重新同步：快照太旧，等待下一条事件
+    stream.handle_event(diff(110, 111))
+    assert not stream.synced and stream.resyncs == 1
+
+
+def test_failed_snapshot_retried_on_next_event():
+    results = [RuntimeError("down"), SNAPSHOT]
+
+    def fetcher(symbol, limit):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    stream = OrderBookStream(snapshot_fetcher=fetcher, background_snapshot=False)
+    stream.handle_event(diff(101, 101))
+    assert not stream.synced
+    stream.handle_event(diff(102, 102))
+    assert stream.synced and stream.book.last_update_id == 102
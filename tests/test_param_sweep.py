@@ -0,0 +1,83 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+import param_sweep
+from backtest import evaluate_signals
+from param_sweep import ParameterSweep, PrefixSums, expand_grid
+
+
+def prices(n=2000, seed=1):
+    rng = np.random.default_rng(seed)
+    return 60000 + np.cumsum(rng.normal(0, 50, n))
+
+
+@pytest.mark.parametrize("period", [1, 2, 5, 20, 200])
+def test_prefix_sums_match_rolling(period):
+    close = prices()
+    prefix = PrefixSums(close)
+    rolling = pd.Series(close).rolling(window=period)
+    np.testing.assert_allclose(prefix.ma(period), rolling.mean().to_numpy(), rtol=1e-10, equal_nan=True)
+    if period > 1:
+        middle, upper, lower = prefix.bollinger(period, std_dev=2)
+        std = rolling.std().to_numpy()
+        # 平方前缀和相减的误差与价格量级有关，6万美元附近为 1e-4 量级
+        np.testing.assert_allclose(upper - middle, 2 * std, rtol=1e-6, atol=1e-3, equal_nan=True)
+        np.testing.assert_allclose(middle - lower, 2 * std, rtol=1e-6, atol=1e-3, equal_nan=True)
+
+
+def test_prefix_sums_window_longer_than_series():
+    prefix = PrefixSums(prices(10))
+    assert np.isnan(prefix.ma(20)).all()
+    assert all(np.isnan(band).all() for band in prefix.bollinger(20))
+
+
+def test_worker_detach_closes_shared_memory():
+    sweep = ParameterSweep(prices(100), workers=1)
+    shm = sweep._create_shared()
+    try:
+        param_sweep._attach_shared(shm.name, 100)
+        np.testing.assert_array_equal(param_sweep._worker_state['prefix'].close, sweep.close)
+        attached = param_sweep._worker_state['shm']
+        param_sweep._detach_shared()
+        assert param_sweep._worker_state == {}
+        with pytest.raises((TypeError, ValueError)):
+            attached.buf[0]  # 映射已关闭
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_closing_sweep_early_cancels_pending_shards():
+    sweep = ParameterSweep(prices(200000), workers=1)
+    grid = expand_grid({'fast': list(range(3, 23)), 'slow': list(range(30, 40))})
+    started = time.perf_counter()
+    results = sweep.run('ma', grid, shard_size=1)
+    first = next(results)
+    single = time.perf_counter() - started
+    closing = time.perf_counter()
+    results.close()
+    # 200 个分片逐个运行需要远长于单个分片的时间，关闭只等待正在运行的分片
+    assert time.perf_counter() - closing < max(2.0, 20 * single)
+    assert first["strategy"] == 'ma' and len(sweep.top()) == 1
+
+
+def test_sweep_checks_liquidation_on_low_high():
+    close = prices(3000, seed=2)
+    wicks = np.abs(np.random.default_rng(3).normal(0, 400, len(close)))
+    low, high = close - wicks, close + wicks
+    grid = expand_grid({'fast': [3, 5], 'slow': [20, 40]})
+    sweep = ParameterSweep(close, low=low, high=high, workers=1, leverage=50, maintenance_rate=0.005)
+    results = {tuple(r["params"].values()): r for r in sweep.run('ma', grid)}
+    assert len(results) == len(grid)
+
+    prefix = PrefixSums(close)
+    for params in grid:
+        signals = param_sweep.build_signals('ma', prefix, params)
+        expected = evaluate_signals(close, signals, leverage=50, maintenance_rate=0.005, low=low, high=high)
+        closes_only = evaluate_signals(close, signals, leverage=50, maintenance_rate=0.005)
+        result = results[tuple(params.values())]
+        assert result["liquidations"] == expected["liquidations"]
+        assert result["total_pnl"] == pytest.approx(expected["total_pnl"])
+        # 影线触发的强平只用收盘价时看不到
+        assert result["liquidations"] > closes_only["liquidations"]
@@ -0,0 +1,58 @@
+import pytest
+from price_alerts import AlertDispatcher, AlertEngine, ThresholdIndex, UP, DOWN
+
+
+def make_engine(last_price=100.0):
+    engine = AlertEngine(dispatcher=AlertDispatcher([]))
+    engine.on_price(last_price)
+    return engine
+
+
+def test_crossed_up_includes_threshold_and_removes_fired():
+    index = ThresholdIndex()
+    for alert_id, threshold in enumerate([101, 102, 102, 105], start=1):
+        index.add(alert_id, threshold, UP)
+    assert index.crossed(100, 101.5) == [1]
+    assert index.crossed(101.5, 102) == [2, 3]  # 恰好到达阈值也算上穿
+    assert index.crossed(102, 104) == []
+    assert len(index) == 1
+
+
+def test_crossed_down_and_direction_sides_are_separate():
+    index = ThresholdIndex()
+    index.add(1, 99, DOWN)
+    index.add(2, 95, DOWN)
+    index.add(3, 98, UP)
+    assert index.crossed(100, 100) == []
+    assert index.crossed(100, 99) == [1]
+    assert index.crossed(99, 90) == [2]
+    # 下跌穿过上穿提醒的阈值不会触发
+    assert index.crossed(100, 97) == [] and len(index) == 1
+
+
+def test_remove_only_matching_id():
+    index = ThresholdIndex()
+    index.add(1, 100, UP)
+    index.add(2, 100, UP)
+    assert index.remove(2, 100, UP)
+    assert not index.remove(2, 100, UP)
+    assert index.crossed(99, 100) == [1]
+
+
+def test_percent_alert_rejects_zero():
+    engine = make_engine()
+    with pytest.raises(ValueError):
+        engine.add_percent_alert(0)
+    with pytest.raises(ValueError):
+        engine.add_percent_alert(0.0, reference_price=100.0)
+    assert engine.list_alerts() == []
+
+
+def test_percent_alert_direction_and_firing():
+    engine = make_engine()
+    up = engine.add_percent_alert(2)
+    down = engine.add_percent_alert(-1)
+    assert {alert["id"]: alert["direction"] for alert in engine.list_alerts()} == {up: UP, down: DOWN}
+    assert [alert["id"] for alert in engine.on_price(99.0)] == [down]
+    assert [alert["id"] for alert in engine.on_price(102.0)] == [up]
+    assert engine.list_alerts() == []
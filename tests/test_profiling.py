@@ -0,0 +1,58 @@
+import os
+import pytest
+from flask import Flask
+import profiling
+from profiling import IngestorProfiler, handle_command, published_timings, register_profile_routes
+
+TOKEN = "secret"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture(autouse=True)
+def restore_state():
+    enabled = profiling.is_enabled()
+    profiling.reset()
+    yield
+    profiling.enable(enabled)
+    profiling.reset()
+
+
+def make_client(ingestor):
+    app = Flask(__name__)
+    register_profile_routes(app, TOKEN, ingestor=lambda: ingestor)
+    return app.test_client()
+
+
+def test_commands_toggle_and_reset_ingestor_timings():
+    handle_command({"command": "profile", "enable": True, "reset": False})
+    profiling.record("kline", "parse", 0.002)
+    assert published_timings()["timings"]["kline"]["parse"]["count"] == 1
+    handle_command({"command": "profile", "enable": False, "reset": True})
+    assert published_timings() is None
+
+
+def test_timings_toggle_is_forwarded_to_ingestor():
+    sent = []
+    ingestor = IngestorProfiler(sent.append, lambda: {"profile": {"enabled": True, "timings": {"depth": {}}}})
+    body = make_client(ingestor).get("/api/profile/timings?enable=1", headers=AUTH).get_json()
+    assert sent == [{"command": "profile", "enable": True, "reset": False}]
+    assert body["enabled"] and body["ingestor"]["timings"] == {"depth": {}}
+    make_client(ingestor).get("/api/profile/timings", headers=AUTH)
+    assert len(sent) == 1  # 只查看时不转发
+
+
+def test_sample_merges_ingestor_stacks(tmp_path):
+    # 同一进程内直接处理命令，模拟采集进程在后台线程写出结果
+    ingestor = IngestorProfiler(handle_command, lambda: {}, directory=str(tmp_path))
+    response = make_client(ingestor).get("/api/profile/sample?seconds=0.05&interval=0.01", headers=AUTH)
+    lines = response.get_data(as_text=True).splitlines()
+    assert any(line.startswith(f"web-{os.getpid()};") for line in lines)
+    assert any(line.startswith("ingestor;") for line in lines)
+    assert os.listdir(tmp_path) == []
+
+
+def test_sample_without_ingestor_result_returns_local_stacks(tmp_path):
+    ingestor = IngestorProfiler(lambda command: None, lambda: {}, directory=str(tmp_path), timeout=0.1)
+    response = make_client(ingestor).get("/api/profile/sample?seconds=0.02&interval=0.01", headers=AUTH)
+    assert response.status_code == 200
+    assert not any(line.startswith("ingestor;") for line in response.get_data(as_text=True).splitlines())
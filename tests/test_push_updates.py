@@ -0,0 +1,47 @@
+from flask import Flask
+from push_updates import PushHub, register_push_routes
+
+
+def test_subscribe_caps_per_process_and_client():
+    hub = PushHub(max_streams=3, max_per_client=2)
+    a1, a2 = hub.subscribe("a"), hub.subscribe("a")
+    assert a1 is not None and a2 is not None
+    assert hub.subscribe("a") is None
+    b1 = hub.subscribe("b")
+    assert b1 is not None
+    assert hub.subscribe("c") is None
+    assert hub.rejected == 2
+    hub.unsubscribe(a1)
+    hub.unsubscribe(a1)  # 重复取消不影响计数
+    assert hub.subscriber_count == 2
+    assert hub.subscribe("c") is not None
+
+
+def test_stream_ends_after_max_seconds_and_releases_slot():
+    hub = PushHub(max_streams=1)
+    q = hub.subscribe("a")
+    hub.publish("tick", {"price": 1.0})
+    messages = list(hub.stream(q, heartbeat=0.01, max_seconds=0.05))
+    assert messages[0].startswith("retry:")
+    assert any(m.startswith("event: tick") for m in messages)
+    assert any(m == ": ping\n\n" for m in messages)
+    assert hub.subscriber_count == 0
+    assert hub.subscribe("b") is not None
+
+
+def _app(hub, allowed):
+    app = Flask(__name__)
+    register_push_routes(app, hub, authorize=lambda: allowed, get_client=lambda: "client")
+    return app.test_client()
+
+
+def test_stream_route_requires_authorization():
+    assert _app(PushHub(), False).get('/api/stream').status_code == 401
+
+
+def test_stream_route_returns_503_when_full():
+    hub = PushHub(max_streams=1)
+    hub.subscribe("other")
+    response = _app(hub, True).get('/api/stream')
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
@@ -0,0 +1,92 @@
+import time
+from flask import Flask, request
+from werkzeug.middleware.proxy_fix import ProxyFix
+from rate_limiter import (
+    RateLimiter, get_client_ip, OVERFLOW_KEY, CALLBACK_PATH, callback_endpoint, register_request_throttle,
+)
+
+
+def _client_ip(app, headers, remote_addr="203.0.113.7"):
+    app.add_url_rule('/ip', 'ip', lambda: get_client_ip(request))
+    client = app.test_client()
+    return client.get('/ip', headers=headers, environ_base={"REMOTE_ADDR": remote_addr}).get_data(as_text=True)
+
+
+def test_client_ip_ignores_forwarded_for_by_default():
+    app = Flask(__name__)
+    assert _client_ip(app, {"X-Forwarded-For": "1.2.3.4"}) == "203.0.113.7"
+
+
+def test_client_ip_uses_trusted_proxy_hop():
+    app = Flask(__name__)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+    # 客户端伪造的第一个地址被忽略，取可信代理添加的最后一个
+    assert _client_ip(app, {"X-Forwarded-For": "1.2.3.4, 198.51.100.9"}) == "198.51.100.9"
+
+
+def test_bucket_limits_and_refills():
+    limiter = RateLimiter(rate=1000, capacity=2)
+    assert limiter.allow("a") and limiter.allow("a")
+    assert not limiter.allow("a")
+    assert limiter.rejected == 1
+
+
+def test_limited_keys_are_not_evicted_by_new_keys():
+    limiter = RateLimiter(rate=0.001, capacity=1, max_keys=2)
+    assert limiter.allow("victim")
+    assert not limiter.allow("victim")
+    for i in range(10):
+        limiter.allow(f"junk-{i}")
+    # 被限流的键仍然保留，新键改用溢出桶
+    assert not limiter.allow("victim")
+    assert limiter.available("victim") < 1
+    assert limiter.overflowed > 0
+    assert len(limiter) <= 3 and OVERFLOW_KEY in limiter._buckets
+
+
+def test_refilled_keys_are_evicted_when_full():
+    limiter = RateLimiter(rate=1000, capacity=1, max_keys=2)
+    limiter.allow("a")
+    limiter.allow("b")
+    time.sleep(0.01)
+    assert limiter.allow("c")
+    assert limiter.overflowed == 0 and len(limiter) == 2
+
+
+def _throttled_app(limiter):
+    app = Flask(__name__)
+    app.add_url_rule(CALLBACK_PATH, 'callback', lambda: "ok", methods=['POST'])
+    register_request_throttle(app, limiter, {"chart.figure": None})
+    return app.test_client()
+
+
+def _post(client, output, remote_addr):
+    return client.post(CALLBACK_PATH, json={"output": output}, environ_base={"REMOTE_ADDR": remote_addr})
+
+
+def test_callback_endpoint_only_accepts_registered_outputs():
+    known = {"chart.figure": None}
+    assert callback_endpoint({"output": "chart.figure"}, known) == "chart.figure"
+    assert callback_endpoint({"output": "random"}, known) == CALLBACK_PATH
+    assert callback_endpoint({"output": ["chart.figure"]}, known) == CALLBACK_PATH
+    assert callback_endpoint(["chart.figure"], known) == CALLBACK_PATH
+    assert callback_endpoint(None, known) == CALLBACK_PATH
+
+
+def test_random_outputs_do_not_fill_limiter_keys():
+    limiter = RateLimiter(rate=0.001, capacity=3, max_keys=4)
+    client = _throttled_app(limiter)
+    statuses = [_post(client, f"junk-{i}.children", "198.51.100.1").status_code for i in range(50)]
+    # 未知 output 共用同一个键：前3次放行，之后被限流
+    assert statuses[:3] == [200] * 3 and set(statuses[3:]) == {429}
+    assert len(limiter) == 1
+    assert _post(client, "chart.figure", "198.51.100.2").status_code == 200
+    assert _post(client, "junk.children", "198.51.100.2").status_code == 200
+
+
+def test_non_string_output_is_throttled_not_500():
+    limiter = RateLimiter(rate=0.001, capacity=1)
+    client = _throttled_app(limiter)
+    assert _post(client, ["a", "b"], "198.51.100.3").status_code == 200
+    response = _post(client, {"x": 1}, "198.51.100.3")
+    assert response.status_code == 429 and response.headers['Retry-After']
@@ -0,0 +1,96 @@
+import json
+import pytest
+import session_store
+from session_store import MemorySessionBackend, SqliteSessionBackend, SessionStore
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, "time", clock)
+    return clock
+
+
+def size_of(data):
+    return len(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+
+def test_memory_ttl_expiry_and_access_refresh(clock):
+    backend = MemorySessionBackend(ttl=60)
+    backend.set("a", {"v": 1})
+    backend.set("b", {"v": 2})
+    clock.now += 50
+    assert backend.get("a") == {"v": 1}  # 访问刷新最后访问时间
+    clock.now += 20
+    assert backend.get("a") == {"v": 1}
+    assert backend.get("b") is None
+    assert len(backend) == 1 and backend.total_bytes == size_of({"v": 1})
+
+
+def test_memory_lru_eviction_at_entry_cap(clock):
+    backend = MemorySessionBackend(max_sessions=2, ttl=60)
+    backend.set("a", {"v": 1})
+    backend.set("b", {"v": 2})
+    backend.get("a")  # b 变为最久未访问
+    backend.set("c", {"v": 3})
+    assert backend.get("b") is None
+    assert backend.get("a") == {"v": 1} and backend.get("c") == {"v": 3}
+    assert backend.evicted == 1
+
+
+def test_memory_eviction_at_byte_cap(clock):
+    entry = {"text": "x" * 100}
+    backend = MemorySessionBackend(max_bytes=2 * size_of(entry) + 10, ttl=60)
+    for name in "abc":
+        backend.set(name, entry)
+    assert backend.get("a") is None and len(backend) == 2
+    assert backend.total_bytes == 2 * size_of(entry)
+    # 替换时按新大小重新计算
+    backend.set("b", {"text": "y"})
+    assert backend.total_bytes == size_of(entry) + size_of({"text": "y"})
+    backend.delete("c")
+    assert backend.total_bytes == size_of({"text": "y"})
+
+
+def test_sqlite_round_trip_and_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / "sessions.db")
+    data = {"chat_history": [{"role": "assistant", "content": "看涨"}], "position": None}
+    SqliteSessionBackend(path, ttl=60).set("s1", data)
+    other = SqliteSessionBackend(path, ttl=60)
+    assert other.get("s1") == data
+    other.delete("s1")
+    assert other.get("s1") is None
+
+
+def test_sqlite_expiry_and_max_sessions(tmp_path, clock):
+    backend = SqliteSessionBackend(str(tmp_path / "sessions.db"), max_sessions=2, ttl=60)
+    backend.set("a", {"v": 1})
+    clock.now += 50
+    assert backend.get("a") == {"v": 1}  # 访问刷新过期时间
+    clock.now += 20
+    assert backend.get("a") == {"v": 1}
+    clock.now += 61
+    assert backend.get("a") is None
+    for i, name in enumerate("bcd"):
+        clock.now += 1
+        backend.set(name, {"v": i})
+    assert backend.get("b") is None
+    assert backend.get("c") == {"v": 1} and backend.get("d") == {"v": 2}
+
+
+def test_session_store_keeps_recent_chat(clock):
+    store = SessionStore(MemorySessionBackend(ttl=60), chat_limit=2)
+    for i in range(3):
+        store.add_analysis("s", {"content": i})
+    state = store.get("s")
+    assert [entry["content"] for entry in state["chat_history"]] == [1, 2]
+    assert state["last_analysis"] == {"content": 2}
+    assert store.get(None) == {"chat_history": [], "position": None, "last_analysis": None}
@@ -0,0 +1,101 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from shared_market_data import SharedKlineStore, _H_SEQ
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "market.mmap")
+
+
+def test_snapshot_round_trip(store_path):
+    writer = SharedKlineStore(store_path, capacity=8, status_size=1024, writer=True)
+    df = pd.DataFrame({"开盘时间": [60000, 120000], "收盘价": [1.0, 2.0], "成交量": [3.0, 4.0]})
+    writer.write_candles(df)
+    reader = SharedKlineStore(store_path)
+    open_time, columns = reader.snapshot()
+    assert open_time.tolist() == [60000, 120000]
+    assert columns["收盘价"].tolist() == [1.0, 2.0]
+    assert np.isnan(columns["RSI"]).all()
+    reader.close()
+    writer.close()
+
+
+def test_writers_are_serialized(store_path):
+    writer = SharedKlineStore(store_path, capacity=8, status_size=1024, writer=True)
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_write():
+        with writer._writing():
+            entered.set()
+            release.wait()
+
+    first = threading.Thread(target=slow_write, daemon=True)
+    first.start()
+    entered.wait()
+    second = threading.Thread(target=writer.write_tick, args=(1.0, 1), daemon=True)
+    second.start()
+    second.join(0.1)
+    try:
+        # 第二个写入等待第一个完成，序号不会被两次写入交错改回偶数
+        assert second.is_alive()
+        assert writer.sequence % 2 == 1
+    finally:
+        release.set()
+    first.join()
+    second.join()
+    assert writer.sequence == 4
+    writer.close()
+
+
+def test_concurrent_writes_and_reads_are_consistent(store_path):
+    writer = SharedKlineStore(store_path, capacity=8, status_size=1024, writer=True)
+    reader = SharedKlineStore(store_path)
+    stop = threading.Event()
+    torn = []
+
+    def write(offset):
+        i = offset
+        while not stop.is_set():
+            # 价格和事件时间同值，读到不同的值说明读到了写了一半的数据
+            writer.write_tick(float(i), i)
+            i += 2
+
+    def read():
+        for _ in range(20000):
+            price, tick_ms = reader.last_price()
+            if tick_ms and price != tick_ms:
+                torn.append((price, tick_ms))
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in (1, 2)]
+    for thread in threads:
+        thread.start()
+    read()
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert torn == []
+    assert reader.sequence % 2 == 0
+    reader.close()
+    writer.close()
+
+
+def test_read_times_out_when_writer_is_stuck(store_path):
+    writer = SharedKlineStore(store_path, capacity=8, status_size=1024, writer=True)
+    reader = SharedKlineStore(store_path, read_timeout=0.05)
+    writer._ints[_H_SEQ] += 1  # 模拟写入方在写入中途退出
+    with pytest.raises(TimeoutError):
+        reader.last_price()
+    reader.close()
+    writer.close()
+
+
+def test_oversized_status_is_counted_and_previous_status_kept(store_path):
+    writer = SharedKlineStore(store_path, capacity=8, status_size=64, writer=True)
+    assert writer.write_status({"a": 1})
+    assert not writer.write_status({"a": "x" * 100})
+    assert writer.status_dropped == 1
+    assert writer.status() == {"a": 1}
+    writer.close()
@@ -0,0 +1,78 @@
+import json
+import numpy as np
+import pytest
+from trade_aggregator import TradeAggregator, TradeBars, parse_agg_trade
+
+TRADE = ('{"e":"aggTrade","E":1700000000123,"s":"BTCUSDT","a":2950000001,"p":"37012.01000000",'
+         '"q":"0.01234000","f":3300000000,"l":3300000002,"T":1700000000120,"m":true,"M":true}')
+
+
+def test_parse_plain_and_combined_frames():
+    expected = (1700000000120, 37012.01, 0.01234, True)
+    combined = '{"stream":"btcusdt@aggTrade","data":' + TRADE + '}'
+    for frame in (TRADE, TRADE.encode(), combined, combined.encode()):
+        assert parse_agg_trade(frame) == expected
+    # 字段顺序不同时退回完整解析
+    reordered = json.dumps({"T": 1700000000120, "m": False, "q": "0.5", "p": "37000.5", "e": "aggTrade"})
+    assert parse_agg_trade(reordered) == (1700000000120, 37000.5, 0.5, False)
+
+
+def random_trades(n=2000, seed=11, disorder=0):
+    rng = np.random.default_rng(seed)
+    times = 1700000000000 + np.sort(rng.integers(0, 120000, n))
+    if disorder:
+        # 部分成交延迟到达
+        late = rng.choice(n, disorder, replace=False)
+        times[late] -= rng.integers(0, 20000, disorder)
+    prices = 37000 + np.cumsum(rng.normal(0, 2, n))
+    qtys = rng.exponential(0.1, n)
+    maker = rng.random(n) < 0.5
+    return times, prices, qtys, maker
+
+
+def assert_same_bars(a, b):
+    assert a.count == b.count and a._start == b._start
+    left, right = a.latest(a.capacity), b.latest(b.capacity)
+    for key in left:
+        np.testing.assert_allclose(left[key], right[key], rtol=1e-9, atol=1e-12, err_msg=key)
+    assert a._close == b._close and a._trades == b._trades
+    assert a._volume == pytest.approx(b._volume)
+
+
+@pytest.mark.parametrize("disorder", [0, 200])
+def test_batch_matches_scalar(disorder):
+    times, prices, qtys, maker = random_trades(disorder=disorder)
+    scalar, batch = TradeBars(5, capacity=64), TradeBars(5, capacity=64)
+    for trade in zip(times.tolist(), prices.tolist(), qtys.tolist(), maker.tolist()):
+        scalar.add(*trade)
+    # 分成几批加入，批之间同样要衔接
+    for part in np.array_split(np.arange(len(times)), 7):
+        batch.add_batch(times[part], prices[part], qtys[part], maker[part])
+    assert_same_bars(scalar, batch)
+    starts = batch.latest(64)["start"]
+    assert (np.diff(starts) > 0).all()
+
+
+def test_late_batch_does_not_move_bars_backwards():
+    bars = TradeBars(1, capacity=16)
+    bars.add_batch(np.array([5000, 6100]), np.array([10.0, 11.0]), np.array([1.0, 1.0]), np.array([False, True]))
+    bars.add_batch(np.array([7200, 3000, 7300]), np.array([12.0, 9.0, 13.0]), np.ones(3), np.zeros(3, dtype=bool))
+    latest = bars.latest(16)
+    assert latest["start"].tolist() == [5000, 6000]
+    # 迟到的成交计入当前K线
+    assert bars._start == 7000 and bars._trades == 3 and bars._low == 9.0 and bars._close == 13.0
+
+
+def test_aggregator_fills_quiet_periods_and_summarizes():
+    aggregator = TradeAggregator(resolutions=(1, 5), capacity=32)
+    aggregator.on_trade(1700000000100, 100.0, 1.0, False)
+    aggregator.on_trade(1700000000200, 101.0, 2.0, True)
+    aggregator.flush(1700000003000)
+    bars = aggregator.latest(1)
+    assert bars["start"].tolist() == [1700000000000, 1700000001000, 1700000002000]
+    assert bars["volume"].tolist() == [3.0, 0.0, 0.0]
+    assert bars["vwap"][0] == pytest.approx((100 + 202) / 3)
+    assert bars["buy_volume"][0] == 1.0 and bars["sell_volume"][0] == 2.0
+    assert bars["close"].tolist() == [101.0] * 3
+    assert aggregator.trade_count == 2
+    assert "最近3根1秒K线" in aggregator.summary_text(seconds=1)
@@ -0,0 +1,268 @@
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from websocket import WebSocketApp
+from config import AGG_TRADE_WS_URL, TRADE_BAR_RESOLUTIONS, TRADE_BAR_CAPACITY, RETRY_DELAY
+from metrics import WS_RECONNECTS, instrument_handler, observe_lag
+from feed_replay import captured
+import fast_json
+
+# aggTrade 消息字段顺序固定，直接用正则提取需要的字段，避免每笔成交创建字典
+_AGG_TRADE_PATTERN = re.compile(rb'"p":"([^"]+)","q":"([^"]+)".*?"T":(\d+),"m":(true|false)')
+
+
+def parse_agg_trade(message):
+    """解析aggTrade消息，返回 (成交时间ms, 价格, 数量, 买方是否为挂单方)"""
+    if isinstance(message, str):
+        message = message.encode()
+    match = _AGG_TRADE_PATTERN.search(message)
+    if match is not None:
+        price, qty, trade_time, maker = match.groups()
+        return int(trade_time), float(price), float(qty), maker == b'true'
+    # 字段顺序不符时退回完整解析
+    data = fast_json.loads(message)
+    if "data" in data:
+        data = data["data"]
+    return int(data["T"]), float(data["p"]), float(data["q"]), bool(data["m"])
+
+
+# ========== 单一周期K线 ==========
+class TradeBars:
+    """
+    固定秒数周期的K线，已完成的K线存放在预分配的环形数组中，
+    当前K线用标量累加，每笔成交只做几次浮点运算。
+    """
+
+    __slots__ = (
+        'seconds', 'interval_ms', 'capacity', 'count', 'head',
+        'start', 'open', 'high', 'low', 'close', 'volume', 'quote_volume',
+        'buy_volume', 'sell_volume', 'trades',
+        '_start', '_open', '_high', '_low', '_close', '_volume', '_quote',
+        '_buy', '_sell', '_trades'
+    )
+
+    def __init__(self, seconds, capacity=TRADE_BAR_CAPACITY):
+        self.seconds = seconds
+        self.interval_ms = seconds * 1000
+        self.capacity = capacity
+        self.count = 0  # 已完成的K线数
+        self.head = 0  # 下一根写入位置
+        self.start = np.zeros(capacity, dtype=np.int64)
+        self.open = np.zeros(capacity)
+        self.high = np.zeros(capacity)
+        self.low = np.zeros(capacity)
+        self.close = np.zeros(capacity)
+        self.volume = np.zeros(capacity)
+        self.quote_volume = np.zeros(capacity)
+        self.buy_volume = np.zeros(capacity)
+        self.sell_volume = np.zeros(capacity)
+        self.trades = np.zeros(capacity, dtype=np.int64)
+        self._start = -1
+
+    def add(self, trade_time, price, qty, buyer_is_maker):
+        bar_start = trade_time - trade_time % self.interval_ms
+        if bar_start != self._start:
+            if bar_start < self._start:
+                # 迟到的成交计入当前K线
+                bar_start = self._start
+            else:
+                self._roll(bar_start, price)
+        if price > self._high:
+            self._high = price
+        elif price < self._low:
+            self._low = price
+        self._close = price
+        self._volume += qty
+        self._quote += price * qty
+        if buyer_is_maker:
+            self._sell += qty  # 买方挂单，主动卖出
+        else:
+            self._buy += qty
+        self._trades += 1
+
+    def add_batch(self, times, prices, qtys, buyer_is_maker):
+        """
+        批量加入成交，同一K线内的成交用 reduceat 一次聚合。
+        与逐笔 add 一致，早于当前K线的迟到成交计入当前K线：周期起点取累计最大值，K线不会回退。
+        """
+        if len(times) == 0:
+            return
+        starts = times - times % self.interval_ms
+        starts = np.maximum.accumulate(np.maximum(starts, self._start))
+        boundaries = np.flatnonzero(np.diff(starts)) + 1
+        groups = np.concatenate(([0], boundaries))
+        quote = prices * qtys
+        sell = np.where(buyer_is_maker, qtys, 0.0)
+        group_high = np.maximum.reduceat(prices, groups)
+        group_low = np.minimum.reduceat(prices, groups)
+        group_volume = np.add.reduceat(qtys, groups)
+        group_quote = np.add.reduceat(quote, groups)
+        group_sell = np.add.reduceat(sell, groups)
+        group_count = np.diff(np.append(groups, len(times)))
+        group_close = prices[np.append(boundaries - 1, len(times) - 1)]
+        for i, first in enumerate(groups):
+            bar_start = int(starts[first])
+            if bar_start != self._start:
+                self._roll(bar_start, float(prices[first]))
+            self._high = max(self._high, float(group_high[i]))
+            self._low = min(self._low, float(group_low[i]))
+            self._close = float(group_close[i])
+            self._volume += float(group_volume[i])
+            self._quote += float(group_quote[i])
+            self._sell += float(group_sell[i])
+            self._buy += float(group_volume[i] - group_sell[i])
+            self._trades += int(group_count[i])
+
+    def flush(self, now_ms):
+        """没有新成交时按时间推进，补齐无成交的K线"""
+        if self._start >= 0 and now_ms - now_ms % self.interval_ms > self._start:
+            self._roll(now_ms - now_ms % self.interval_ms, self._close)
+
+    def _roll(self, bar_start, price):
+        if self._start >= 0:
+            self._store(self._start, self._open, self._high, self._low, self._close,
+                        self._volume, self._quote, self._buy, self._sell, self._trades)
+            # 无成交的时间段以上一收盘价补齐
+            gap_start = self._start + self.interval_ms
+            last_close = self._close
+            missing = (bar_start - gap_start) // self.interval_ms
+            for k in range(min(missing, self.capacity)):
+                t = bar_start - (min(missing, self.capacity) - k) * self.interval_ms
+                self._store(t, last_close, last_close, last_close, last_close, 0.0, 0.0, 0.0, 0.0, 0)
+        self._start = bar_start
+        self._open = self._high = self._low = self._close = price
+        self._volume = self._quote = self._buy = self._sell = 0.0
+        self._trades = 0
+
+    def _store(self, start, open_, high, low, close, volume, quote, buy, sell, trades):
+        i = self.head
+        self.start[i] = start
+        self.open[i] = open_
+        self.high[i] = high
+        self.low[i] = low
+        self.close[i] = close
+        self.volume[i] = volume
+        self.quote_volume[i] = quote
+        self.buy_volume[i] = buy
+        self.sell_volume[i] = sell
+        self.trades[i] = trades
+        self.head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def _order(self, n):
+        n = min(n, self.count)
+        return (np.arange(self.head - n, self.head)) % self.capacity
+
+    def latest(self, n=60):
+        """最近 n 根已完成K线，按时间升序的列数组"""
+        idx = self._order(n)
+        volume = self.volume[idx]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vwap = np.where(volume > 0, self.quote_volume[idx] / volume, self.close[idx])
+        return {
+            "start": self.start[idx],
+            "open": self.open[idx],
+            "high": self.high[idx],
+            "low": self.low[idx],
+            "close": self.close[idx],
+            "volume": volume,
+            "vwap": vwap,
+            "buy_volume": self.buy_volume[idx],
+            "sell_volume": self.sell_volume[idx],
+            "trades": self.trades[idx],
+        }
+
+
+# ========== 多周期聚合 ==========
+class TradeAggregator:
+    """从aggTrade流构建 1s/5s/15s 等秒级K线"""
+
+    def __init__(self, resolutions=TRADE_BAR_RESOLUTIONS, capacity=TRADE_BAR_CAPACITY):
+        self.bars = {seconds: TradeBars(seconds, capacity) for seconds in resolutions}
+        self._series = tuple(self.bars.values())
+        self.trade_count = 0
+        self._lock = threading.Lock()
+
+    def on_trade(self, trade_time, price, qty, buyer_is_maker):
+        with self._lock:
+            for series in self._series:
+                series.add(trade_time, price, qty, buyer_is_maker)
+            self.trade_count += 1
+
+    def on_trades(self, times, prices, qtys, buyer_is_maker):
+        """批量加入成交（用于回放或突发行情）"""
+        times = np.asarray(times, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        qtys = np.asarray(qtys, dtype=np.float64)
+        buyer_is_maker = np.asarray(buyer_is_maker, dtype=bool)
+        with self._lock:
+            for series in self._series:
+                series.add_batch(times, prices, qtys, buyer_is_maker)
+            self.trade_count += len(times)
+
+    def flush(self, now_ms=None):
+        now_ms = now_ms or int(time.time() * 1000)
+        with self._lock:
+            for series in self._series:
+                series.flush(now_ms)
+
+    def latest(self, seconds, n=60):
+        with self._lock:
+            return self.bars[seconds].latest(n)
+
+    def summary_text(self, seconds=5, n=12):
+        """供AI分析提示使用的秒级K线摘要"""
+        bars = self.latest(seconds, n)
+        if len(bars["start"]) == 0:
+            return ""
+        lines = [
+            f"时间: {datetime.fromtimestamp(start / 1000).strftime('%H:%M:%S')}，"
+            f"开: {o:.2f}，高: {h:.2f}，低: {l:.2f}，收: {c:.2f}，VWAP: {w:.2f}，"
+            f"主动买: {b:.4f}，主动卖: {s:.4f}"
+            for start, o, h, l, c, w, b, s in zip(
+                bars["start"], bars["open"], bars["high"], bars["low"], bars["close"],
+                bars["vwap"], bars["buy_volume"], bars["sell_volume"])
+        ]
+        return f"最近{len(lines)}根{seconds}秒K线（逐笔成交聚合）：\n" + "\n".join(lines)
+
+
+class TradeStream:
+    """aggTrade WebSocket 流"""
+
+    def __init__(self, aggregator=None, ws_url=AGG_TRADE_WS_URL):
+        self.aggregator = aggregator or TradeAggregator()
+        self.ws_url = ws_url
+        self._ws = None
+
+    @captured("aggTrade")
+    @instrument_handler("aggTrade")
+    def on_message(self, ws, message):
+        try:
+            trade = parse_agg_trade(message)
+            observe_lag("aggTrade", trade[0])
+            self.aggregator.on_trade(*trade)
+        except Exception as e:
+            logging.error(f"处理成交消息时出错: {e}")
+
+    def on_error(self, ws, error):
+        logging.error(f"成交WebSocket错误: {error}")
+
+    def on_close(self, ws, close_status_code, close_msg):
+        logging.warning("成交WebSocket连接关闭")
+
+    def run_forever(self):
+        while True:
+            self._ws = WebSocketApp(self.ws_url, on_message=self.on_message,
+                                    on_error=self.on_error, on_close=self.on_close)
+            self._ws.run_forever()
+            time.sleep(RETRY_DELAY)
+            WS_RECONNECTS.labels("aggTrade").inc()
+
+    def start(self):
+        thread = threading.Thread(target=self.run_forever, daemon=True)
+        thread.start()
+        return thread